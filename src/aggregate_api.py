@@ -0,0 +1,209 @@
+import hashlib
+import json
+
+import numpy as np
+
+import aggregations as agg
+import dataset as ds
+
+# most queries a single batch request may hold
+MAX_BATCH = 200
+
+# query fields narrowing down the respondents, and the filter index column of each
+LIST_FILTERS = {"gender": "gender", "country": "country", "year": "survey_year"}
+
+
+class QueryError(ValueError):
+    """An aggregate query names an unknown question or has malformed filters."""
+
+
+def integer(value, field):
+    """
+    Function that reads an integer given as a json number or as a url parameter
+
+    Parameters:
+    ----------
+    value:
+        the value sent by the client
+    field (str):
+        the query field, for the error message
+
+    Returns:
+    ----------
+    int
+        the integer
+
+    Raises:
+    ----------
+    QueryError
+        if the value is not an integer or a string of one
+    """
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise QueryError(f"{field} must hold integers, not {json.dumps(value)}")
+
+
+def parse_query(query, questions):
+    """
+    Function that validates an aggregate query and puts it in canonical form
+
+    Parameters:
+    ----------
+    query (dict):
+        `question`, and optionally `group` (a question, or null for everyone),
+        `age` (an inclusive `[low, high]` range) and `gender`, `country` and
+        `year` (a value or a list of accepted values)
+    questions (list):
+        the column names that can be queried and grouped by
+
+    Returns:
+    ----------
+    dict
+        the query with every field present, lists sorted and years as integers
+
+    Raises:
+    ----------
+    QueryError
+        if the query is not valid
+    """
+    if not isinstance(query, dict):
+        raise QueryError("a query must be an object")
+    unknown = set(query) - {"question", "group", "age", *LIST_FILTERS}
+    if unknown:
+        raise QueryError(f"unknown query fields: {', '.join(sorted(unknown))}")
+    question, group = query.get("question"), query.get("group")
+    if not isinstance(question, str) or question not in questions:
+        raise QueryError(f"unknown question: {question}")
+    if group is not None and (
+        not isinstance(group, str) or group not in questions or group == question
+    ):
+        raise QueryError(f"cannot group {question} by {group}")
+
+    parsed = {"question": question, "group": group, "age": None}
+    age = query.get("age")
+    if age is not None:
+        if not isinstance(age, list) or len(age) != 2:
+            raise QueryError("age must be a [low, high] range of integers")
+        parsed["age"] = [integer(bound, "age") for bound in age]
+    for field in LIST_FILTERS:
+        values = query.get(field)
+        if values is not None and not isinstance(values, list):
+            values = [values]
+        if values is not None and field == "year":
+            values = [integer(value, field) for value in values]
+        elif values is not None and not all(isinstance(value, str) for value in values):
+            raise QueryError(f"{field} must be a string or a list of strings")
+        parsed[field] = None if values is None else sorted(set(values))
+    return parsed
+
+
+def query_from_args(args):
+    """
+    Function that reads an aggregate query from url parameters
+
+    `age` is given as `low,high`, and filters accepting several values are
+    repeated, e.g. `?question=treatment&group=gender&country=Canada&country=Germany`.
+
+    Parameters:
+    ----------
+    args (MultiDict):
+        the url parameters of the request
+
+    Returns:
+    ----------
+    dict
+        the query, to be validated with `parse_query`
+    """
+    query = {"question": args.get("question"), "group": args.get("group")}
+    if "age" in args:
+        query["age"] = args["age"].split(",")
+    for field in LIST_FILTERS:
+        if field in args:
+            query[field] = args.getlist(field)
+    return query
+
+
+def filter_arguments(query):
+    """Function that translates the filters of a parsed query into `FilterIndex.mask` arguments."""
+    filters = {"equal": {}, "between": {}}
+    if query["age"] is not None:
+        filters["between"]["age"] = tuple(query["age"])
+    for field, column in LIST_FILTERS.items():
+        if query[field] is not None:
+            filters["equal"][column] = query[field]
+    return filters
+
+
+def answer_matrix(data, query, rows):
+    """
+    Function that counts the answers to the question of a query per group
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    query (dict):
+        the parsed query
+    rows (ndarray):
+        positions of the respondents passing the filters of the query
+
+    Returns:
+    ----------
+    dict
+        the query, the answers and groups in display order, unanswered
+        questions included, and the counts as one list per group
+    """
+    question, group = query["question"], query["group"]
+    answers = ds.category_order(data, question, missing=True)
+    groups = ["All respondents"] if group is None else ds.category_order(data, group, missing=True)
+    matrix = np.zeros((len(groups), len(answers)), dtype=np.int64)
+    columns = [question] if group is None else [group, question]
+    counts = agg.count_combinations(data, columns, rows, missing=ds.NO_RESPONSE)
+    answer_codes = counts[question].cat.codes.to_numpy()
+    group_codes = np.zeros_like(answer_codes) if group is None else counts[group].cat.codes.to_numpy()
+    matrix[group_codes, answer_codes] = counts["count"].to_numpy()
+    return {
+        **query,
+        "answers": answers,
+        "groups": groups,
+        "counts": matrix.tolist(),
+        "respondents": int(len(rows)),
+    }
+
+
+def run_queries(store, queries):
+    """
+    Function that answers parsed aggregate queries
+
+    Queries with the same filters share a single pass over the filter index.
+
+    Parameters:
+    ----------
+    store (SurveyStore):
+        the survey responses
+    queries (list):
+        parsed queries, see `parse_query`
+
+    Returns:
+    ----------
+    list
+        the result of every query, in order, see `answer_matrix`
+    """
+    data, index = store.data, store.index
+    rows = {}
+    results = []
+    for query in queries:
+        filters = filter_arguments(query)
+        key = json.dumps(filters, sort_keys=True)
+        if key not in rows:
+            rows[key] = index.rows(**filters)
+        results.append(answer_matrix(data, query, rows[key]))
+    return results
+
+
+def queries_etag(version, queries):
+    """Function that returns the entity tag of the answers to parsed queries in a dataset version."""
+    content = json.dumps([version, queries], sort_keys=True).encode()
+    return hashlib.sha1(content).hexdigest()[:16]
@@ -0,0 +1,355 @@
+import numpy as np
+import pandas as pd
+
+from dataset import NO_RESPONSE
+
+REMOTE_LABELS = {
+    "Never": "Remote work: Never",
+    "Sometimes": "Remote work: Sometimes",
+    "Always": "Remote work: Always",
+}
+
+
+def count_combinations(data, columns, rows=None, missing=None):
+    """
+    Function that counts the respondents for every observed combination of answers
+
+    Counting works directly on the integer category codes, so only the
+    requested columns of the selected rows are ever read.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    columns (list):
+        the column names to cross-tabulate
+    rows (ndarray, optional):
+        positions of the respondents to count, by default everyone
+    missing (str, optional):
+        label for unanswered questions, by default unanswered rows are dropped
+
+    Returns:
+    ----------
+    DataFrame
+        one row per observed combination with the column `count`
+    """
+    codes, categories = [], []
+    for column in columns:
+        column_codes = data[column].cat.codes.to_numpy()
+        column_categories = list(data[column].cat.categories)
+        if rows is not None:
+            column_codes = column_codes[rows]
+        if missing is not None:
+            column_codes = np.where(column_codes < 0, len(column_categories), column_codes)
+            column_categories.append(missing)
+        codes.append(column_codes)
+        categories.append(column_categories)
+
+    shape = tuple(len(c) for c in categories)
+    answered = np.logical_and.reduce([c >= 0 for c in codes])
+    flat = np.ravel_multi_index([c[answered] for c in codes], shape)
+    counts = np.bincount(flat, minlength=int(np.prod(shape)))
+    observed = np.flatnonzero(counts)
+
+    result = {
+        column: pd.Categorical.from_codes(
+            column_codes, categories=column_categories, ordered=True
+        )
+        for column, column_codes, column_categories in zip(
+            columns, np.unravel_index(observed, shape), categories
+        )
+    }
+    result["count"] = counts[observed]
+    return pd.DataFrame(result)
+
+
+def gender_distribution(data, question):
+    """
+    Function that computes the share of each answer to a question within each gender
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+    question (str):
+        the column name of the survey question
+
+    Returns:
+    ----------
+    DataFrame
+        one row per gender and answer with the columns `count` and `pct`
+    """
+    counts = count_combinations(data, ["gender", question], missing=NO_RESPONSE)
+    counts["pct"] = counts["count"] / counts.groupby("gender", observed=True)["count"].transform("sum")
+    return counts
+
+
+def gender_distributions(data, questions):
+    """
+    Function that computes the share of each answer within each gender for several questions
+
+    The category codes of all the questions are offset into one range of
+    answers, so every question is counted in a single bincount over the
+    respondents rather than one aggregation per question.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    questions (list):
+        the column names of the survey questions
+
+    Returns:
+    ----------
+    DataFrame
+        one row per question, gender and answer with the columns `question`,
+        `gender`, `answer`, `answer_rank`, `count` and `pct`, unanswered
+        questions and genders included as `NO_RESPONSE`
+    """
+    gender_codes = data["gender"].cat.codes.to_numpy().astype(np.int64)
+    genders = [*data["gender"].cat.categories, NO_RESPONSE]
+    gender_codes = np.where(gender_codes < 0, len(genders) - 1, gender_codes)
+
+    # every question's answers, followed by the one for no response
+    labels, ranks, owners, offsets = [], [], [], []
+    for question in questions:
+        answers = [*data[question].cat.categories, NO_RESPONSE]
+        offsets.append(len(labels))
+        labels += answers
+        ranks += range(len(answers))
+        owners += [question] * len(answers)
+    codes = np.stack([data[question].cat.codes.to_numpy() for question in questions], axis=1)
+    sizes = np.array([data[question].cat.categories.size for question in questions])
+    codes = np.where(codes < 0, sizes, codes).astype(np.int64) + np.array(offsets)
+
+    flat = gender_codes[:, None] * len(labels) + codes
+    counts = np.bincount(flat.ravel(), minlength=len(genders) * len(labels))
+    observed = np.flatnonzero(counts)
+    gender, answer = np.divmod(observed, len(labels))
+    result = pd.DataFrame(
+        {
+            "question": np.array(owners, dtype=object)[answer],
+            "gender": np.array(genders, dtype=object)[gender],
+            "answer": np.array(labels, dtype=object)[answer],
+            "answer_rank": np.array(ranks)[answer],
+            "count": counts[observed],
+        }
+    )
+    totals = result.groupby(["question", "gender"], sort=False)["count"].transform("sum")
+    result["pct"] = result["count"] / totals
+    return result
+
+
+def answer_counts(data, question, rows=None):
+    """
+    Function that counts the responses for each answer to a question
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+    question (str):
+        the column name of the survey question
+    rows (ndarray, optional):
+        positions of the respondents to count, by default everyone
+
+    Returns:
+    ----------
+    DataFrame
+        one row per answer with the column `count`
+    """
+    return count_combinations(data, [question], rows)
+
+
+def remote_work_counts(data, rows=None):
+    """
+    Function that counts the mental health disorder answers for each remote work answer
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+    rows (ndarray, optional):
+        positions of the respondents to count, by default everyone
+
+    Returns:
+    ----------
+    DataFrame
+        one row per remote work and disorder answer with the column `count`
+    """
+    counts = count_combinations(data, ["is_remote", "have_mental_helth_disorder"], rows)
+    counts["is_remote"] = counts["is_remote"].cat.rename_categories(REMOTE_LABELS)
+    return counts
+
+
+def top_countries(data, n):
+    """
+    Function that returns the countries with the most respondents
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+    n (int):
+        the number of countries
+
+    Returns:
+    ----------
+    list
+        the names of the countries, most respondents first
+    """
+    categories = data["country"].cat.categories
+    codes = data["country"].cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    # "Other" is the bucket of the remaining countries in `bucket_countries`
+    ranked = [
+        categories[code] for code in np.argsort(-counts, kind="stable")
+        if counts[code] > 0 and categories[code] != "Other"
+    ]
+    return ranked[:n]
+
+
+def bucket_countries(data, countries):
+    """
+    Function that maps every respondent's country onto `countries` or "Other"
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+    countries (list):
+        the countries to keep apart
+
+    Returns:
+    ----------
+    Categorical
+        the country bucket of each respondent, with buckets in alphabetical order
+    """
+    buckets = sorted([*countries, "Other"])
+    # the bucket of every country category, looked up by category code
+    lookup = np.array([
+        buckets.index(country if country in countries else "Other")
+        for country in data["country"].cat.categories
+    ])
+    codes = data["country"].cat.codes.to_numpy()
+    return pd.Categorical.from_codes(
+        np.where(codes < 0, -1, lookup[codes]), categories=buckets, ordered=True
+    )
+
+
+def country_answer_counts(data, column, countries):
+    """
+    Function that counts the answers to a question per country bucket
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+    column (str):
+        the column name of the survey question
+    countries (list):
+        the countries to keep apart, all others are grouped as "Other"
+
+    Returns:
+    ----------
+    DataFrame
+        country buckets as index, answers as columns and counts as values
+    """
+    subset = pd.DataFrame({"countries": bucket_countries(data, countries), column: data[column]})
+    counts = count_combinations(subset, ["countries", column])
+    return counts.astype({"countries": object, column: object}).pivot(
+        index="countries", columns=column, values="count"
+    )
+
+
+def cooccurrence_pairs(counts, names):
+    """
+    Function that lists the co-occurrence counts of some diagnoses as pairs
+
+    Parameters:
+    ----------
+    counts (DataFrame):
+        respondents per pair of diagnoses, see `DiagnosisMatrix.cooccurrence`
+    names (list):
+        the diagnoses to keep
+
+    Returns:
+    ----------
+    DataFrame
+        one row per pair with the columns `diagnosis`, `with`, `count` and
+        `pct`, the share of the respondents with `diagnosis` who also have `with`
+    """
+    subset = counts.loc[names, names]
+    totals = np.diag(subset.to_numpy())
+    pairs = pd.DataFrame(
+        {
+            "diagnosis": np.repeat(names, len(names)),
+            "with": np.tile(names, len(names)),
+            "count": subset.to_numpy().ravel(),
+        }
+    )
+    pairs["pct"] = pairs["count"] / np.maximum(np.repeat(totals, len(names)), 1)
+    return pairs
+
+
+def answer_shares(counts):
+    """
+    Function that converts a table of counts into row percentages
+
+    Parameters:
+    ----------
+    counts (DataFrame):
+        counts with groups as index and answers as columns
+
+    Returns:
+    ----------
+    DataFrame
+        the percentage of each answer within each group
+    """
+    return counts.div(counts.sum(axis=1), axis=0).mul(100)
+
+
+def count_cube(data, columns, rows=None):
+    """
+    Function that counts the respondents per combination of answers, age, gender and year
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    columns (list):
+        the column names of the survey questions
+    rows (ndarray, optional):
+        positions of the respondents to count, by default everyone
+
+    Returns:
+    ----------
+    DataFrame
+        one row per observed combination of `columns`, `age`, `gender` and
+        `survey_year` with the column `count`
+    """
+    frame = data[[*columns, "gender", "survey_year"]].assign(
+        age=data["age"].astype("category")
+    )
+    return count_combinations(frame, [*columns, "age", "gender", "survey_year"], rows)
+
+
+def cube_records(counts):
+    """
+    Function that converts a count cube into compact JSON-ready records
+
+    Parameters:
+    ----------
+    counts (DataFrame):
+        the output of `count_cube`
+
+    Returns:
+    ----------
+    dict
+        the answer column names under `fields` and one
+        `[*answers, age, gender, survey_year, count]` list per row under `records`
+    """
+    return {
+        "fields": list(counts.columns[:-4]),
+        "records": counts.astype({"age": int, "survey_year": int}).astype(object).values.tolist(),
+    }
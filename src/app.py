@@ -1,24 +1,98 @@
-import altair as alt
+import functools
+import json
+import os
+
+# imported first, so that its timer includes the imports below
+import startup
+
 import dash
 import dash_bootstrap_components as dbc
+import dash_core_components as dcc
 import dash_html_components as html
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from flask import abort, redirect, request, send_file
 import pandas as pd
-from dash.dependencies import Input, Output
-from plotly import graph_objects as go
+import plotly
+import aggregate_api
+import aggregations as agg
+import chart_bundle
+import country_map
+import dataset as ds
 import html_components as hc
+import image_export
+import survey_arrow
+import vega_assets
+from crosstab import Crosstabs
+from diagnosis_index import short_name
+from ingest import IncomingWatcher
+from input_space import input_labels, widget_values
+from metrics import Metrics
+from render_cache import RenderCache
+from render_pool import RenderPool
+from spec_templates import FigureTemplate, SpecTemplate, list_slot, text_slot
+from survey_store import SurveyStore
+
+# only needed to build the chart templates, on their first use
+alt = startup.lazy_import("altair")
+go = startup.lazy_import("plotly.graph_objects")
+
+startup.timer.mark("imports")
 
 app = dash.Dash(
     __name__,
     title="Mental Health in Tech Dashboard",
     external_stylesheets=[dbc.themes.BOOTSTRAP],
+    # the vega runtime, served by the vega_script route below
+    external_scripts=vega_assets.script_urls(),
     suppress_callback_exceptions=True,
 )
 
 server = app.server
 
-data = pd.read_csv("data/processed/mental_health_clean_reformat.csv")
-feature_list = pd.read_csv("data/processed/features_list.csv", encoding="utf-8")
-feature_list.set_index("variables", inplace=True)
+# re-aggregate the HR tab charts in the browser instead of on the server
+CLIENTSIDE_FILTERING = os.environ.get("CLIENTSIDE_FILTERING", "0") == "1"
+
+# bearer token required by the /ingest route, which is disabled when unset
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN")
+
+# number of countries with the most respondents kept apart in the donut charts
+TOP_COUNTRIES = int(os.environ.get("TOP_COUNTRIES", 4))
+
+# the survey memory-mapped from the file written by src/preprocess.py, shared by
+# every worker, or parsed from the processed csv files when it is not there
+if os.path.exists(survey_arrow.ARROW_PATH):
+    responses, feature_list = survey_arrow.load_survey()
+else:
+    responses, feature_list = ds.load_survey(), ds.load_features()
+store = SurveyStore(responses)
+
+# the questions of the overview tab dropdown
+OVERVIEW_QUESTIONS = list(responses.columns[:14])
+startup.timer.mark("data")
+
+render_cache = RenderCache(
+    max_entries=int(os.environ.get("RENDER_CACHE_MAX_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    version=store.version,
+)
+
+# processes rendering the charts off the request threads when RENDER_WORKERS > 0,
+# with the default of 0 the charts render in the request thread
+render_pool = RenderPool(
+    workers=int(os.environ.get("RENDER_WORKERS", 0)),
+    timeout=float(os.environ.get("RENDER_TIMEOUT", 10)),
+    version=store.version,
+)
+
+# charts pre-rendered by src/chart_bundle.py, served instead of rendering live
+bundle = chart_bundle.ChartBundle(version=store.version)
+
+# static images of the charts, shared with src/image_export.py and rendered on demand
+exporter = image_export.ImageExporter(workers=int(os.environ.get("IMAGE_EXPORT_WORKERS", 1)))
+
+metrics = Metrics()
+metrics.register_cache("render", render_cache)
+metrics.register_lines(startup.timer.metric_lines)
 
 
 def Helvetica():
@@ -43,99 +117,346 @@ def Helvetica():
     }
 
 
-alt.themes.register('Helvetica', Helvetica)
-alt.themes.enable('Helvetica')
+@functools.lru_cache(maxsize=None)
+def enable_theme():
+    """Function that registers and enables the altair theme of the dashboard, once."""
+    alt.themes.register('Helvetica', Helvetica)
+    alt.themes.enable('Helvetica')
+
 
 # app layout
-app.layout = html.Div([
-    hc.navbar,
-    hc.container],
-    style={"backgroundColor": "#eeeeef"}
-)
+def serve_layout():
+    children = [hc.navbar, hc.container]
+    if CLIENTSIDE_FILTERING:
+        children.append(dcc.Store(id="hr_cube", data=hr_count_cube()))
+    return html.Div(children, style={"backgroundColor": "#eeeeef"})
 
 
-@app.callback(Output("tab-content", "children"), [Input("tabs", "active_tab")])
-def switch_tab(at):
+app.layout = serve_layout
+
+
+@render_cache.memoize
+def tab_layout(at):
+    """
+    Function that builds the component tree of a tab, once per dataset version
+
+    Tabs are only built when they are first shown. The tree is kept as
+    the plain json data of its components, which dash sends without
+    walking the components again.
+
+    Parameters:
+    ----------
+    at (str):
+        the id of the tab
+
+    Returns:
+    ----------
+    dict
+        the serialized component tree
+    """
     if at == "tab-1":
-        return hc.get_overview_section(data, feature_list)
+        layout = hc.get_overview_section(store.data, feature_list)
     elif at == "tab-2":
-        return hc.get_second_section()
+        layout = hc.get_second_section(store.years())
     elif at == "tab-3":
-        return hc.get_third_section()
-    return html.P("This shouldn't ever be displayed...")
+        layout = hc.get_third_section()
+    elif at == "tab-4":
+        layout = hc.get_explore_section(feature_list, EXPLORE_QUESTIONS, store.years())
+    elif at == "tab-5":
+        layout = hc.get_diagnosis_section(list(store.diagnoses.frequencies().index))
+    elif at == "tab-6":
+        layout = hc.get_map_section(feature_list, MAP_QUESTIONS)
+    else:
+        layout = html.P("This shouldn't ever be displayed...")
+    return json.loads(json.dumps(layout, cls=plotly.utils.PlotlyJSONEncoder))
 
 
-# plot specs
-@app.callback(Output("gender_barplot", "srcDoc"), Input("q_selection", "value"))
-def plot_gender_chart(q_selection="mental_health_benefits_employer"):
-    """Generates a bar plot grouped by gender and y-axis determined my provided variable name found in dataframe
+@app.callback(Output("tab-content", "children"), [Input("tabs", "active_tab")])
+def switch_tab(at):
+    with metrics.stage("layout"):
+        return tab_layout(at)
 
-    Parameters
+
+@server.route("/render-cache")
+def render_cache_stats():
+    return render_cache.stats()
+
+
+@server.route(f"{chart_bundle.URL_PREFIX}<name>")
+def bundled_chart(name):
+    path = bundle.path(name)
+    if path is None:
+        abort(404)
+    # streamed from the file by the server, not copied into the response
+    response = send_file(path, mimetype=chart_bundle.MEDIA_TYPE, add_etags=False)
+    # objects are named by their content hash, so they never change
+    response.set_etag(name)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response.make_conditional(request)
+
+
+@server.route(f"{vega_assets.URL_PREFIX}<name>")
+def vega_script(name):
+    content = vega_assets.script(name)
+    if content is None:
+        abort(404)
+    response = server.response_class(content, content_type="application/javascript")
+    # script urls carry the altair version, so a url never changes content
+    response.set_etag(vega_assets.etag(content))
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response.make_conditional(request)
+
+
+@server.route(country_map.GEO_URL)
+def country_geometry():
+    content = country_map.geometry()
+    response = server.response_class(content, content_type="application/geo+json")
+    # the geometry only changes with a new release of the dashboard
+    response.set_etag(country_map.etag(content))
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response.make_conditional(request)
+
+
+@server.route(country_map.TOPOJSON_URL + country_map.TOPOJSON_NAME)
+def base_layers():
+    content = country_map.topology()
+    # plotly.js loads it instead of the topojson of its cdn, see country_map
+    response = server.response_class(content, content_type="application/json")
+    response.set_etag(country_map.etag(content))
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response.make_conditional(request)
+
+
+@server.route(f"{image_export.URL_PREFIX}<name>")
+def exported_image(name):
+    content = exporter.read(name)
+    if content is None:
+        abort(404)
+    fmt = name.rsplit(".", 1)[1]
+    response = server.response_class(content, content_type=image_export.MEDIA_TYPES[fmt])
+    # images are named by the hash of their chart, so they never change
+    response.set_etag(name)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response.make_conditional(request)
+
+
+def export_redirect(render, fmt, *args):
+    """
+    Helper function that redirects to the image of a chart, once it is exported
+
+    The image is rendered in the process pool of the exporter, not in
+    the request thread. Until it is stored the response is 202 Accepted,
+    and the client polls the same url.
+
+    Parameters:
     ----------
-    q_selection : str, optional
-        variable name to populate on y-axis, by default "mental_health_benefits_employer"
+    render (callable):
+        renders the spec or figure of the chart
+    fmt (str):
+        the image format
+    *args:
+        the chart inputs
 
-    Returns
-    -------
-    chart in html format
-    """
-    # dictionary for ordering values in plot
-    order_dict = {
-        "self_employed": ["Yes", "No", "No response"],
-        "num_employees": [
-            "1-5",
-            "6-25",
-            "26-100",
-            "26-100",
-            "100-500",
-            "500-1000",
-            "More than 1000",
-            "No response",
-        ],
-        "tech_org": ["Yes", "No", "No response"],
-        "mental_health_benefits_healthcare": [
-            "Yes",
-            "No",
-            "Not eligible for coverage",
-            "I don't know",
-            "No response",
-        ],
-        "mental_health_resources": ["Yes", "No", "I don't know", "No response"],
-        "mental_health_leave": [
-            "Very easy",
-            "Somewhat easy",
-            "Neither easy nor difficult",
-            "Somewhat difficult",
-            "Very difficult",
-            "I don't know",
-            "No response",
-        ],
-        "mental_disorder_discuss": ["Yes", "Maybe", "No", "No response"],
-        "health_disorder_discuss": ["Yes", "Maybe", "No", "No response"],
-        "discuss_coworker": ["Yes", "Maybe", "No", "No response"],
-        "discuss_supervisor": ["Yes", "Maybe", "No", "No response"],
-        "online_resources": [
-            "Yes, I know several",
-            "I know some",
-            "No, I don't know any",
-            "No response",
-        ],
-        "productivity": ["Yes", "No", "Unsure", "Not applicable to me", "No response"],
-        "productivity_percent": ["1-25%", "26-50%", "51-75%", "76-100%", "No response"],
-        "have_mental_helth_disorder": ["Yes", "Maybe", "No", "No response"],
-    }
+    Returns:
+    ----------
+    Response
+        a redirect to the image, 202 while it is rendering, 501 if its
+        renderer is not installed or 500 if rendering failed
+    """
+    if fmt not in image_export.MEDIA_TYPES:
+        abort(404)
+    source = chart_bundle.serialize(render(*args))
+    kind = image_export.CHART_KINDS[render.__name__]
+    try:
+        name, rendering = exporter.submit(kind, source, fmt)
+    except image_export.ExportUnavailable as error:
+        return {"error": str(error)}, 501
+    if rendering is None:
+        return redirect(image_export.URL_PREFIX + name)
+    if rendering.done() and rendering.exception() is not None:
+        return {"error": f"rendering failed: {rendering.exception()!r}"}, 500
+    return {"image": image_export.URL_PREFIX + name}, 202, {"Retry-After": "1"}
 
-    chart = (
-        alt.Chart(
-            data.fillna("No response"),
-            title=f"{feature_list.loc[q_selection]['variables2']}",
+
+@server.route(f"{image_export.URL_PREFIX}overview/<question>.<fmt>")
+def export_overview(question, fmt):
+    if question not in OVERVIEW_QUESTIONS:
+        abort(404)
+    return export_redirect(plot_gender_chart, fmt, question)
+
+
+@server.route(f"{image_export.URL_PREFIX}donut/<column>/<answer>.<fmt>")
+def export_donut(column, answer, fmt):
+    if column not in DONUT_COLUMNS or answer not in store.tables[("donut", column)].columns:
+        abort(404)
+    return export_redirect(build_graph, fmt, column, answer)
+
+
+@server.route("/metrics")
+def prometheus_metrics():
+    return server.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@render_cache.memoize
+def aggregate_results(queries):
+    """
+    Function that answers parsed aggregate api queries, once per dataset version
+
+    Parameters:
+    ----------
+    queries (list):
+        the queries, see `aggregate_api.parse_query`
+
+    Returns:
+    ----------
+    list
+        the result of every query
+    """
+    with metrics.stage("aggregate"):
+        return aggregate_api.run_queries(store, queries)
+
+
+def aggregate_response(queries):
+    """
+    Helper function that answers aggregate api queries with a conditional json response
+
+    Parameters:
+    ----------
+    queries (list):
+        the queries as sent by the client
+
+    Returns:
+    ----------
+    Response
+        the results, 304 when the client holds them already, or 400 with
+        the error when a query is not valid
+    """
+    if not isinstance(queries, list) or len(queries) > aggregate_api.MAX_BATCH:
+        return {"error": f"queries must be a list of at most {aggregate_api.MAX_BATCH}"}, 400
+    try:
+        parsed = [aggregate_api.parse_query(query, API_QUESTIONS) for query in queries]
+    except aggregate_api.QueryError as error:
+        return {"error": str(error)}, 400
+    version = store.version
+    etag = aggregate_api.queries_etag(version, parsed)
+    # the etag only depends on the queries and the dataset, so a match needs no aggregation
+    if etag in request.if_none_match:
+        response = server.response_class(status=304)
+    else:
+        results = aggregate_results(parsed)
+        response = server.response_class(
+            json.dumps({"version": version, "results": results}, separators=(",", ":")),
+            mimetype="application/json",
         )
-            .transform_joinaggregate(total="count(*)", groupby=["gender"])
-            .transform_calculate(pct="1/datum.total")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@server.route("/api/aggregate")
+def aggregate():
+    return aggregate_response([aggregate_api.query_from_args(request.args)])
+
+
+@server.route("/api/aggregate/batch", methods=["POST"])
+def aggregate_batch():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return {"error": "the body must be a json object with a list of queries"}, 400
+    return aggregate_response(body.get("queries"))
+
+
+watcher = IncomingWatcher(store, feature_list)
+
+
+def ingest_pending(force=False):
+    """
+    Helper function that ingests new response batches and retires stale renders
+
+    Parameters:
+    ----------
+    force (bool):
+        scan the incoming directory even if it was scanned recently
+    """
+    if watcher.poll(force=force):
+        render_cache.version = store.version
+        render_pool.version = store.version
+        bundle.version = store.version
+
+
+ingest_pending(force=True)
+startup.timer.mark("ingest")
+
+
+@server.before_request
+def ingest_new_batches():
+    ingest_pending()
+
+
+@server.route("/ingest/<int:year>", methods=["POST"])
+def ingest_batch(year):
+    if not INGEST_TOKEN or request.headers.get("Authorization") != f"Bearer {INGEST_TOKEN}":
+        abort(403)
+    name = watcher.save(year, request.get_data())
+    ingest_pending(force=True)
+    if name in watcher.rejected:
+        return {"batch": name, "error": watcher.rejected[name]}, 422
+    return {"batch": name, "responses": len(store.data), "version": store.version}
+
+
+def respondent_filters(age_slider, gender, years=None):
+    """
+    Helper function that translates the HR tab widgets into filter index arguments
+
+    Parameters:
+    ----------
+    age_slider (int):
+        the range of survey respondent ages
+    gender (str):
+        the gender of the survey respondent, or "all"
+    years (list, optional):
+        the survey years to include, by default all of them
+
+    Returns:
+    ----------
+    dict
+        keyword arguments for `FilterIndex.rows`
+    """
+    filters = {"between": {"age": tuple(age_slider)}, "equal": {}}
+    if years is not None:
+        filters["equal"]["survey_year"] = years
+    if gender != "all":
+        filters["equal"]["gender"] = gender
+    return filters
+
+
+def gender_chart(counts, q_selection, title, answer_order):
+    """
+    Function that builds the overview bar chart from the answer shares per gender
+
+    Parameters:
+    ----------
+    counts (DataFrame or NamedData):
+        share of every answer within each gender, see `agg.gender_distribution`
+    q_selection (str):
+        variable name to populate on y-axis
+    title (str):
+        the chart title
+    answer_order (list):
+        the answers in display order
+
+    Returns:
+    ----------
+    viz
+        the altair chart
+    """
+    enable_theme()
+    return (
+        alt.Chart(counts, title=title)
             .mark_bar()
             .encode(
-            alt.X("sum(pct):Q", axis=alt.Axis(format="%"), title=""),
-            alt.Y(q_selection, title="", sort=order_dict[q_selection]),
+            alt.X("pct:Q", axis=alt.Axis(format="%"), title=""),
+            alt.Y(f"{q_selection}:N", title="", sort=answer_order),
             color=alt.value("#027b8e"),
             column=alt.Column("gender", type="nominal", title=""),
         )
@@ -144,40 +465,161 @@ def plot_gender_chart(q_selection="mental_health_benefits_employer"):
             .configure_title(fontSize=18, anchor="middle", color="black")
             .properties(height=300, width=200, background='#eeeeef')
     )
-    return chart.to_html()
 
 
-@app.callback(
-    Output("work_interfere_barplot", "srcDoc"),
-    Input("age_slider", "value"),
-    Input("gender_selection", "value"),
-)
-def plot_work_interfere_bars(age_slider=[15, 65], gender="all"):
+def all_questions_chart(counts, question_order):
     """
-    Function that makes the first visualization on the second tab of the dashboard 
+    Function that builds the overview small multiples from the answer shares per question and gender
 
     Parameters:
     ----------
-    age_slider (int):
-        the range of survey respondent ages
-    gender (str):
-        the gender of the survey respondent
+    counts (DataFrame or NamedData):
+        share of every answer within each gender, see `agg.gender_distributions`,
+        with the question descriptions in `question`
+    question_order (list):
+        the question descriptions in display order
 
     Returns:
     ----------
     viz
-        the html plot
+        the altair chart
     """
-    plot_data = data
-    # To apply filters to the plot data:
-    plot_data = plot_data.query(
-        'work_interfere_treated != "Not applicable to me" & work_interfere_not_treated != "Not applicable to me" & @age_slider[0] <= age <= @age_slider[1]'
+    enable_theme()
+    return (
+        alt.Chart(counts, title="Answers to every overview question")
+            .mark_bar()
+            .encode(
+            alt.X("pct:Q", axis=alt.Axis(format="%"), title=""),
+            alt.Y("answer:N", title="", sort=alt.EncodingSortField("answer_rank", op="min")),
+            color=alt.value("#027b8e"),
+            row=alt.Row(
+                "question:N",
+                title="",
+                sort=question_order,
+                header=alt.Header(
+                    labelAngle=0, labelAlign="left", labelAnchor="start", labelOrient="top"
+                ),
+            ),
+            column=alt.Column("gender", type="nominal", title=""),
+            tooltip=[
+                alt.Tooltip("answer:N", title="Answer"),
+                alt.Tooltip("pct:Q", title="Share", format=".1%"),
+            ],
+        )
+            .resolve_scale(y="independent")
+            .configure_header(labelFontSize=12)
+            .configure_axis(labelFontSize=12, labelLimit=160)
+            .configure_title(fontSize=18, anchor="middle", color="black")
+            .properties(width=160, background='#eeeeef')
     )
-    # To filter data for responses in the target gender:
-    if gender != "all":
-        plot_data = plot_data.query("gender == @gender")
 
-    # To generate the plots:
+
+# plot specs
+@app.callback(
+    Output("gender_barplot_spec", "data"),
+    Input("q_selection", "value"),
+    Input("overview_show_all", "value"),
+)
+def show_gender_chart(q_selection, show_all=()):
+    """
+    Function that shows the overview chart, from the bundle when it is pre-rendered
+
+    Parameters:
+    ----------
+    q_selection (str):
+        variable name to populate on y-axis
+    show_all (list):
+        holds "all" when every question is shown at once
+
+    Returns:
+    ----------
+    dict
+        the spec of the chart, or its url in the bundle
+    """
+    if show_all:
+        [spec] = bundle.specs(plot_all_gender_charts)
+    else:
+        [spec] = bundle.specs(plot_gender_chart, q_selection)
+    return spec
+
+
+@render_cache.memoize
+@render_pool.offload
+def plot_gender_chart(q_selection="mental_health_benefits_employer"):
+    """Generates a bar plot grouped by gender and y-axis determined my provided variable name found in dataframe
+
+    Parameters
+    ----------
+    q_selection : str, optional
+        variable name to populate on y-axis, by default "mental_health_benefits_employer"
+
+    Returns
+    -------
+    chart spec in json format
+    """
+    with metrics.stage("aggregate"):
+        counts = agg.gender_distribution(store.data, q_selection)
+    with metrics.stage("serialize"):
+        return GENDER_TEMPLATE.render(
+            {"counts": counts},
+            q_selection=q_selection,
+            title=f"{feature_list.loc[q_selection]['variables2']}",
+            answer_order=ds.category_order(store.data, q_selection, missing=True),
+        )
+
+
+@render_cache.memoize
+@render_pool.offload
+def plot_all_gender_charts():
+    """
+    Function that makes the overview chart of every question at once
+
+    The answer shares of all the questions are counted in one pass over
+    the responses, and the chart is rendered once per dataset version.
+
+    Returns:
+    ----------
+    str
+        the chart spec as json
+    """
+    questions = OVERVIEW_QUESTIONS
+    with metrics.stage("aggregate"):
+        counts = agg.gender_distributions(store.data, questions)
+        titles = feature_list.loc[questions, "variables3"]
+        counts["question"] = counts["question"].map(titles)
+    with metrics.stage("serialize"):
+        return ALL_QUESTIONS_TEMPLATE.render(
+            {"counts": counts}, question_order=titles.tolist()
+        )
+
+
+WORK_INTERFERE_EXCLUSIONS = {
+    "work_interfere_treated": "Not applicable to me",
+    "work_interfere_not_treated": "Not applicable to me",
+}
+
+
+def work_interfere_chart(treated_counts, not_treated_counts, treated_order, not_treated_order):
+    """
+    Function that builds the work interference bar charts from aggregated counts
+
+    Parameters:
+    ----------
+    treated_counts (DataFrame or NamedData):
+        responses per answer when the issue is treated
+    not_treated_counts (DataFrame or NamedData):
+        responses per answer when the issue is not treated
+    treated_order (list):
+        the answers to the treated question in display order
+    not_treated_order (list):
+        the answers to the not treated question in display order
+
+    Returns:
+    ----------
+    viz
+        the altair chart
+    """
+    enable_theme()
     title1 = (
         alt.Chart({"values": [{"text": "When Treated"}]})
             .mark_text(dx=100, size=12, color="black")
@@ -185,16 +627,16 @@ def plot_work_interfere_bars(age_slider=[15, 65], gender="all"):
     )
     treated = alt.vconcat(
         title1,
-        alt.Chart(plot_data)
+        alt.Chart(treated_counts)
             .mark_bar(color="#a39fc9")
             .encode(
             x=alt.X(
-                "work_interfere_treated",
-                sort=["Never", "Rarely", "Sometimes", "Often"],
+                "work_interfere_treated:N",
+                sort=treated_order,
                 axis=alt.Axis(title=" ", labelAngle=-45, ),
             ),
             y=alt.Y(
-                "count()",
+                "count:Q",
                 scale=alt.Scale(domain=(0, 550)),
                 axis=alt.Axis(title="Number of Responses"),
             ),
@@ -208,20 +650,20 @@ def plot_work_interfere_bars(age_slider=[15, 65], gender="all"):
 
     untreated = alt.vconcat(
         title2,
-        alt.Chart(plot_data)
+        alt.Chart(not_treated_counts)
             .mark_bar(color="#a39fc9")
             .encode(
             x=alt.X(
-                "work_interfere_not_treated",
-                sort=["Never", "Rarely", "Sometimes", "Often"],
+                "work_interfere_not_treated:N",
+                sort=not_treated_order,
                 axis=alt.Axis(title=" ", labelAngle=-45, ),
             ),
             y=alt.Y(
-                "count()", scale=alt.Scale(domain=(0, 550)), axis=alt.Axis(title=" "),
+                "count:Q", scale=alt.Scale(domain=(0, 550)), axis=alt.Axis(title=" "),
             ),
         ).properties(height=200, width=200),
     )
-    viz = (
+    return (
         alt.hconcat(
             treated,
             untreated,
@@ -230,116 +672,306 @@ def plot_work_interfere_bars(age_slider=[15, 65], gender="all"):
             .configure_view(stroke=None)
             .configure_concat(spacing=1)
     ).properties(background='#eeeeef')
-    return viz.to_html()
 
 
-@app.callback(
-    Output("remote_barplot", "srcDoc"),
-    Input("age_slider", "value"),
-    Input("gender_selection", "value"),
-)
-def plot_remote_work(age_slider=[15, 65], gender="all"):
+def remote_work_chart(remote_counts, disorder_order, remote_order):
+    """
+    Function that builds the remote work bar chart from aggregated counts
+
+    Parameters:
+    ----------
+    remote_counts (DataFrame or NamedData):
+        responses per remote work and mental health disorder answer
+    disorder_order (list):
+        the answers to the mental health disorder question in display order
+    remote_order (list):
+        the remote work labels in display order
+
+    Returns:
+    ----------
+    viz
+        the altair chart
+    """
+    enable_theme()
+    return (
+        alt.Chart(
+            remote_counts,
+            title="Do employees that work remotely report fewer mental health issues?",
+        )
+            .mark_bar(color="#a39fc9")
+            .encode(
+            x=alt.X(
+                "have_mental_helth_disorder:N",
+                title="",
+                axis=alt.Axis(labelAngle=-45),
+                sort=disorder_order,
+            ),
+            y=alt.Y(
+                "count:Q",
+                title="Number of Responses",
+                scale=alt.Scale(domain=(0, 350)),
+            ),
+            column=alt.Column(
+                "is_remote:N",
+                title="",
+                header=alt.Header(labelOrient="top"),
+                sort=remote_order,
+            ),
+        )
+            .configure_header(labelFontSize=12)
+            .properties(height=220, width=170, background='#eeeeef')
+            .configure_title(fontSize=18, anchor="middle")
+    )
+
+
+def work_interfere_orders():
+    """Function that returns the sort orders of the work interference charts."""
+    return {
+        "treated_order": ds.category_order(store.data, "work_interfere_treated"),
+        "not_treated_order": ds.category_order(store.data, "work_interfere_not_treated"),
+    }
+
+
+def remote_work_orders():
+    """Function that returns the sort orders of the remote work chart."""
+    return {
+        "disorder_order": ds.category_order(store.data, "have_mental_helth_disorder")[::-1],
+        "remote_order": [
+            agg.REMOTE_LABELS[answer] for answer in ds.category_order(store.data, "is_remote")
+        ],
+    }
+
+
+# vega-lite documents compiled once, only data, titles and sort orders vary per request
+GENDER_TEMPLATE = SpecTemplate(lambda: gender_chart(
+    alt.NamedData("counts"),
+    text_slot("q_selection"),
+    text_slot("title"),
+    list_slot("answer_order"),
+))
+ALL_QUESTIONS_TEMPLATE = SpecTemplate(lambda: all_questions_chart(
+    alt.NamedData("counts"), list_slot("question_order")
+))
+WORK_INTERFERE_TEMPLATE = SpecTemplate(lambda: work_interfere_chart(
+    alt.NamedData("treated"),
+    alt.NamedData("not_treated"),
+    list_slot("treated_order"),
+    list_slot("not_treated_order"),
+))
+REMOTE_WORK_TEMPLATE = SpecTemplate(lambda: remote_work_chart(
+    alt.NamedData("remote"), list_slot("disorder_order"), list_slot("remote_order")
+))
+
+
+def hr_selection(filters):
+    """
+    Helper function that selects the respondents of the HR tab filters, once for both charts
+
+    Parameters:
+    ----------
+    filters (dict):
+        the HR tab filters, see `respondent_filters`
+
+    Returns:
+    ----------
+    ndarray
+        the positions of the selected rows in the current dataset version
+    """
+    with metrics.stage("filter"):
+        return store.index.rows(**filters)
+
+
+@render_pool.offload
+def plot_work_interfere_bars(selected):
+    """
+    Function that makes the first visualization on the second tab of the dashboard 
+
+    Parameters:
+    ----------
+    selected (ndarray):
+        the respondents passing the HR tab filters, see `hr_selection`
+
+    Returns:
+    ----------
+    str
+        the chart spec as json
+    """
+    with metrics.stage("filter"):
+        rows = store.index.narrow(selected, exclude=WORK_INTERFERE_EXCLUSIONS)
+    with metrics.stage("aggregate"):
+        treated = agg.answer_counts(store.data, "work_interfere_treated", rows)
+        not_treated = agg.answer_counts(store.data, "work_interfere_not_treated", rows)
+    with metrics.stage("serialize"):
+        return WORK_INTERFERE_TEMPLATE.render(
+            {"treated": treated, "not_treated": not_treated}, **work_interfere_orders()
+        )
+
+
+@render_pool.offload
+def plot_remote_work(selected):
     """
     Function that makes the second visualization on the second tab of the dashboard
 
+    Parameters:
+    ----------
+    selected (ndarray):
+        the respondents passing the HR tab filters, see `hr_selection`
+
+    Returns:
+    ----------
+    str
+        the chart spec as json
+    """
+    # Remove null values
+    with metrics.stage("filter"):
+        rows = store.index.narrow(selected, notnull=["gender"])
+    with metrics.stage("aggregate"):
+        remote_counts = agg.remote_work_counts(store.data, rows)
+    with metrics.stage("serialize"):
+        return REMOTE_WORK_TEMPLATE.render({"remote": remote_counts}, **remote_work_orders())
+
+
+@render_cache.memoize
+def plot_hr_charts(age_slider=[15, 65], gender="all", years=None):
+    """
+    Function that makes both visualizations on the second tab of the dashboard
+
+    The respondents are selected once, and both charts narrow the selection
+    down to the rows they count. They are rendered in parallel by the render
+    pool, whose workers render a selection only at the dataset version it
+    was made from, see `render_pool.render_task`.
+
     Parameters:
     ----------
     age_slider (int):
         the range of survey respondent ages
     gender (str):
         the gender of the survey respondent
+    years (list, optional):
+        the survey years to include, by default all of them
 
     Returns:
     ----------
-    viz
-        the html plot
+    tuple
+        the specs of the work interference and remote work charts
     """
-    replace_dic = {
-        "Never": "Remote work: Never",
-        "Sometimes": "Remote work: Sometimes",
-        "Always": "Remote work: Always",
-    }
-    # Remove null values
-    remote_df = data[data["gender"].notnull()].copy()
-    remote_df["is_remote"].replace(replace_dic, inplace=True)
+    selected = hr_selection(respondent_filters(age_slider, gender, years))
+    return tuple(
+        render_pool.gather(
+            [(plot_work_interfere_bars, (selected,)), (plot_remote_work, (selected,))]
+        )
+    )
 
-    remote_df = remote_df.query("@age_slider[0] <= age <= @age_slider[1]")
 
-    # Default condition
-    if gender == "all":
-        remote_plot = (
-            alt.Chart(
-                remote_df,
-                title="Do employees that work remotely report fewer mental health issues?",
-            )
-                .mark_bar(color="#a39fc9")
-                .encode(
-                x=alt.X(
-                    "have_mental_helth_disorder",
-                    title="",
-                    axis=alt.Axis(labelAngle=-45),
-                    sort=["No", "Maybe", "Yes"],
-                ),
-                y=alt.Y(
-                    "count()",
-                    title="Number of Responses",
-                    scale=alt.Scale(domain=(0, 350)),
-                ),
-                column=alt.Column(
-                    "is_remote",
-                    title="",
-                    header=alt.Header(labelOrient="top"),
-                    sort=[
-                        "Remote work: Never",
-                        "Remote work: Sometimes",
-                        "Remote work: Always",
-                    ],
-                ),
-            )
-                .configure_header(labelFontSize=12)
-                .properties(height=220, width=170, background='#eeeeef')
-                .configure_title(fontSize=18, anchor="middle")
-        )
-    else:
-        # Selected Filter condition
-        remote_plot = (
-            alt.Chart(
-                remote_df[remote_df["gender"] == gender],
-                title="Do employees that work remotely report fewer mental health issues?",
-            )
-                .mark_bar(color="#a39fc9")
-                .encode(
-                x=alt.X(
-                    "have_mental_helth_disorder",
-                    title="",
-                    axis=alt.Axis(labelAngle=-45),
-                    sort=["No", "Maybe", "Yes"],
-                ),
-                y=alt.Y(
-                    "count()",
-                    title="Number of Responses",
-                    scale=alt.Scale(domain=(0, 350)),
+@render_cache.memoize
+def hr_count_cube():
+    """
+    Function that precomputes the HR tab counts for every age and gender
+
+    The cube lets the browser re-aggregate both HR charts for any slider and
+    gender selection. It is keyed by the id of the chart's container, and each
+    entry holds the chart's spec with a `"__DATASETS__"` placeholder
+    plus one set of count records per named dataset of the chart.
+
+    Returns:
+    ----------
+    dict
+        the data for the `hr_cube` store
+    """
+    data, index = store.data, store.index
+    work_rows = index.rows(exclude=WORK_INTERFERE_EXCLUSIONS)
+    remote_rows = index.rows(notnull=["gender"])
+    remote_counts = agg.count_cube(
+        data, ["is_remote", "have_mental_helth_disorder"], remote_rows
+    )
+    remote_counts["is_remote"] = remote_counts["is_remote"].cat.rename_categories(
+        agg.REMOTE_LABELS
+    )
+    return {
+        "work_interfere_barplot": {
+            "template": WORK_INTERFERE_TEMPLATE.fill(**work_interfere_orders()),
+            "cubes": {
+                "treated": agg.cube_records(
+                    agg.count_cube(data, ["work_interfere_treated"], work_rows)
                 ),
-                column=alt.Column(
-                    "is_remote",
-                    title="",
-                    header=alt.Header(labelOrient="top"),
-                    sort=[
-                        "Remote work: Never",
-                        "Remote work: Sometimes",
-                        "Remote work: Always",
-                    ],
+                "not_treated": agg.cube_records(
+                    agg.count_cube(data, ["work_interfere_not_treated"], work_rows)
                 ),
-            )
-                .configure_header(labelFontSize=12)
-                .properties(height=220, width=170, background='#eeeeef')
-                .configure_title(fontSize=18, anchor="middle")
-        )
+            },
+        },
+        "remote_barplot": {
+            "template": REMOTE_WORK_TEMPLATE.fill(**remote_work_orders()),
+            "cubes": {"remote": agg.cube_records(remote_counts)},
+        },
+    }
 
-    return remote_plot.to_html()
 
+if CLIENTSIDE_FILTERING:
+    app.clientside_callback(
+        ClientsideFunction(namespace="hr", function_name="render"),
+        Output("work_interfere_barplot_spec", "data"),
+        Input("age_slider", "value"),
+        Input("gender_selection", "value"),
+        Input("year_selection", "value"),
+        State("hr_cube", "data"),
+        State("work_interfere_barplot", "id"),
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="hr", function_name="render"),
+        Output("remote_barplot_spec", "data"),
+        Input("age_slider", "value"),
+        Input("gender_selection", "value"),
+        Input("year_selection", "value"),
+        State("hr_cube", "data"),
+        State("remote_barplot", "id"),
+    )
+else:
+    @app.callback(
+        Output("work_interfere_barplot_spec", "data"),
+        Output("remote_barplot_spec", "data"),
+        Input("age_slider", "value"),
+        Input("gender_selection", "value"),
+        Input("year_selection", "value"),
+    )
+    def show_hr_charts(age_slider, gender, years):
+        """
+        Function that shows both HR tab charts, from the bundle when they are pre-rendered
+
+        Returns:
+        ----------
+        list
+            the spec of each chart, or its url in the bundle
+        """
+        return bundle.specs(plot_hr_charts, age_slider, gender, sorted(years))
 
-COUNTRIES = ["United States of America", "United Kingdom", "Canada", "Germany"]
+
+# the vega views of the charts are kept in the browser, which applies data changes to them
+for chart_id in [
+    "gender_barplot",
+    "work_interfere_barplot",
+    "remote_barplot",
+    "explore_barplot",
+    "diagnosis_heatmap",
+]:
+    app.clientside_callback(
+        ClientsideFunction(namespace="vega", function_name="show"),
+        Output(chart_id, "title"),
+        Input(f"{chart_id}_spec", "data"),
+        State(chart_id, "id"),
+    )
+
+
+# the countries kept apart in the donut charts, all others are grouped as "Other"
+COUNTRIES = agg.top_countries(store.data, TOP_COUNTRIES)
+
+DONUT_COLUMNS = ["formal_discuss", "mental_health_benefits_employer", "mental_health_leave"]
+
+# answer counts per country bucket, updated as new responses are ingested
+for column in DONUT_COLUMNS:
+    store.register_table(
+        ("donut", column),
+        functools.partial(agg.country_answer_counts, column=column, countries=COUNTRIES),
+    )
 
 donut_chart_colors = ['#ccb22b', '#84d0c0', '#8175aa', '#027b8e', '#959c9e']
 
@@ -363,7 +995,7 @@ def formal_discuss_donut_chart(formal_discuss="No"):
         the html plot
     """
     column_name = "formal_discuss"
-    return build_graph(column_name, formal_discuss)
+    return bundle.figure(build_graph, column_name, formal_discuss)
 
 
 @app.callback(
@@ -385,7 +1017,7 @@ def mental_health_benefits_employer_donut_chart(mental_health_benefits_employer=
         the html plot
     """
     column_name = "mental_health_benefits_employer"
-    return build_graph(column_name, mental_health_benefits_employer)
+    return bundle.figure(build_graph, column_name, mental_health_benefits_employer)
 
 
 @app.callback(
@@ -407,9 +1039,11 @@ def mental_health_leave_donut_chart(mental_health_leave=""):
         the html plot
     """
     column_name = "mental_health_leave"
-    return build_graph(column_name, mental_health_leave)
+    return bundle.figure(build_graph, column_name, mental_health_leave)
 
 
+@render_cache.memoize
+@render_pool.offload
 def build_graph(column_name, column_input):
     """
     Helper function that build a donut chart
@@ -426,18 +1060,32 @@ def build_graph(column_name, column_input):
     viz
         a plotly plot
     """
-    subset_data = data[[column_name, "country"]].copy().dropna()
-    subset_data["countries"] = [
-        x if x in COUNTRIES else "Other" for x in subset_data["country"]
-    ]
-    normalize_countries = (
-        subset_data.groupby(["countries"])[column_name]
-            .value_counts(normalize=True)
-            .mul(100)
-            .unstack(column_name)
-            .reset_index()
-    )
-    labels = normalize_countries["countries"]
+    with metrics.stage("aggregate"):
+        normalize_countries = agg.answer_shares(store.tables[("donut", column_name)])
+    with metrics.stage("chart"):
+        return DONUT_TEMPLATE.render(
+            labels=list(normalize_countries.index),
+            values=normalize_countries[column_input].tolist(),
+        )
+
+
+def donut_chart(normalize_countries, column_input):
+    """
+    Helper function that builds a donut chart from the answer shares per country
+
+    Parameters:
+    ----------
+    normalize_countries (DataFrame):
+        percentage of every answer within each country bucket
+    column_input (str):
+        the answer whose shares are shown
+
+    Returns:
+    ----------
+    viz
+        a plotly plot
+    """
+    labels = normalize_countries.index
     values = normalize_countries[column_input]
     fig = go.Figure(data=[go.Pie(labels=labels, values=values, hole=0.44, sort=False,
                                  marker={'colors': donut_chart_colors})])
@@ -457,5 +1105,492 @@ def build_graph(column_name, column_input):
     )
 
 
+# plotly figure built once, only the slice labels and sizes vary per request
+DONUT_TEMPLATE = FigureTemplate(lambda: donut_chart(pd.DataFrame({"": []}), ""))
+
+
+# every survey question, each of which can be shown and grouped by in the explore tab
+EXPLORE_QUESTIONS = [column for column in feature_list.index if column != "age"]
+
+# the questions the aggregate api counts answers to, and groups by
+API_QUESTIONS = [*EXPLORE_QUESTIONS, "survey_year"]
+
+# contingency tables of every pair of questions, updated as new responses are ingested
+store.register_table("crosstabs", functools.partial(Crosstabs.count, columns=EXPLORE_QUESTIONS))
+
+
+def explore_chart(counts, title, group_title, answer_order, group_order):
+    """
+    Function that builds the explore bar chart from the answer counts per group
+
+    Parameters:
+    ----------
+    counts (DataFrame or NamedData):
+        responses per group and answer, see `Crosstabs.crosstab`
+    title (str):
+        the chart title
+    group_title (str):
+        the title of the group axis
+    answer_order (list):
+        the answers in display order
+    group_order (list):
+        the groups in display order
+
+    Returns:
+    ----------
+    viz
+        the altair chart
+    """
+    enable_theme()
+    return (
+        alt.Chart(counts, title=title)
+            .mark_bar()
+            .encode(
+            alt.X("count:Q", stack="normalize", axis=alt.Axis(format="%"), title="Share of responses"),
+            alt.Y("group:N", title=group_title, sort=group_order),
+            color=alt.Color(
+                "answer:N",
+                title="",
+                scale=alt.Scale(domain=answer_order, scheme="tableau20"),
+                legend=alt.Legend(orient="bottom", columns=3),
+            ),
+            order=alt.Order("answer_rank:Q"),
+            tooltip=[
+                alt.Tooltip("group:N", title="Group"),
+                alt.Tooltip("answer:N", title="Answer"),
+                alt.Tooltip("count:Q", title="Responses"),
+            ],
+        )
+            .configure_axis(labelFontSize=12, labelLimit=250)
+            .configure_title(fontSize=18, anchor="middle", color="black")
+            .properties(width=450, background='#eeeeef')
+    )
+
+
+EXPLORE_TEMPLATE = SpecTemplate(lambda: explore_chart(
+    alt.NamedData("counts"),
+    text_slot("title"),
+    text_slot("group_title"),
+    list_slot("answer_order"),
+    list_slot("group_order"),
+))
+
+
+@render_cache.memoize
+@render_pool.offload
+def plot_explore_chart(question, group="all", age_slider=[15, 65], gender="all", years=None):
+    """
+    Function that makes the visualization of the explore tab
+
+    The counts are reduced from the contingency table of the question and
+    the group, so the chart costs the same however many responses there are.
+
+    Parameters:
+    ----------
+    question (str):
+        the column name of the question whose answers are shown
+    group (str):
+        the column name of the question to group by, or "all"
+    age_slider (int):
+        the range of survey respondent ages
+    gender (str):
+        the gender of the survey respondent, or "all"
+    years (list, optional):
+        the survey years to include, by default all of them
+
+    Returns:
+    ----------
+    str
+        the chart spec as json
+    """
+    group = None if group in ("all", question) else group
+    with metrics.stage("aggregate"):
+        counts = store.tables["crosstabs"].crosstab(
+            question,
+            group,
+            age_range=tuple(age_slider),
+            genders=None if gender == "all" else [gender],
+            years=years,
+        )
+        answer_order = ds.category_order(store.data, question, missing=True)
+        rank = {answer: position for position, answer in enumerate(answer_order)}
+        counts["answer_rank"] = counts["answer"].map(rank)
+        if group is None:
+            group_order, group_title = ["All respondents"], ""
+        else:
+            group_order = ds.category_order(store.data, group, missing=True)
+            group_title = feature_list.loc[group]["variables3"]
+    with metrics.stage("serialize"):
+        return EXPLORE_TEMPLATE.render(
+            {"counts": counts},
+            title=f"{feature_list.loc[question]['variables2']}",
+            group_title=group_title,
+            answer_order=answer_order,
+            group_order=group_order,
+        )
+
+
+@app.callback(
+    Output("explore_barplot_spec", "data"),
+    Input("explore_question", "value"),
+    Input("explore_group", "value"),
+    Input("explore_age_slider", "value"),
+    Input("explore_gender_selection", "value"),
+    Input("explore_year_selection", "value"),
+)
+def show_explore_chart(question, group, age_slider, gender, years):
+    """
+    Function that shows the explore tab chart
+
+    Returns:
+    ----------
+    dict
+        the spec of the chart
+    """
+    [spec] = bundle.specs(plot_explore_chart, question, group, age_slider, gender, sorted(years))
+    return spec
+
+
+# the most frequent diagnoses shown in the co-occurrence chart
+DIAGNOSIS_LIMIT = 12
+
+
+def diagnosis_chart(pairs, diagnosis_order):
+    """
+    Function that builds the diagnosis co-occurrence heatmap
+
+    Parameters:
+    ----------
+    pairs (DataFrame or NamedData):
+        respondents per pair of diagnoses, see `agg.cooccurrence_pairs`
+    diagnosis_order (list):
+        the diagnoses in display order
+
+    Returns:
+    ----------
+    viz
+        the altair chart
+    """
+    enable_theme()
+    base = alt.Chart(
+        pairs, title="Share of respondents with a diagnosis (row) who also have another (column)"
+    ).encode(
+        alt.X("with:N", title="", sort=diagnosis_order, axis=alt.Axis(labelAngle=-45)),
+        alt.Y("diagnosis:N", title="", sort=diagnosis_order),
+    )
+    cells = base.mark_rect().encode(
+        color=alt.Color("pct:Q", title="", scale=alt.Scale(scheme="teals"), legend=alt.Legend(format="%")),
+        tooltip=[
+            alt.Tooltip("diagnosis:N", title="Diagnosis"),
+            alt.Tooltip("with:N", title="Also diagnosed with"),
+            alt.Tooltip("count:Q", title="Respondents"),
+            alt.Tooltip("pct:Q", title="Share", format=".1%"),
+        ],
+    )
+    labels = base.mark_text(fontSize=10).encode(
+        text="count:Q",
+        color=alt.condition("datum.pct > 0.5", alt.value("white"), alt.value("black")),
+    )
+    return (
+        (cells + labels)
+            .configure_axis(labelFontSize=12, labelLimit=250)
+            .configure_title(fontSize=18, anchor="middle", color="black")
+            .properties(width=500, height=500, background='#eeeeef')
+    )
+
+
+DIAGNOSIS_TEMPLATE = SpecTemplate(lambda: diagnosis_chart(
+    alt.NamedData("pairs"), list_slot("diagnosis_order")
+))
+
+
+@render_cache.memoize
+@render_pool.offload
+def plot_diagnosis_chart(diagnoses=(), age_slider=[15, 65], gender="all"):
+    """
+    Function that makes the visualization of the diagnoses tab
+
+    Parameters:
+    ----------
+    diagnoses (list):
+        only respondents diagnosed with any of these are counted, by default everyone
+    age_slider (int):
+        the range of survey respondent ages
+    gender (str):
+        the gender of the survey respondent, or "all"
+
+    Returns:
+    ----------
+    str
+        the chart spec as json
+    """
+    matrix = store.diagnoses
+    with metrics.stage("filter"):
+        rows = store.index.rows(**respondent_filters(age_slider, gender))
+        if diagnoses:
+            rows = rows[matrix.with_any(diagnoses)[rows]]
+    with metrics.stage("aggregate"):
+        names = list(matrix.frequencies().index[:DIAGNOSIS_LIMIT])
+        labels = [short_name(name) for name in names]
+        counts = matrix.cooccurrence(rows).loc[names, names].set_axis(labels).set_axis(labels, axis=1)
+        pairs = agg.cooccurrence_pairs(counts, labels)
+    with metrics.stage("serialize"):
+        return DIAGNOSIS_TEMPLATE.render({"pairs": pairs}, diagnosis_order=labels)
+
+
+@app.callback(
+    Output("diagnosis_heatmap_spec", "data"),
+    Input("diagnosis_selection", "value"),
+    Input("diagnosis_age_slider", "value"),
+    Input("diagnosis_gender_selection", "value"),
+)
+def show_diagnosis_chart(diagnoses, age_slider, gender):
+    """
+    Function that shows the diagnoses tab chart
+
+    Returns:
+    ----------
+    dict
+        the spec of the chart
+    """
+    [spec] = bundle.specs(plot_diagnosis_chart, sorted(diagnoses or []), age_slider, gender)
+    return spec
+
+
+# the ISO alpha-3 code of the outline of every survey country name
+COUNTRY_CODES = country_map.country_codes()
+
+# the questions whose answers can be mapped
+MAP_QUESTIONS = [column for column in EXPLORE_QUESTIONS if column != "country"]
+
+
+def country_map_chart():
+    """
+    Function that builds the choropleth map of the share of an answer per country
+
+    The outlines are loaded by the browser from the dashboard's own
+    geometry route, and located by their ISO code rather than by one of
+    the location modes of plotly.js. The first trace draws every country
+    in grey, the second colors the countries with respondents.
+
+    Returns:
+    ----------
+    viz
+        a plotly plot
+    """
+    codes = sorted(set(COUNTRY_CODES.values()))
+    outlines = dict(
+        geojson=country_map.GEO_URL,
+        featureidkey="properties.iso_a3",
+        locationmode="geojson-id",
+    )
+    fig = go.Figure(
+        data=[
+            go.Choropleth(
+                **outlines,
+                locations=codes,
+                z=[0] * len(codes),
+                colorscale=[[0, "#d9d9d9"], [1, "#d9d9d9"]],
+                showscale=False,
+                hoverinfo="skip",
+                marker_line_color="white",
+            ),
+            go.Choropleth(
+                **outlines,
+                locations=[],
+                z=[],
+                zmin=0,
+                zmax=1,
+                colorscale="Teal",
+                marker_line_color="white",
+                colorbar=dict(tickformat="%", thickness=15, len=0.7),
+                hovertemplate="%{text}<extra></extra>",
+            ),
+        ]
+    )
+    return fig.update_layout(
+        geo=dict(
+            visible=False,
+            projection_type="natural earth",
+            lataxis_range=[-58, 85],
+            bgcolor="#eeeeef",
+        ),
+        height=550,
+        margin=dict(r=0, l=0, b=0, t=0),
+        paper_bgcolor="#eeeeef",
+        annotations=[
+            dict(
+                text="",
+                x=0,
+                y=0,
+                xref="paper",
+                yref="paper",
+                xanchor="left",
+                yanchor="bottom",
+                showarrow=False,
+                align="left",
+                font_size=12,
+            )
+        ],
+        font_family="Helvetica",
+    )
+
+
+# plotly figure built once, only the countries and their shares vary per request
+MAP_TEMPLATE = FigureTemplate(country_map_chart, trace=1)
+
+
+def unmapped_note(unmapped):
+    """
+    Function that fills in the note of the map about the respondents it does not show
+
+    Parameters:
+    ----------
+    unmapped (pd.Series):
+        the number of respondents of every country without an outline
+
+    Returns:
+    ----------
+    dict
+        the annotation of the map template, with an empty text if every
+        respondent is on the map
+    """
+    [note] = MAP_TEMPLATE.figure["layout"]["annotations"]
+    unmapped = unmapped[unmapped > 0]
+    if unmapped.empty:
+        return note
+    countries = ", ".join(f"{country} ({count})" for country, count in unmapped.items())
+    return {**note, "text": f"Respondents not on the map: {countries}"}
+
+
+@render_cache.memoize
+@render_pool.offload
+def build_country_map(question, answer):
+    """
+    Function that makes the choropleth map of the map tab
+
+    The counts per country are taken from the contingency table of the
+    question and the country, so the map costs the same however many
+    responses there are. Respondents of countries without an outline,
+    like the "Other" bucket, are counted in a note below the map.
+
+    Parameters:
+    ----------
+    question (str):
+        the column name of the survey question
+    answer (str):
+        the answer whose share of the respondents of each country is shown
+
+    Returns:
+    ----------
+    dict
+        the figure
+    """
+    with metrics.stage("aggregate"):
+        counts = store.tables["crosstabs"].crosstab(question, "country")
+        on_map = counts["group"].isin(COUNTRY_CODES)
+        unmapped = counts[~on_map].groupby("group", sort=True)["count"].sum()
+        counts = counts[on_map]
+        totals = counts.groupby("group", sort=True)["count"].sum()
+        selected = counts[counts["answer"] == answer].set_index("group")["count"]
+        selected = selected.reindex(totals.index, fill_value=0)
+        shares = selected / totals
+    with metrics.stage("chart"):
+        return MAP_TEMPLATE.render(
+            locations=[COUNTRY_CODES[country] for country in totals.index],
+            z=shares.round(4).tolist(),
+            text=[
+                f"{country}<br>{share:.0%} of {total} respondents"
+                for country, share, total in zip(totals.index, shares, totals)
+            ],
+            layout={"annotations": [unmapped_note(unmapped)]},
+        )
+
+
+@app.callback(
+    Output("map_answer", "options"),
+    Output("map_answer", "value"),
+    Input("map_question", "value"),
+)
+def update_map_answers(question):
+    """
+    Function that lists the answers of the map tab question
+
+    Returns:
+    ----------
+    list, str
+        the answer options, and the first answer
+    """
+    answers = ds.category_order(store.data, question)
+    return [{"label": answer, "value": answer} for answer in answers], answers[0]
+
+
+@app.callback(
+    Output("country_map", "figure"),
+    Input("map_answer", "value"),
+    State("map_question", "value"),
+)
+def show_country_map(answer, question):
+    """
+    Function that shows the map tab chart
+
+    Returns:
+    ----------
+    dict
+        the figure
+    """
+    return bundle.figure(build_country_map, question, answer)
+
+
+# the input values kept as metric labels, as enumerated for the chart bundle
+INPUT_LABELS = input_labels(
+    widget_values(store.data, store.years(), feature_list, DONUT_COLUMNS)
+)
+
+
+def hr_inputs_class(age_slider, gender, years):
+    """
+    Function that labels the HR tab filters for the callback metrics
+
+    Returns:
+    ----------
+    str
+        the gender and whether the ages and survey years are narrowed down
+    """
+    ages = "all_ages" if list(age_slider) == [15, 65] else "age_range"
+    years = "all_years" if years is None or set(years) >= set(store.years()) else "some_years"
+    gender = gender if isinstance(gender, str) and gender in INPUT_LABELS else type(gender).__name__
+    return f"{gender},{ages},{years}"
+
+
+# runs after every callback is registered
+metrics.instrument(app, {"show_hr_charts": hr_inputs_class}, known_inputs=INPUT_LABELS)
+startup.timer.mark("app")
+
+
+def warm_up():
+    """
+    Function that does ahead of time what is otherwise done on first use
+
+    Compiles the chart templates, which imports altair and plotly's
+    figure classes, and loads the vega scripts. Run by the gunicorn
+    master with --preload, so workers share all of it.
+    """
+    for template in [
+        GENDER_TEMPLATE,
+        ALL_QUESTIONS_TEMPLATE,
+        WORK_INTERFERE_TEMPLATE,
+        REMOTE_WORK_TEMPLATE,
+        EXPLORE_TEMPLATE,
+        DIAGNOSIS_TEMPLATE,
+    ]:
+        template.spec
+    DONUT_TEMPLATE.figure
+    MAP_TEMPLATE.figure
+    for name in vega_assets.PACKAGES:
+        vega_assets.script(f"{name}.js")
+    startup.timer.mark("warm_up")
+
+
 if __name__ == "__main__":
     app.run_server(debug=False)
@@ -0,0 +1,45 @@
+// Clientside rendering of the HR Questions charts, used when the server runs
+// with CLIENTSIDE_FILTERING=1. The hr_cube store holds, per chart, a spec
+// template and count records [...answers, age, gender, year, count] for every
+// age, gender and survey year, so filter changes never reach the server.
+
+function sumCube(cube, ageSlider, gender, years) {
+    const totals = new Map();
+    for (const record of cube.records) {
+        const n = record.length;
+        const age = record[n - 4];
+        if (age < ageSlider[0] || age > ageSlider[1]) {
+            continue;
+        }
+        if (gender !== "all" && record[n - 3] !== gender) {
+            continue;
+        }
+        if (!years.includes(record[n - 2])) {
+            continue;
+        }
+        const key = JSON.stringify(record.slice(0, n - 4));
+        totals.set(key, (totals.get(key) || 0) + record[n - 1]);
+    }
+    return Array.from(totals, ([key, count]) => {
+        const row = {};
+        JSON.parse(key).forEach((value, i) => {
+            row[cube.fields[i]] = value;
+        });
+        row.count = count;
+        return row;
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    hr: {
+        render: function (ageSlider, gender, years, hrCube, chartId) {
+            const chart = hrCube[chartId];
+            const datasets = {};
+            for (const [name, cube] of Object.entries(chart.cubes)) {
+                datasets[name] = sumCube(cube, ageSlider, gender, years);
+            }
+            const spec = chart.template.replace('"__DATASETS__"', () => JSON.stringify(datasets));
+            return {spec: spec};
+        },
+    },
+});
@@ -0,0 +1,74 @@
+// Renders the vega-lite charts of the dashboard into their containers with
+// the Vega View API. Chart callbacks send the spec, either inline as
+// {spec: json} or as {url: ...} of a pre-rendered chart in the bundle. A
+// spec that only differs from the one on screen by its named datasets is
+// applied with view.change, so the view, its DOM and the runtime are kept;
+// anything else, e.g. another question on the y-axis, embeds a new view.
+
+const vegaCharts = new Map();
+
+function chartLayout(spec) {
+    const {datasets, ...layout} = spec;
+    return {datasets: datasets || {}, layout: JSON.stringify(layout)};
+}
+
+async function embedChart(el, spec) {
+    const result = await vegaEmbed(el, spec, {});
+    return result.view;
+}
+
+async function changeData(view, datasets) {
+    for (const [name, values] of Object.entries(datasets)) {
+        view.change(name, vega.changeset().remove(() => true).insert(values));
+    }
+    await view.runAsync();
+    return view;
+}
+
+async function showChart(payload, chartId) {
+    const chart = vegaCharts.get(chartId) || {update: 0};
+    vegaCharts.set(chartId, chart);
+    const update = ++chart.update;
+
+    let spec;
+    if (payload.url) {
+        const response = await fetch(payload.url);
+        spec = await response.json();
+    } else {
+        spec = JSON.parse(payload.spec);
+    }
+    const el = document.getElementById(chartId);
+    // a newer update arrived while the spec was being fetched
+    if (update !== chart.update || !el) {
+        return;
+    }
+
+    const {datasets, layout} = chartLayout(spec);
+    // the container is replaced when its tab is shown again
+    if (chart.el === el && chart.layout === layout) {
+        chart.view = chart.view.then(view => changeData(view, datasets));
+    } else {
+        if (chart.view) {
+            chart.view.then(view => view.finalize(), () => null);
+        }
+        chart.el = el;
+        chart.layout = layout;
+        chart.view = embedChart(el, spec);
+    }
+    chart.view.catch(error => {
+        // embed again on the next update
+        chart.layout = null;
+        console.error(error);
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    vega: {
+        show: function (payload, chartId) {
+            if (payload) {
+                showChart(payload, chartId);
+            }
+            return window.dash_clientside.no_update;
+        },
+    },
+});
@@ -0,0 +1,410 @@
+"""
+Benchmark of the dashboard callbacks on the real and on scaled synthetic survey data
+
+    python src/benchmark.py [--scales 1 10 100 1000] [--repeat N] [--sample N]
+                            [--out PATH] [--compare BASELINE]
+
+Every callback is called for every value of its inputs offered by the
+layout, with the render cache turned off. Latency percentiles, payload
+bytes and peak memory are reported for the whole callback, and latency
+for each of the stages it records with `metrics.stage` (filter,
+aggregate, chart, serialize). With `--pipeline`, every stage of
+src/preprocess.py is timed on a raw export of each scale too. Results are written as json,
+by default to reports/benchmarks/<commit>.json, and `--compare` prints
+the change against an earlier result file.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import app
+import preprocess
+from input_space import hr_filters, widget_values
+from metrics import collect_stages
+
+SCALES = [1, 10, 100, 1000]
+REPEAT = 3
+OUT_DIR = "reports/benchmarks"
+PERCENTILES = [50, 90, 99]
+
+# a p50 latency this many times the baseline's is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def synthetic_survey(data, scale, seed=0):
+    """
+    Function that generates a survey `scale` times the size of the real one
+
+    Respondents are drawn with replacement from the real responses, so the
+    answers follow the real joint distribution of every question.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    scale (int):
+        the size of the synthetic survey relative to `data`
+    seed (int):
+        seed of the random generator
+
+    Returns:
+    ----------
+    DataFrame
+        the synthetic categorized survey responses
+    """
+    if scale == 1:
+        return data
+    rows = np.random.default_rng(seed).integers(0, len(data), len(data) * scale)
+    return data.iloc[rows].reset_index(drop=True)
+
+
+def input_space(store):
+    """
+    Function that lists every combination of inputs of every benchmarked callback
+
+    Parameters:
+    ----------
+    store (SurveyStore):
+        the survey responses shown by the dashboard
+
+    Returns:
+    ----------
+    dict
+        callback name to a list of argument tuples
+    """
+    values = widget_values(store.data, store.years(), app.feature_list, app.DONUT_COLUMNS)
+    hr_inputs = hr_filters(values)
+    return {
+        "switch_tab": [(tab,) for tab in values["tabs"]],
+        "plot_gender_chart": [(q,) for q in values["questions"]],
+        "plot_all_gender_charts": [()],
+        "plot_work_interfere_bars": hr_inputs,
+        "plot_remote_work": hr_inputs,
+        "plot_hr_charts": hr_inputs,
+        "build_graph": values["donuts"],
+        "plot_diagnosis_chart": [
+            (diagnoses, age_range, gender)
+            for diagnoses in [[], *([name] for name in app.store.diagnoses.names)]
+            for age_range in [[15, 65]]
+            for gender in values["genders"]
+        ],
+        "build_country_map": [
+            (question, answer)
+            for question in app.MAP_QUESTIONS
+            for answer in store.data[question].cat.categories[:2]
+        ],
+        "plot_explore_chart": [
+            (question, group)
+            for question in app.EXPLORE_QUESTIONS
+            for group in ["all", *app.EXPLORE_QUESTIONS]
+            if group != question
+        ],
+    }
+
+
+def to_json(output):
+    """Function that serializes a callback output the way dash sends it."""
+    return json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def filtered(plot):
+    """Function that feeds the HR tab filter selection into an HR chart."""
+    def callback(age_slider, gender, years):
+        return plot(app.hr_selection(app.respondent_filters(age_slider, gender, years)))
+    return callback
+
+
+# every benchmarked callback; they time their own stages through `metrics.stage`
+CALLBACKS = {
+    # undoes dash's wrapping of the function, not the render cache around tab_layout
+    "switch_tab": app.switch_tab.__wrapped__,
+    "plot_gender_chart": app.plot_gender_chart,
+    "plot_all_gender_charts": app.plot_all_gender_charts,
+    "plot_work_interfere_bars": filtered(app.plot_work_interfere_bars),
+    "plot_remote_work": filtered(app.plot_remote_work),
+    "plot_hr_charts": app.plot_hr_charts,
+    "build_graph": app.build_graph,
+    "plot_explore_chart": app.plot_explore_chart,
+    "plot_diagnosis_chart": app.plot_diagnosis_chart,
+    "build_country_map": app.build_country_map,
+}
+
+
+class Recorder:
+    """
+    Collects the latencies, payload sizes and peak memory of benchmarked calls
+
+    Measurements are grouped by callback and stage, the whole callback
+    being the stage "total". Stages are collected from the callback itself,
+    as `Metrics` does for the dashboard, and dash's json encoding is the
+    stage "serialize" of callbacks that do not record it. Peak memory is
+    measured in separate calls made with `trace` set, as tracing
+    allocations slows everything down.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(list)
+        self.payloads = defaultdict(list)
+        self.peaks = defaultdict(int)
+        self.trace = False
+
+    @contextlib.contextmanager
+    def measure(self, callback, stage):
+        if self.trace:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            yield
+            peak = tracemalloc.get_traced_memory()[1] - before
+            self.peaks[callback, stage] = max(self.peaks[callback, stage], peak)
+            return
+        start = time.perf_counter()
+        yield
+        self.seconds[callback, stage].append(time.perf_counter() - start)
+
+    def call(self, name, args):
+        """Function that measures one call of a callback, as a whole and by stage."""
+        with collect_stages() as stages:
+            with self.measure(name, "total"):
+                output = CALLBACKS[name](*args)
+        if self.trace:
+            return
+        start = time.perf_counter()
+        payload = to_json(output)
+        stages.setdefault("serialize", time.perf_counter() - start)
+        for stage, seconds in stages.items():
+            self.seconds[name, stage].append(seconds)
+        self.payloads[name].append(len(payload))
+
+    def results(self, scale, rows):
+        """Function that summarizes the measurements as one record per callback and stage."""
+        records = []
+        for (callback, stage), seconds in self.seconds.items():
+            millis = np.array(seconds) * 1000
+            payloads = self.payloads.get(callback) if stage == "total" else None
+            records.append({
+                "scale": scale,
+                "rows": rows,
+                "callback": callback,
+                "stage": stage,
+                "calls": len(millis),
+                **{f"p{q}_ms": float(np.percentile(millis, q)) for q in PERCENTILES},
+                "mean_ms": float(millis.mean()),
+                "peak_bytes": self.peaks.get((callback, stage)),
+                "payload_bytes": float(np.mean(payloads)) if payloads else None,
+                "max_payload_bytes": int(max(payloads)) if payloads else None,
+            })
+        return records
+
+
+def sample(inputs, size):
+    """Function that picks `size` evenly spaced entries of a list of inputs."""
+    if not size or size >= len(inputs):
+        return inputs
+    return [inputs[i] for i in np.linspace(0, len(inputs) - 1, size).astype(int)]
+
+
+def benchmark_scale(data, scale, repeat=REPEAT, size=None, names=None):
+    """
+    Function that benchmarks the callbacks on a survey of the given scale
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the real categorized survey responses
+    scale (int):
+        the size of the benchmarked survey relative to `data`
+    repeat (int):
+        number of timed calls per combination of inputs
+    size (int, optional):
+        number of input combinations per callback, by default all of them
+    names (list, optional):
+        the callbacks to benchmark, by default all of them
+
+    Returns:
+    ----------
+    list
+        one record per callback and stage
+    """
+    # nothing is cached and nothing is sent to other processes, so every call renders here
+    app.render_cache.max_entries = 0
+    app.render_pool.workers = 0
+    recorder = Recorder()
+    synthetic = synthetic_survey(data, scale)
+    start = time.perf_counter()
+    app.store.replace(synthetic)
+    recorder.seconds["store", "build"].append(time.perf_counter() - start)
+
+    space = input_space(app.store)
+    for name in names or CALLBACKS:
+        inputs = sample(space[name], size)
+        recorder.call(name, inputs[0])  # warm up
+        for _ in range(repeat):
+            for args in inputs:
+                recorder.call(name, args)
+        recorder.trace = True
+        tracemalloc.start()
+        try:
+            for args in inputs:
+                recorder.call(name, args)
+        finally:
+            tracemalloc.stop()
+            recorder.trace = False
+    return recorder.results(scale, len(synthetic))
+
+
+def benchmark_pipeline(scale, raw=preprocess.RAW_PATH, chunksize=preprocess.CHUNKSIZE):
+    """
+    Function that times every stage of the preprocessing pipeline on a raw export of a given scale
+
+    The pipeline runs twice in a temporary directory: from scratch, and
+    again after an edit to the last response, when only the chunks holding
+    it are processed.
+
+    Parameters:
+    ----------
+    scale (int):
+        the size of the raw export relative to the real one
+    raw (str):
+        location of the real raw survey export
+    chunksize (int):
+        number of rows per chunk
+
+    Returns:
+    ----------
+    list
+        one record per stage and run, the run being the callback name
+    """
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as directory:
+        scaled = os.path.join(directory, "raw.csv")
+        responses = synthetic_survey(pd.read_csv(raw, encoding="utf-8"), scale)
+        responses.to_csv(scaled, index=False)
+        out_dir = os.path.join(directory, "processed")
+        for run in ["preprocess_cold", "preprocess_edit"]:
+            if run == "preprocess_edit":
+                responses.iloc[-1, responses.columns.get_loc("What is your age?")] = 44
+                responses.to_csv(scaled, index=False)
+            with recorder.measure(run, "total"):
+                timings = preprocess.run(scaled, out_dir=out_dir, chunksize=chunksize)
+            for stage, seconds in timings.items():
+                if seconds is not None:
+                    recorder.seconds[run, stage].append(seconds)
+    return recorder.results(scale, len(responses))
+
+
+def git_revision():
+    """Function that describes the checked out commit, e.g. `1a2b3c4` or `1a2b3c4-dirty`."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def compare(baseline, current, threshold=REGRESSION_RATIO):
+    """
+    Function that prints the change in p50 latency against an earlier run
+
+    Parameters:
+    ----------
+    baseline (dict):
+        the results of the earlier run
+    current (dict):
+        the results of this run
+    threshold (float):
+        the latency ratio above which a change counts as a regression
+
+    Returns:
+    ----------
+    list
+        the (scale, callback, stage) keys that regressed
+    """
+    key = lambda r: (r["scale"], r["callback"], r["stage"])
+    before = {key(r): r for r in baseline["results"]}
+    regressions = []
+    print(f"{'scale':>6} {'callback':<26} {'stage':<10} {'before':>10} {'after':>10} {'ratio':>7}")
+    for record in current["results"]:
+        old = before.get(key(record))
+        if old is None:
+            continue
+        ratio = record["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions.append(key(record))
+            flag = "  regression"
+        print(
+            f"{record['scale']:>6} {record['callback']:<26} {record['stage']:<10} "
+            f"{old['p50_ms']:>8.2f}ms {record['p50_ms']:>8.2f}ms {ratio:>7.2f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES,
+                        help="survey sizes relative to the real data")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help="timed calls per combination of inputs")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="input combinations per callback, by default all of them")
+    parser.add_argument("--callbacks", nargs="+", choices=list(CALLBACKS), default=None,
+                        help="callbacks to benchmark, by default all of them")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="also time the preprocessing pipeline at every scale")
+    parser.add_argument("--out", default=None, help="result file")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    data = app.store.data
+    results = []
+    for scale in args.scales:
+        print(f"benchmarking {scale}x ({len(data) * scale} responses)", file=sys.stderr)
+        results.extend(benchmark_scale(data, scale, args.repeat, args.sample, args.callbacks))
+        if args.pipeline:
+            results.extend(benchmark_pipeline(scale))
+    app.store.replace(data)
+
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sample": args.sample,
+        "results": results,
+    }
+    out = args.out or os.path.join(OUT_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
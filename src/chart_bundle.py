@@ -0,0 +1,243 @@
+"""
+Charts pre-rendered for the whole input space of the dashboard
+
+    python src/chart_bundle.py [--out-dir DIR] [--workers N]
+
+Every overview question, HR filter combination (with each single year or
+all years) and donut answer is rendered ahead of time by a pool of
+processes. Outputs are stored under their content hash, with a manifest
+mapping each callback input to its outputs. The server streams bundled
+specs straight from their files, loads bundled figures from the
+memory-mapped files and renders live only what the bundle does not
+cover, including everything after new responses are ingested.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+
+from render_cache import normalize
+
+BUNDLE_DIR = os.environ.get("CHART_BUNDLE_DIR", "data/bundle")
+MANIFEST_NAME = "manifest.json"
+OBJECTS_DIR = "objects"
+
+# route prefix of the bundled objects on the server
+URL_PREFIX = "/bundle/"
+
+MEDIA_TYPE = "application/json"
+
+_OBJECT_NAME = re.compile(r"^[0-9a-f]{64}\.json$")
+
+
+def chart_key(name, args):
+    """Function that identifies a rendered chart by its render function and inputs."""
+    return json.dumps([name, normalize(args)])
+
+
+class ChartBundle:
+    """
+    Pre-rendered charts of one dataset version, read from a bundle directory
+
+    Lookups only succeed while `version` equals the dataset version the
+    bundle was built from, so charts of newly ingested data are rendered
+    live. Files are memory-mapped on first use, which lets all gunicorn
+    workers share a single copy in the page cache.
+    """
+
+    def __init__(self, directory=BUNDLE_DIR, version=""):
+        self.directory = directory
+        self.version = version
+        self.bundle_version = None
+        self.charts = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+        manifest = os.path.join(directory, MANIFEST_NAME)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                content = json.load(f)
+            self.bundle_version = content["version"]
+            self.charts = content["charts"]
+
+    def lookup(self, name, *args):
+        """Function that returns the object names of a bundled chart, or None."""
+        if self.bundle_version != self.version:
+            return None
+        return self.charts.get(chart_key(name, args))
+
+    def path(self, object_name):
+        """Function that returns the file of a bundled object, or None."""
+        if not _OBJECT_NAME.match(object_name):
+            return None
+        path = os.path.join(self.directory, OBJECTS_DIR, object_name)
+        return path if os.path.exists(path) else None
+
+    def read(self, object_name):
+        """
+        Function that returns the content of a bundled object
+
+        Parameters:
+        ----------
+        object_name (str):
+            the content hash and extension of the object
+
+        Returns:
+        ----------
+        mmap or None
+            the memory-mapped file, or None if there is no such object
+        """
+        with self._lock:
+            if object_name not in self._maps:
+                path = self.path(object_name)
+                if path is None:
+                    return None
+                with open(path, "rb") as f:
+                    self._maps[object_name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._maps[object_name]
+
+    def specs(self, render, *args):
+        """
+        Function that returns the vega-lite specs of a chart callback for its chart containers
+
+        Parameters:
+        ----------
+        render (callable):
+            renders the spec(s) of the callback live, as json
+        *args:
+            the callback inputs
+
+        Returns:
+        ----------
+        list
+            per chart, `{"url": ...}` pointing at the bundle when the chart is
+            bundled and `{"spec": ...}` holding the live render otherwise
+        """
+        names = self.lookup(render.__name__, *args)
+        if names is not None:
+            return [{"url": URL_PREFIX + name} for name in names]
+        specs = render(*args)
+        if not isinstance(specs, tuple):
+            specs = (specs,)
+        return [{"spec": spec} for spec in specs]
+
+    def figure(self, render, *args):
+        """
+        Function that returns a bundled plotly figure, or renders it live
+
+        Bundled figures are parsed from their mapped file on every call, so
+        the bundle holds no copy of them in memory.
+
+        Parameters:
+        ----------
+        render (callable):
+            renders the figure live
+        *args:
+            the callback inputs
+
+        Returns:
+        ----------
+        dict or Figure
+            the figure
+        """
+        names = self.lookup(render.__name__, *args)
+        if names is None:
+            return render(*args)
+        return json.loads(self.read(names[0])[:])
+
+
+def serialize(output):
+    """Function that converts a rendered spec or figure to the bytes of its object."""
+    if isinstance(output, str):
+        return output.encode("utf-8")
+    return json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder).encode("utf-8")
+
+
+def render_variant(task):
+    """Function that renders one chart variant in a worker process."""
+    import app
+
+    name, args = task
+    output = inspect.unwrap(getattr(app, name))(*args)
+    outputs = output if isinstance(output, tuple) else (output,)
+    return name, args, [serialize(output) for output in outputs]
+
+
+def write_atomic(path, content):
+    partial = f"{path}.part"
+    with open(partial, "wb") as f:
+        f.write(content)
+    os.replace(partial, path)
+
+
+def build(out_dir=BUNDLE_DIR, workers=None):
+    """
+    Function that renders every chart variant into a bundle directory
+
+    Parameters:
+    ----------
+    out_dir (str):
+        the bundle directory, existing objects are reused
+    workers (int, optional):
+        number of rendering processes, by default one per cpu
+
+    Returns:
+    ----------
+    dict
+        the manifest of the bundle
+    """
+    import app
+    from input_space import hr_filters, widget_values
+
+    store = app.store
+    values = widget_values(store.data, store.years(), app.feature_list, app.DONUT_COLUMNS)
+    tasks = [
+        *(("plot_gender_chart", (q,)) for q in values["questions"]),
+        ("plot_all_gender_charts", ()),
+        *(("plot_hr_charts", args) for args in hr_filters(values)),
+        *(("build_graph", args) for args in values["donuts"]),
+    ]
+
+    objects = os.path.join(out_dir, OBJECTS_DIR)
+    os.makedirs(objects, exist_ok=True)
+    charts = {}
+    with ProcessPoolExecutor(workers) as pool:
+        for name, args, outputs in pool.map(render_variant, tasks, chunksize=8):
+            names = []
+            for content in outputs:
+                object_name = hashlib.sha256(content).hexdigest() + ".json"
+                path = os.path.join(objects, object_name)
+                if not os.path.exists(path):
+                    write_atomic(path, content)
+                names.append(object_name)
+            charts[chart_key(name, args)] = names
+
+    manifest = {"version": store.version, "charts": charts}
+    write_atomic(
+        os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode("utf-8")
+    )
+    used = {name for names in charts.values() for name in names}
+    for name in os.listdir(objects):
+        if name not in used:
+            os.remove(os.path.join(objects, name))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out-dir", default=BUNDLE_DIR, help="bundle directory")
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes")
+    args = parser.parse_args()
+    manifest = build(args.out_dir, args.workers)
+    objects = {name for names in manifest["charts"].values() for name in names}
+    print(f"{len(manifest['charts'])} charts, {len(objects)} objects in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
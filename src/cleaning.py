@@ -0,0 +1,171 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# survey questions answered with 0/1 in the raw data
+BINARY_COLUMNS = ["self_employed", "tech_org", "treatment", "tech_role", "medical_coverage"]
+
+# free-text gender answers are matched in this order, later rules win
+GENDER_RULES = [
+    (r"^\s*[Ff]emale", "Female"),
+    (r"^[Ww]oman", "Female"),
+    (r"^[Ff]$", "Female"),
+    (r"^[Mm]ale", "Male"),
+    (r"^[Mm]ALE", "Male"),
+    (r"^[Mm]$", "Male"),
+    (r"^[Mm]an", "Male"),
+    (r"^[Mm]ail", "Male"),
+    (r"^nan", np.nan),
+    (r"M\|", "Male"),
+    (r"[^Male|Female]", "Other"),
+]
+
+ANSWER_RENAMES = {
+    "mental_health_benefits_healthcare": {
+        "Not eligible for coverage / N/A": "Not eligible for coverage",
+    },
+}
+
+
+def normalize_question(text):
+    """
+    Function that reduces a survey question to a comparable form
+
+    Survey exports differ in html emphasis tags, non-breaking spaces (also
+    when mis-decoded as "¬†"), whitespace and capitalization.
+
+    Parameters:
+    ----------
+    text (str):
+        the question text of a survey column
+
+    Returns:
+    ----------
+    str
+        the normalized question
+    """
+    text = re.sub(r"<[^>]+>", "", text)
+    text = text.replace("¬†", " ").replace("\xa0", " ")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def rename_questions(raw, question_map):
+    """
+    Function that selects the known survey questions and renames them to column names
+
+    Parameters:
+    ----------
+    raw (DataFrame):
+        survey responses with the question texts as column names
+    question_map (dict):
+        normalized question text to column name
+
+    Returns:
+    ----------
+    DataFrame
+        the known questions, renamed and in the order of `question_map`
+    """
+    columns = {normalize_question(question): question for question in raw.columns}
+    selected = {
+        columns[question]: column
+        for question, column in question_map.items()
+        if question in columns
+    }
+    renamed = raw[list(selected)].rename(columns=selected)
+    # several wordings of a question map to the same column
+    return renamed.reindex(columns=list(dict.fromkeys(question_map.values())))
+
+
+def normalize_gender(gender, known=None):
+    """
+    Function that groups free-text gender answers into Male, Female and Other
+
+    The rules are evaluated on the distinct answers only and the result is
+    mapped back onto every respondent.
+
+    Parameters:
+    ----------
+    gender (Series):
+        the raw gender answers
+    known (dict, optional):
+        answers already grouped, e.g. in earlier chunks; updated in place
+
+    Returns:
+    ----------
+    Series
+        "Male", "Female" or "Other" for every respondent
+    """
+    known = {} if known is None else known
+    distinct = pd.Series(
+        [answer for answer in gender.dropna().unique() if answer not in known], dtype=object
+    )
+    cleaned = distinct.copy()
+    for pattern, value in GENDER_RULES:
+        cleaned = cleaned.mask(cleaned.str.contains(pattern, na=False), value)
+    known.update(zip(distinct, cleaned.fillna("Other")))
+    return gender.map(known).fillna("Other")
+
+
+def clean_responses(raw, question_map, known_genders=None):
+    """
+    Function that renames the questions and cleans up the free-text answers
+
+    Parameters:
+    ----------
+    raw (DataFrame):
+        survey responses with the question texts as column names
+    question_map (dict):
+        normalized question text to column name
+    known_genders (dict, optional):
+        gender answers already grouped, see `normalize_gender`
+
+    Returns:
+    ----------
+    DataFrame
+        the cleaned survey responses, with binary answers still as 1/0
+    """
+    clean = rename_questions(raw, question_map)
+    clean["gender"] = normalize_gender(clean["gender"], known_genders)
+    for column, renames in ANSWER_RENAMES.items():
+        clean[column] = clean[column].replace(renames)
+    return clean
+
+
+def reformat_answers(clean):
+    """
+    Function that spells out binary answers
+
+    Parameters:
+    ----------
+    clean (DataFrame):
+        survey responses with column names
+
+    Returns:
+    ----------
+    DataFrame
+        the responses with "Yes"/"No" instead of 1/0
+    """
+    clean = clean.copy()
+    for column in BINARY_COLUMNS:
+        clean[column] = clean[column].replace({1: "Yes", 0: "No"})
+    return clean
+
+
+def clean_survey(raw, question_map):
+    """
+    Function that turns a raw survey export into the processed dataset
+
+    Parameters:
+    ----------
+    raw (DataFrame):
+        survey responses with the question texts as column names
+    question_map (dict):
+        normalized question text to column name
+
+    Returns:
+    ----------
+    DataFrame
+        the processed survey responses
+    """
+    return reformat_answers(clean_responses(raw, question_map))
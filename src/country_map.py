@@ -0,0 +1,123 @@
+"""
+Country geometry of the choropleth map
+
+data/geo/countries.geojson holds the country outlines of Natural Earth's
+1:110m cultural vectors (public domain), with coordinates rounded to 0.01
+degree and each feature's `name` and ISO 3166-1 alpha-3 code `iso_a3`.
+Rings are wound clockwise as plotly.js expects. The file is served by the
+dashboard itself, so the map needs no network access.
+
+plotly.js also loads the topojson of its base layers (land, coastlines...)
+for every geo subplot whose traces have a `locationmode`, which
+choropleths drawn from geojson always have. Its default source is the
+plotly cdn, so the dashboard serves a topology built from the same
+geometry under `TOPOJSON_URL`, and the map graph points plotly.js to it.
+"""
+import functools
+import hashlib
+import json
+
+GEO_PATH = "data/geo/countries.geojson"
+
+# route of the geometry on the server
+GEO_URL = "/geo/countries.geojson"
+
+# route prefix of the topojson of the base layers, plotly.js's `topojsonURL`
+TOPOJSON_URL = "/geo/"
+
+# the file plotly.js loads for the world scope at its default resolution
+TOPOJSON_NAME = "world_110m.json"
+
+# the layers of plotly.js's topojson files
+BASE_LAYERS = ["land", "ocean", "lakes", "rivers", "coastlines", "countries", "subunits"]
+
+# survey country names that Natural Earth spells differently
+NAME_ALIASES = {
+    "Bosnia and Herzegovina": "Bosnia and Herz.",
+    "Czech Republic": "Czechia",
+    "Dominican Republic": "Dominican Rep.",
+    "Russian Federation": "Russia",
+    "Viet Nam": "Vietnam",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def geometry(path=GEO_PATH):
+    """Function that returns the content of the geometry file."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def topology(path=GEO_PATH):
+    """
+    Function that converts the geometry into the topojson of plotly.js's base layers
+
+    Every ring becomes an arc of its own, borders are not shared. The
+    land, coastline and country layers are drawn from the country
+    outlines, the other layers are empty.
+
+    Parameters:
+    ----------
+    path (str):
+        location of the geometry file
+
+    Returns:
+    ----------
+    bytes
+        the topojson
+    """
+    arcs = []
+
+    def ring_arcs(rings):
+        indices = list(range(len(arcs), len(arcs) + len(rings)))
+        arcs.extend(rings)
+        return [[index] for index in indices]
+
+    countries = []
+    for feature in json.loads(geometry(path))["features"]:
+        shape = feature["geometry"]
+        if shape["type"] == "Polygon":
+            shape_arcs = ring_arcs(shape["coordinates"])
+        else:
+            shape_arcs = [ring_arcs(polygon) for polygon in shape["coordinates"]]
+        countries.append(
+            {"type": shape["type"], "arcs": shape_arcs, "id": feature["properties"]["iso_a3"]}
+        )
+    outlines = {"type": "GeometryCollection", "geometries": countries}
+    empty = {"type": "GeometryCollection", "geometries": []}
+    layers = {"land": outlines, "coastlines": outlines, "countries": outlines}
+    topojson = {
+        "type": "Topology",
+        "arcs": arcs,
+        "objects": {layer: layers.get(layer, empty) for layer in BASE_LAYERS},
+    }
+    return json.dumps(topojson, separators=(",", ":")).encode("utf-8")
+
+
+def etag(content):
+    return hashlib.sha1(content).hexdigest()[:16]
+
+
+def country_codes(path=GEO_PATH):
+    """
+    Function that maps country names to the codes of their outlines
+
+    Parameters:
+    ----------
+    path (str):
+        location of the geometry file
+
+    Returns:
+    ----------
+    dict
+        the ISO alpha-3 code of every country name of the geometry, and
+        of the survey spellings in `NAME_ALIASES`
+    """
+    features = json.loads(geometry(path))["features"]
+    codes = {
+        feature["properties"]["name"]: feature["properties"]["iso_a3"] for feature in features
+    }
+    for survey_name, name in NAME_ALIASES.items():
+        codes[survey_name] = codes[name]
+    return codes
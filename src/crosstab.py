@@ -0,0 +1,268 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from dataset import NO_RESPONSE
+
+# respondent attributes every contingency table is broken down by, so that
+# filtering on them is a reduction of the table rather than a scan of the data
+FILTER_COLUMNS = ["age", "gender", "survey_year"]
+
+
+def column_codes(data, column):
+    """
+    Function that returns the answer codes and the answers of a column
+
+    Unanswered questions get the code after the last answer, so that they
+    are counted too.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    column (str):
+        the column name
+
+    Returns:
+    ----------
+    tuple
+        the codes of every respondent and the list of answers
+    """
+    values = data[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    categories = list(values.cat.categories)
+    codes = values.cat.codes.to_numpy().astype(np.int64)
+    return np.where(codes < 0, len(categories), codes), categories
+
+
+class Contingency:
+    """
+    Respondent counts per combination of answers to a few columns
+
+    Only the observed combinations are stored, as indices into the array
+    of every combination (with one extra code per column for unanswered
+    questions), so the size depends on the answers, not the respondents.
+    """
+
+    def __init__(self, columns, categories, index, counts):
+        self.columns = columns
+        self.categories = categories
+        self.index = index
+        self.counts = counts
+
+    @property
+    def shape(self):
+        return tuple(len(c) + 1 for c in self.categories)
+
+    @classmethod
+    def count(cls, columns, categories, flat):
+        """
+        Function that counts the respondents per combination of answers
+
+        Parameters:
+        ----------
+        columns (list):
+            the column names
+        categories (list):
+            the answers of every column
+        flat (ndarray):
+            the index of the combination of answers of every respondent
+
+        Returns:
+        ----------
+        Contingency
+            the counts of the observed combinations
+        """
+        size = int(np.prod([len(c) + 1 for c in categories]))
+        if size <= 4 * len(flat) + 1024:
+            counts = np.bincount(flat, minlength=size)
+            index = np.flatnonzero(counts)
+            counts = counts[index]
+        else:
+            index, counts = np.unique(flat, return_counts=True)
+        return cls(columns, categories, index, counts)
+
+    def recoded(self, categories):
+        """Function that returns the same counts against longer answer lists."""
+        if categories == self.categories:
+            return self
+        codes = []
+        for old, new, old_codes in zip(
+            self.categories, categories, np.unravel_index(self.index, self.shape)
+        ):
+            position = {answer: code for code, answer in enumerate(new)}
+            mapping = np.array([position[answer] for answer in old] + [len(new)])
+            codes.append(mapping[old_codes])
+        shape = tuple(len(c) + 1 for c in categories)
+        return Contingency(self.columns, categories, np.ravel_multi_index(codes, shape), self.counts)
+
+    def add(self, other):
+        """Function that returns the counts of both tables, against the answers of both."""
+        categories = [
+            [*mine, *(answer for answer in theirs if answer not in set(mine))]
+            for mine, theirs in zip(self.categories, other.categories)
+        ]
+        first, second = self.recoded(categories), other.recoded(categories)
+        index, inverse = np.unique(
+            np.concatenate([first.index, second.index]), return_inverse=True
+        )
+        counts = np.bincount(inverse, weights=np.concatenate([first.counts, second.counts]))
+        return Contingency(self.columns, categories, index, counts.astype(np.int64))
+
+
+class Crosstabs:
+    """
+    Contingency tables of every pair of survey questions
+
+    Each table counts the respondents per answer to both questions, age,
+    gender and survey year, so any question by any grouping, under any
+    filter on age, gender and year, is a lookup and a small reduction,
+    however many responses there are.
+
+    Every table is counted when the tables are created, in one pass over
+    the answer codes per pair, and the codes are not kept: a query never
+    scans the responses.
+
+    Tables are additive: `add` merges the tables of another batch of
+    responses, which lets `SurveyStore` extend them as batches arrive.
+    """
+
+    def __init__(self, columns, tables):
+        self.columns = columns
+        self.tables = tables
+
+    @classmethod
+    def count(cls, data, columns):
+        """
+        Function that builds the contingency tables of every pair of questions
+
+        Parameters:
+        ----------
+        data (DataFrame):
+            the categorized survey responses
+        columns (list):
+            the column names of the survey questions
+
+        Returns:
+        ----------
+        Crosstabs
+            the tables, keyed by question pairs in the order of `columns`
+        """
+        coded = {column: column_codes(data, column) for column in [*columns, *FILTER_COLUMNS]}
+        # the filter columns come last in most tables, where they add the
+        # same offset to the index of every respondent
+        filter_codes = [coded[column][0] for column in FILTER_COLUMNS]
+        filter_shape = tuple(len(coded[column][1]) + 1 for column in FILTER_COLUMNS)
+        offset = np.ravel_multi_index(filter_codes, filter_shape)
+        stride = int(np.prod(filter_shape))
+        tables = {}
+        for pair in itertools.combinations(columns, 2):
+            dimensions = [*pair, *(c for c in FILTER_COLUMNS if c not in pair)]
+            categories = [coded[column][1] for column in dimensions]
+            if len(dimensions) == 2 + len(FILTER_COLUMNS):
+                (first, _), (second, answers) = coded[pair[0]], coded[pair[1]]
+                flat = (first * (len(answers) + 1) + second) * stride + offset
+            else:
+                flat = np.ravel_multi_index(
+                    [coded[column][0] for column in dimensions],
+                    tuple(len(c) + 1 for c in categories),
+                )
+            tables[pair] = Contingency.count(dimensions, categories, flat)
+        return cls(list(columns), tables)
+
+    def table(self, question, other):
+        """
+        Function that returns the contingency table of two questions
+
+        Parameters:
+        ----------
+        question (str):
+            the column name of a question
+        other (str):
+            the column name of another question
+
+        Returns:
+        ----------
+        Contingency
+            the table, whose first two dimensions are the questions in the
+            order of `columns`
+        """
+        table = self.tables.get((question, other)) or self.tables.get((other, question))
+        if table is None:
+            raise KeyError(f"no contingency table for {question} and {other}")
+        return table
+
+    def add(self, other):
+        """Function that returns the tables of both sets of responses."""
+        tables = {pair: table.add(other.tables[pair]) for pair, table in self.tables.items()}
+        return Crosstabs(self.columns, tables)
+
+    def questions(self):
+        """Function that lists the questions with tables, in their order."""
+        return list(self.columns)
+
+    def crosstab(self, question, group=None, age_range=None, genders=None, years=None):
+        """
+        Function that counts the answers to a question per answer to another
+
+        Parameters:
+        ----------
+        question (str):
+            the column name of the question
+        group (str, optional):
+            the column name of the question to group by, by default everyone
+            is in the same group
+        age_range (tuple, optional):
+            the inclusive range of respondent ages, by default all ages
+        genders (list, optional):
+            the genders to include, by default all of them
+        years (list, optional):
+            the survey years to include, by default all of them
+
+        Returns:
+        ----------
+        DataFrame
+            one row per group and answer with the columns `group`, `answer`
+            and `count`, unanswered questions included as `NO_RESPONSE`
+        """
+        if question == group:
+            raise ValueError(f"cannot group {question} by itself")
+        partner = group
+        if partner is None:
+            partner = next(q for q in self.questions() if q != question)
+        table = self.table(question, partner)
+
+        codes = dict(zip(table.columns, np.unravel_index(table.index, table.shape)))
+        answers = dict(zip(table.columns, table.categories))
+        keep = np.ones(len(table.counts), dtype=bool)
+        filters = {"age": None, "gender": genders, "survey_year": years}
+        if age_range is not None:
+            filters["age"] = [a for a in answers["age"] if age_range[0] <= a <= age_range[1]]
+        for column, allowed in filters.items():
+            if allowed is not None:
+                allowed = set(allowed)
+                lookup = np.array([answer in allowed for answer in answers[column]] + [False])
+                keep &= lookup[codes[column]]
+
+        answer_labels = [*answers[question], NO_RESPONSE]
+        if group is None:
+            group_codes, group_labels = np.zeros(keep.sum(), dtype=np.int64), ["All respondents"]
+        else:
+            group_codes, group_labels = codes[group][keep], [*answers[group], NO_RESPONSE]
+        shape = (len(group_labels), len(answer_labels))
+        cells = np.bincount(
+            np.ravel_multi_index([group_codes, codes[question][keep]], shape),
+            weights=table.counts[keep],
+            minlength=shape[0] * shape[1],
+        )
+        observed = np.flatnonzero(cells)
+        group_codes, answer_codes = np.unravel_index(observed, shape)
+        return pd.DataFrame(
+            {
+                "group": np.array(group_labels, dtype=object)[group_codes],
+                "answer": np.array(answer_labels, dtype=object)[answer_codes],
+                "count": cells[observed].astype(np.int64),
+            }
+        )
@@ -0,0 +1,184 @@
+import pandas as pd
+
+DATA_PATH = "data/processed/mental_health_clean_reformat.csv"
+FEATURES_PATH = "data/processed/features_list.csv"
+
+NO_RESPONSE = "No response"
+
+# survey year of the responses in DATA_PATH
+BASE_YEAR = 2016
+
+YES_NO = ["Yes", "No"]
+YES_MAYBE_NO = ["Yes", "Maybe", "No"]
+YES_NO_DONT_KNOW = ["Yes", "No", "I don't know"]
+WORK_INTERFERE = ["Never", "Rarely", "Sometimes", "Often", "Not applicable to me"]
+
+# ordering of the answers to every survey question, shared by all charts
+CATEGORY_ORDER = {
+    "self_employed": YES_NO,
+    "num_employees": [
+        "1-5",
+        "6-25",
+        "26-100",
+        "100-500",
+        "500-1000",
+        "More than 1000",
+    ],
+    "tech_org": YES_NO,
+    "mental_health_benefits_healthcare": [
+        "Yes",
+        "No",
+        "Not eligible for coverage",
+        "I don't know",
+    ],
+    "mental_health_resources": YES_NO_DONT_KNOW,
+    "mental_health_leave": [
+        "Very easy",
+        "Somewhat easy",
+        "Neither easy nor difficult",
+        "Somewhat difficult",
+        "Very difficult",
+        "I don't know",
+    ],
+    "mental_disorder_discuss": YES_MAYBE_NO,
+    "health_disorder_discuss": YES_MAYBE_NO,
+    "discuss_coworker": YES_MAYBE_NO,
+    "discuss_supervisor": YES_MAYBE_NO,
+    "online_resources": [
+        "Yes, I know several",
+        "I know some",
+        "No, I don't know any",
+    ],
+    "productivity": ["Yes", "No", "Unsure", "Not applicable to me"],
+    "productivity_percent": ["1-25%", "26-50%", "51-75%", "76-100%"],
+    "have_mental_helth_disorder": YES_MAYBE_NO,
+    "treatment": YES_NO,
+    "work_interfere_treated": WORK_INTERFERE,
+    "work_interfere_not_treated": WORK_INTERFERE,
+    "gender": ["Male", "Female", "Other"],
+    "is_remote": ["Never", "Sometimes", "Always"],
+    "tech_role": YES_NO,
+    "mental_health_benefits_employer": ["Yes", "No", "I am not sure"],
+    "formal_discuss": YES_NO_DONT_KNOW,
+    "anonymity": YES_NO_DONT_KNOW,
+    "mental_vs_physical": YES_NO_DONT_KNOW,
+    "medical_coverage": YES_NO,
+    "career_effect": [
+        "Yes, it has",
+        "Yes, I think it would",
+        "Maybe",
+        "No, I don't think it would",
+        "No, it has not",
+    ],
+    "family_history": YES_NO_DONT_KNOW,
+}
+
+AGE_DTYPE = "int16"
+
+
+def categorize(frame):
+    """
+    Function that converts every survey column of a frame to an ordered Categorical
+
+    Parameters:
+    ----------
+    frame (DataFrame):
+        survey responses with string answers
+
+    Returns:
+    ----------
+    DataFrame
+        the same responses, with answers ordered as in `CATEGORY_ORDER` followed
+        by any unlisted answers in alphabetical order, and `age` as `AGE_DTYPE`
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        if column == "age":
+            frame[column] = frame[column].astype(AGE_DTYPE)
+            continue
+        values = frame[column].astype("category")
+        known = CATEGORY_ORDER.get(column, [])
+        extra = sorted(c for c in values.cat.categories if c not in known)
+        frame[column] = values.cat.set_categories(known + extra, ordered=True)
+    return frame
+
+
+def category_order(data, column, missing=False):
+    """
+    Function that returns the display order of the answers to a question
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    column (str):
+        the column name of the survey question
+    missing (bool):
+        whether to append the label used for unanswered questions
+
+    Returns:
+    ----------
+    list
+        the answers in display order
+    """
+    order = list(data[column].cat.categories)
+    if missing:
+        order.append(NO_RESPONSE)
+    return order
+
+
+def combine(data, batch):
+    """
+    Function that appends categorized responses to the survey
+
+    Answers first seen in `batch` are added after the existing categories, so
+    the category codes of the rows already in `data` stay valid.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    batch (DataFrame):
+        categorized responses with the same columns
+
+    Returns:
+    ----------
+    DataFrame
+        the responses of `data` followed by those of `batch`
+    """
+    data, batch = data.copy(), batch[data.columns].copy()
+    for column in data.columns:
+        if column == "age":
+            continue
+        known = data[column].cat.categories
+        new = [c for c in batch[column].cat.categories if c not in known]
+        if new:
+            data[column] = data[column].cat.add_categories(new)
+        batch[column] = batch[column].cat.set_categories(data[column].cat.categories)
+    return pd.concat([data, batch], ignore_index=True)
+
+
+def load_survey(path=DATA_PATH, year=BASE_YEAR):
+    """
+    Function that loads the processed survey with integer-coded categorical answers
+
+    Parameters:
+    ----------
+    path (str):
+        location of the processed survey csv
+    year (int):
+        the survey year of the responses
+
+    Returns:
+    ----------
+    DataFrame
+        the categorized survey responses with a `survey_year` column
+    """
+    return categorize(pd.read_csv(path).assign(survey_year=year))
+
+
+def load_features(path=FEATURES_PATH):
+    """
+    Function that loads the survey question descriptions indexed by column name
+    """
+    return pd.read_csv(path, encoding="utf-8").set_index("variables")
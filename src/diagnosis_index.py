@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DIAGNOSIS_COLUMN = "mental_health_diagnosis"
+
+# separates the diagnoses of a respondent in DIAGNOSIS_COLUMN
+SEPARATOR = "|"
+
+
+def short_name(name):
+    """Function that drops the examples in parentheses from a diagnosis, for labels."""
+    return name.split(" (")[0]
+
+
+def split_answers(answers, names):
+    """
+    Function that maps answers listing several diagnoses onto diagnosis indicators
+
+    Parameters:
+    ----------
+    answers (list):
+        the distinct answers, e.g. "Mood Disorder (...)|Anxiety Disorder (...)"
+    names (list):
+        the diagnoses seen so far, extended in place with new ones
+
+    Returns:
+    ----------
+    csr_matrix
+        one row per answer and one column per diagnosis in `names`
+    """
+    positions = {name: column for column, name in enumerate(names)}
+    rows, columns = [], []
+    for row, answer in enumerate(answers):
+        for name in dict.fromkeys(part.strip() for part in answer.split(SEPARATOR)):
+            if not name:
+                continue
+            if name not in positions:
+                positions[name] = len(names)
+                names.append(name)
+            rows.append(row)
+            columns.append(positions[name])
+    return sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=(len(answers), len(names))
+    )
+
+
+class DiagnosisMatrix:
+    """
+    Sparse respondent by diagnosis indicator matrix
+
+    Only the distinct answers of the diagnosis column are split, and each
+    respondent's row is picked from them by its category code, so loading
+    and appending never split a string per respondent. Respondents with a
+    set of diagnoses, and how often diagnoses occur together, are then
+    sparse matrix products.
+    """
+
+    def __init__(self, data, column=DIAGNOSIS_COLUMN):
+        self.column = column
+        self.names = []
+        self.matrix = self._respondents(data)
+
+    def _respondents(self, data):
+        values = data[self.column]
+        answers = split_answers(list(values.cat.categories), self.names)
+        codes = values.cat.codes.to_numpy()
+        answered = codes >= 0
+        # one-hot matrix of every respondent's answer, empty when unanswered
+        onehot = sparse.csr_matrix(
+            (
+                np.ones(answered.sum(), dtype=np.int32),
+                codes[answered],
+                np.concatenate([[0], np.cumsum(answered)]),
+            ),
+            shape=(len(codes), answers.shape[0]),
+        )
+        return (onehot @ answers).tocsr()
+
+    def appended(self, batch):
+        """
+        Function that returns a matrix covering the indexed rows followed by `batch`
+
+        Parameters:
+        ----------
+        batch (DataFrame):
+            new survey responses, categorized consistently with the indexed ones
+
+        Returns:
+        ----------
+        DiagnosisMatrix
+            the extended matrix
+        """
+        extended = DiagnosisMatrix.__new__(DiagnosisMatrix)
+        extended.column = self.column
+        extended.names = list(self.names)
+        added = extended._respondents(batch)
+        previous = self.matrix.copy()
+        previous.resize(self.matrix.shape[0], len(extended.names))
+        extended.matrix = sparse.vstack([previous, added], format="csr")
+        return extended
+
+    def with_any(self, names):
+        """
+        Function that flags the respondents diagnosed with any of the given diagnoses
+
+        Parameters:
+        ----------
+        names (list):
+            the diagnoses
+
+        Returns:
+        ----------
+        ndarray
+            one boolean per respondent
+        """
+        selected = np.isin(self.names, list(names)).astype(np.int32)
+        return (self.matrix @ selected) > 0
+
+    def frequencies(self):
+        """Function that counts the respondents with each diagnosis, most frequent first."""
+        counts = np.asarray(self.matrix.sum(axis=0)).ravel()
+        return pd.Series(counts, index=self.names).sort_values(ascending=False, kind="stable")
+
+    def cooccurrence(self, rows=None):
+        """
+        Function that counts the respondents per pair of diagnoses
+
+        Parameters:
+        ----------
+        rows (ndarray, optional):
+            positions of the respondents to count, by default everyone
+
+        Returns:
+        ----------
+        DataFrame
+            diagnoses as index and columns, with the number of respondents
+            having both, or on the diagonal the number having each
+        """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        counts = (matrix.T @ matrix).toarray()
+        return pd.DataFrame(counts, index=self.names, columns=self.names)
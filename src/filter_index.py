@@ -0,0 +1,202 @@
+import copy
+
+import numpy as np
+
+# columns respondents can be filtered on
+INDEXED_COLUMNS = [
+    "gender",
+    "age",
+    "country",
+    "is_remote",
+    "tech_role",
+    "work_interfere_treated",
+    "work_interfere_not_treated",
+    "survey_year",
+]
+
+
+class FilterIndex:
+    """
+    Packed bitset index over the survey respondents
+
+    Every indexed column keeps one bitset per value, with bit `i` set when
+    row `i` holds that value. Numeric columns additionally keep cumulative
+    bitsets so that a closed range is a single AND NOT. Any combination of
+    filters is answered with vectorized bitwise operations, without touching
+    the survey frame.
+    """
+
+    def __init__(self, data, columns=INDEXED_COLUMNS):
+        self.size = 0
+        self.everyone = self._pack(np.ones(0, dtype=bool))
+        self.bitsets = {}
+        self.present = {}
+        self.cumulative = {}
+        for column in columns:
+            self.bitsets[column] = {}
+        self._index(data)
+
+    def _pack(self, flags):
+        return np.packbits(flags)
+
+    def _extend(self, bitset, flags):
+        # appends the bits in `flags` after the first `self.size` bits of `bitset`
+        if self.size % 8 == 0:
+            previous = np.zeros(self.size // 8, dtype=np.uint8) if bitset is None else bitset
+            return np.concatenate([previous, self._pack(flags)])
+        previous = (
+            np.zeros(self.size, dtype=bool)
+            if bitset is None
+            else np.unpackbits(bitset, count=self.size).astype(bool)
+        )
+        return self._pack(np.concatenate([previous, flags]))
+
+    def _index(self, data):
+        for column, bitsets in self.bitsets.items():
+            values = data[column]
+            if hasattr(values, "cat"):
+                codes = values.cat.codes.to_numpy()
+                keys = list(values.cat.categories)
+            else:
+                keys, codes = np.unique(values.to_numpy(), return_inverse=True)
+                keys = keys.tolist()
+            positions = {key: code for code, key in enumerate(keys)}
+            for key in [*bitsets, *(k for k in keys if k not in bitsets)]:
+                flags = codes == positions.get(key, -2)
+                bitsets[key] = self._extend(bitsets.get(key), flags)
+            self.present[column] = self._extend(self.present.get(column), codes >= 0)
+            if not hasattr(values, "cat"):
+                ordered = sorted(bitsets)
+                self.cumulative[column] = (
+                    np.asarray(ordered),
+                    self._cumulative([bitsets[key] for key in ordered], len(data)),
+                )
+        self.everyone = self._extend(self.everyone, np.ones(len(data), dtype=bool))
+        self.size += len(data)
+
+    def _cumulative(self, bitsets, added):
+        # row k marks the rows whose value is among the k smallest values
+        cumulative = np.zeros((len(bitsets) + 1, (self.size + added + 7) // 8), dtype=np.uint8)
+        for position, bitset in enumerate(bitsets):
+            cumulative[position + 1] = cumulative[position] | bitset
+        return cumulative
+
+    def add_column(self, data, column):
+        """
+        Function that indexes one more column of the survey
+
+        Parameters:
+        ----------
+        data (DataFrame):
+            every survey response indexed so far
+        column (str):
+            the column name to index
+        """
+        extra = FilterIndex(data, columns=[column])
+        self.bitsets[column] = extra.bitsets[column]
+        self.present[column] = extra.present[column]
+        if column in extra.cumulative:
+            self.cumulative[column] = extra.cumulative[column]
+
+    def appended(self, batch):
+        """
+        Function that returns an index covering the indexed rows followed by `batch`
+
+        Only the new rows are scanned. The existing index is left untouched,
+        so callbacks running concurrently keep a consistent view.
+
+        Parameters:
+        ----------
+        batch (DataFrame):
+            new survey responses, categorized consistently with the indexed ones
+
+        Returns:
+        ----------
+        FilterIndex
+            the extended index
+        """
+        index = copy.copy(self)
+        index.bitsets = {column: dict(bitsets) for column, bitsets in self.bitsets.items()}
+        index.present = dict(self.present)
+        index.cumulative = dict(self.cumulative)
+        index._index(batch)
+        return index
+
+    def _any_of(self, column, values):
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        mask = np.zeros_like(self.everyone)
+        for value in values:
+            if value in self.bitsets[column]:
+                mask |= self.bitsets[column][value]
+        return mask
+
+    def _between(self, column, low, high):
+        keys, cumulative = self.cumulative[column]
+        start = np.searchsorted(keys, low, side="left")
+        stop = np.searchsorted(keys, high, side="right")
+        return cumulative[stop] & ~cumulative[start]
+
+    def mask(self, equal=None, between=None, exclude=None, notnull=(), within=None):
+        """
+        Function that combines filters into a packed bitset of matching rows
+
+        Parameters:
+        ----------
+        equal (dict):
+            column name to a value, or a list of accepted values
+        between (dict):
+            numeric column name to an inclusive `(low, high)` range
+        exclude (dict):
+            column name to a value, or a list of values, to leave out
+        notnull (iterable):
+            column names that must be answered
+        within (ndarray, optional):
+            a packed bitset from an earlier call to narrow down, by default everyone
+
+        Returns:
+        ----------
+        ndarray
+            the packed bitset of the rows passing every filter
+        """
+        mask = (self.everyone if within is None else within).copy()
+        for column, values in (equal or {}).items():
+            mask &= self._any_of(column, values)
+        for column, (low, high) in (between or {}).items():
+            mask &= self._between(column, low, high)
+        for column, values in (exclude or {}).items():
+            mask &= ~self._any_of(column, values)
+        for column in notnull:
+            mask &= self.present[column]
+        return mask
+
+    def rows(self, **filters):
+        """
+        Function that returns the positions of the rows passing the filters
+
+        Accepts the same keyword arguments as `mask`.
+        """
+        return np.flatnonzero(np.unpackbits(self.mask(**filters), count=self.size))
+
+    def narrow(self, rows, **filters):
+        """
+        Function that keeps the rows of an earlier selection that pass more filters
+
+        The flags of the given rows are looked up, rather than the positions
+        of every row searched for as in `rows`. Accepts the same keyword
+        arguments as `mask`.
+
+        Parameters:
+        ----------
+        rows (ndarray):
+            row positions, e.g. from `rows`
+        **filters:
+            the filters the rows must pass as well
+
+        Returns:
+        ----------
+        ndarray
+            the positions of the rows passing the filters, in order
+        """
+        flags = np.unpackbits(self.mask(**filters), count=self.size).view(bool)
+        return rows[flags[rows]]
@@ -5,6 +5,8 @@ import dash_core_components as dcc
 import dash_html_components as html
 import numpy as np
 
+import country_map
+
 FOOTER_STYLE = {
     "position": "fixed",
     "bottom": 0,
@@ -19,6 +21,15 @@ FOOTER_STYLE = {
 
 PLOTLY_LOGO = "assets/img/1111512.png"
 
+AGE_MARKS = {age: str(age) for age in range(15, 66, 5)}
+
+GENDER_OPTIONS = [
+    {"label": "All", "value": "all"},
+    {"label": "Male", "value": "Male"},
+    {"label": "Female", "value": "Female"},
+    {"label": "Others", "value": "Other"},
+]
+
 today = datetime.now()
 formatted_date = today.strftime("%b %d, %Y")
 
@@ -74,19 +85,23 @@ def get_overview_section(data, feature_list):
                                     for i in np.r_[data.columns[0:14]]
                                 ],
                             ),
+                            dcc.Checklist(
+                                id="overview_show_all",
+                                options=[{"label": "Show all questions", "value": "all"}],
+                                value=[],
+                                inputStyle={"marginRight": "5px"},
+                                style={"marginTop": "10px"},
+                            ),
                         ],
                         md=3,
                     ),
                     dbc.Col(
                         [
-                            html.Iframe(
+                            html.Div(
                                 id="gender_barplot",
-                                style={
-                                    "width": "100%",
-                                    "height": "500px",
-                                    "border": "0px",
-                                },
+                                style={"width": "100%", "minHeight": "500px"},
                             ),
+                            dcc.Store(id="gender_barplot_spec"),
                         ]
                     ),
                 ]
@@ -96,7 +111,7 @@ def get_overview_section(data, feature_list):
     return plot1
 
 
-def get_second_section():
+def get_second_section(years):
     section2 = html.Div(
         [
             html.Hr(),
@@ -113,12 +128,7 @@ def get_second_section():
                             html.H5("Gender"),
                             dcc.RadioItems(
                                 id="gender_selection",
-                                options=[
-                                    {"label": "All", "value": "all"},
-                                    {"label": "Male", "value": "Male"},
-                                    {"label": "Female", "value": "Female"},
-                                    {"label": "Others", "value": "Other"},
-                                ],
+                                options=GENDER_OPTIONS,
                                 value="all",
                                 inputStyle={"marginLeft": "20px", "marginRight": "5px"},
                                 labelStyle={"display": "block"},
@@ -131,21 +141,18 @@ def get_second_section():
                                 max=65,
                                 step=None,
                                 allowCross=False,
-                                marks={
-                                    15: "15",
-                                    20: "20",
-                                    25: "25",
-                                    30: "30",
-                                    35: "35",
-                                    40: "40",
-                                    45: "45",
-                                    50: "50",
-                                    55: "55",
-                                    60: "60",
-                                    65: "65",
-                                },
+                                marks=AGE_MARKS,
                                 value=[15, 65],
                             ),
+                            html.Br(),
+                            html.H5("Survey Year"),
+                            dcc.Checklist(
+                                id="year_selection",
+                                options=[{"label": str(year), "value": year} for year in years],
+                                value=years,
+                                inputStyle={"marginLeft": "20px", "marginRight": "5px"},
+                                labelStyle={"display": "block"},
+                            ),
                         ],
                         md=3,
                         style={
@@ -155,22 +162,16 @@ def get_second_section():
                     ),
                     dbc.Col(
                         [
-                            html.Iframe(
+                            html.Div(
                                 id="work_interfere_barplot",
-                                style={
-                                    "width": "100%",
-                                    "height": "400px",
-                                    "border": "0px",
-                                },
+                                style={"width": "100%", "minHeight": "400px"},
                             ),
-                            html.Iframe(
+                            dcc.Store(id="work_interfere_barplot_spec"),
+                            html.Div(
                                 id="remote_barplot",
-                                style={
-                                    "width": "100%",
-                                    "height": "400px",
-                                    "border": "0px",
-                                },
+                                style={"width": "100%", "minHeight": "400px"},
                             ),
+                            dcc.Store(id="remote_barplot_spec"),
                         ]
                     ),
                 ]
@@ -289,6 +290,206 @@ def get_third_section():
     return section3
 
 
+def get_explore_section(feature_list, questions, years):
+    question_options = [
+        {"label": feature_list.loc[i]["variables3"], "value": i} for i in questions
+    ]
+    section4 = html.Div(
+        [
+            html.Hr(),
+            dbc.Row(
+                dbc.Col([
+                    html.H3("Explore any survey question by any other"),
+                    html.Br()
+                ]),
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H5("Question"),
+                            dcc.Dropdown(
+                                id="explore_question",
+                                value="treatment",
+                                options=question_options,
+                                clearable=False,
+                            ),
+                            html.Br(),
+                            html.H5("Grouped by"),
+                            dcc.Dropdown(
+                                id="explore_group",
+                                value="gender",
+                                options=[{"label": "Everyone", "value": "all"}] + question_options,
+                                clearable=False,
+                            ),
+                            html.Br(),
+                            html.H5("Gender"),
+                            dcc.RadioItems(
+                                id="explore_gender_selection",
+                                options=GENDER_OPTIONS,
+                                value="all",
+                                inputStyle={"marginLeft": "20px", "marginRight": "5px"},
+                                labelStyle={"display": "block"},
+                            ),
+                            html.Br(),
+                            html.H5("Age of Respondents:"),
+                            dcc.RangeSlider(
+                                id="explore_age_slider",
+                                min=15,
+                                max=65,
+                                step=None,
+                                allowCross=False,
+                                marks=AGE_MARKS,
+                                value=[15, 65],
+                            ),
+                            html.Br(),
+                            html.H5("Survey Year"),
+                            dcc.Checklist(
+                                id="explore_year_selection",
+                                options=[{"label": str(year), "value": year} for year in years],
+                                value=years,
+                                inputStyle={"marginLeft": "20px", "marginRight": "5px"},
+                                labelStyle={"display": "block"},
+                            ),
+                        ],
+                        md=3,
+                        style={
+                            "padding": 15,
+                            "borderRadius": 6,
+                        },
+                    ),
+                    dbc.Col(
+                        [
+                            html.Div(
+                                id="explore_barplot",
+                                style={"width": "100%", "minHeight": "500px"},
+                            ),
+                            dcc.Store(id="explore_barplot_spec"),
+                        ]
+                    ),
+                ]
+            ),
+        ]
+    )
+
+    return section4
+
+
+def get_diagnosis_section(diagnoses):
+    section5 = html.Div(
+        [
+            html.Hr(),
+            dbc.Row(
+                dbc.Col([
+                    html.H3("Which mental health conditions are diagnosed together?"),
+                    html.Br()
+                ]),
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H5("Diagnosed with any of"),
+                            dcc.Dropdown(
+                                id="diagnosis_selection",
+                                options=[{"label": name, "value": name} for name in diagnoses],
+                                value=[],
+                                multi=True,
+                                placeholder="Everyone",
+                            ),
+                            html.Br(),
+                            html.H5("Gender"),
+                            dcc.RadioItems(
+                                id="diagnosis_gender_selection",
+                                options=GENDER_OPTIONS,
+                                value="all",
+                                inputStyle={"marginLeft": "20px", "marginRight": "5px"},
+                                labelStyle={"display": "block"},
+                            ),
+                            html.Br(),
+                            html.H5("Age of Respondents:"),
+                            dcc.RangeSlider(
+                                id="diagnosis_age_slider",
+                                min=15,
+                                max=65,
+                                step=None,
+                                allowCross=False,
+                                marks=AGE_MARKS,
+                                value=[15, 65],
+                            ),
+                        ],
+                        md=3,
+                        style={
+                            "padding": 15,
+                            "borderRadius": 6,
+                        },
+                    ),
+                    dbc.Col(
+                        [
+                            html.Div(
+                                id="diagnosis_heatmap",
+                                style={"width": "100%", "minHeight": "500px"},
+                            ),
+                            dcc.Store(id="diagnosis_heatmap_spec"),
+                        ]
+                    ),
+                ]
+            ),
+        ]
+    )
+
+    return section5
+
+
+def get_map_section(feature_list, questions):
+    section6 = html.Div(
+        [
+            html.Hr(),
+            dbc.Row(
+                dbc.Col([
+                    html.H3("Survey answers around the world"),
+                    html.Br()
+                ]),
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H5("Question"),
+                            dcc.Dropdown(
+                                id="map_question",
+                                value="mental_health_benefits_employer",
+                                options=[
+                                    {"label": feature_list.loc[i]["variables3"], "value": i}
+                                    for i in questions
+                                ],
+                                clearable=False,
+                            ),
+                            html.Br(),
+                            html.H5("Share of respondents answering"),
+                            dcc.Dropdown(id="map_answer", clearable=False),
+                        ],
+                        md=3,
+                        style={
+                            "padding": 15,
+                            "borderRadius": 6,
+                        },
+                    ),
+                    dbc.Col([
+                        dcc.Graph(
+                            id="country_map",
+                            # base layers from the dashboard, not the plotly cdn
+                            config={"topojsonURL": country_map.TOPOJSON_URL},
+                        )
+                    ]),
+                ]
+            ),
+        ]
+    )
+
+    return section6
+
+
 def get_tab_section():
     tab_section = html.Div(
         [
@@ -297,6 +498,9 @@ def get_tab_section():
                     dbc.Tab(label="Overview", tab_id="tab-1"),
                     dbc.Tab(label="HR Questions", tab_id="tab-2"),
                     dbc.Tab(label="Employee Benefits Questions", tab_id="tab-3"),
+                    dbc.Tab(label="Explore", tab_id="tab-4"),
+                    dbc.Tab(label="Diagnoses", tab_id="tab-5"),
+                    dbc.Tab(label="Map", tab_id="tab-6"),
                 ],
                 id="tabs",
                 active_tab="tab-1",
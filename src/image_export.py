@@ -0,0 +1,391 @@
+"""
+Static images of the dashboard charts for reports
+
+    python src/image_export.py [--out-dir DIR] [--formats png svg pdf] [--workers N]
+
+Every overview question, the overview of all of them at once and every
+donut answer are exported to each format.
+Charts are rendered offline in a pool of processes that each start one
+browser per renderer and keep it running for all the charts they render:
+- plotly figures by kaleido, whose browser comes with it. MathJax, which
+  plotly loads from a cdn, is turned off: no chart has LaTeX labels.
+- Vega-Lite charts by altair_saver, in a browser driven by selenium with
+  the vega scripts of altair_viewer. PDFs are printed by that browser
+  from the svg of the chart. It needs chromedriver or geckodriver on the
+  PATH.
+A format whose renderer is not installed is reported before anything is
+rendered, see `unavailable`. Images are stored under the hash of the
+chart they show and their format, so a chart that did not change since
+the last export is not rendered again. The manifest maps each chart to
+its images.
+"""
+import argparse
+import base64
+import functools
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import chart_bundle
+
+EXPORT_DIR = os.environ.get("IMAGE_EXPORT_DIR", "data/export")
+MANIFEST_NAME = "manifest.json"
+OBJECTS_DIR = "objects"
+
+# route prefix of the exported images on the server
+URL_PREFIX = "/export/"
+
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+
+_OBJECT_NAME = re.compile(r"^[0-9a-f]{64}\.(png|svg|pdf)$")
+
+# the render functions of the exported charts, and the kind of chart they return
+CHART_KINDS = {
+    "plot_gender_chart": "vega-lite",
+    "plot_all_gender_charts": "vega-lite",
+    "build_graph": "plotly",
+}
+
+# programs rendering Vega-Lite charts, either webdriver will do
+WEBDRIVERS = ["chromedriver", "geckodriver"]
+
+# css pixels per centimeter, the unit of the page size of a printed pdf
+PX_PER_CM = 96 / 2.54
+
+
+class ExportUnavailable(RuntimeError):
+    """Raised when the renderer of a format is not installed."""
+
+
+def unavailable(kind, fmt):
+    """
+    Function that tells why a chart cannot be rendered to a format here
+
+    Parameters:
+    ----------
+    kind (str):
+        "vega-lite" or "plotly"
+    fmt (str):
+        one of `MEDIA_TYPES`
+
+    Returns:
+    ----------
+    str
+        what to install, or None if the chart can be rendered
+    """
+    if kind == "plotly":
+        return None
+    if not any(shutil.which(driver) for driver in WEBDRIVERS):
+        return f"{fmt} images of Vega-Lite charts need chromedriver or geckodriver on the PATH"
+    return None
+
+
+def image_name(source, fmt):
+    """Function that names the image of a chart by the hash of its source and format."""
+    return f"{hashlib.sha256(source + fmt.encode()).hexdigest()}.{fmt}"
+
+
+def print_pdf(spec):
+    """
+    Function that renders a Vega-Lite chart to pdf in the browser of selenium
+
+    The chart is rendered to svg, which replaces the page of the browser
+    and is printed on a page of its own size.
+
+    Parameters:
+    ----------
+    spec (dict):
+        the Vega-Lite spec of the chart
+
+    Returns:
+    ----------
+    bytes
+        the pdf
+    """
+    from altair_saver.savers import SeleniumSaver
+    from selenium.webdriver.common.print_page_options import PrintOptions
+
+    saver = SeleniumSaver(spec, mode="vega-lite", offline=True)
+    svg = saver.save(fmt="svg")
+    # the browser altair_saver keeps running for the process, which rendered the svg
+    driver = saver._registry.get(saver._webdriver, saver._driver_timeout)
+    driver.execute_script(
+        "document.open(); document.write(arguments[0]); document.close();",
+        f'<html><body style="margin: 0">{svg}</body></html>',
+    )
+    width, height = driver.execute_script(
+        "const box = document.querySelector('svg').getBoundingClientRect();"
+        "return [box.width, box.height];"
+    )
+    options = PrintOptions()
+    options.page_width, options.page_height = width / PX_PER_CM, height / PX_PER_CM
+    options.margin_top = options.margin_bottom = 0
+    options.margin_left = options.margin_right = 0
+    options.background = True
+    return base64.b64decode(driver.print_page(options))
+
+
+def render_image(kind, source, fmt):
+    """
+    Function that renders a chart to a static image
+
+    The renderers are imported on first use and keep their browser
+    process running, so a worker starts it once for all its charts.
+
+    Parameters:
+    ----------
+    kind (str):
+        "vega-lite" or "plotly"
+    source (bytes):
+        the chart's spec or figure as json
+    fmt (str):
+        one of `MEDIA_TYPES`
+
+    Returns:
+    ----------
+    bytes
+        the image
+    """
+    if kind == "plotly":
+        import plotly.io
+
+        scope = plotly.io.kaleido.scope
+        # plotly points kaleido to MathJax on a cdn, setting it restarts the browser
+        if scope.mathjax is not False:
+            scope.mathjax = False
+        return plotly.io.to_image(json.loads(source), format=fmt, engine="kaleido")
+    if fmt == "pdf":
+        return print_pdf(json.loads(source))
+    import altair_saver
+
+    # the vega scripts are served to the browser from altair_viewer, not a cdn
+    image = altair_saver.save(
+        json.loads(source), fmt=fmt, mode="vega-lite", method="selenium", offline=True
+    )
+    return image.encode("utf-8") if isinstance(image, str) else image
+
+
+def render_images(task):
+    """Function that renders one chart to several formats in a worker process."""
+    kind, source, formats = task
+    return [render_image(kind, source, fmt) for fmt in formats]
+
+
+def write_atomic(path, content):
+    partial = f"{path}.part"
+    with open(partial, "wb") as f:
+        f.write(content)
+    os.replace(partial, path)
+
+
+class ImageExporter:
+    """
+    Content-addressed store of chart images, rendered by a process pool
+
+    The pool is started on first use, with processes spawned rather than
+    forked so that it can be started from a threaded server.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, workers=None):
+        self.directory = directory
+        self.workers = workers
+        self._executor = None
+        # the futures of the images being rendered by `submit`, by name
+        self._rendering = {}
+        self._lock = threading.RLock()
+
+    @property
+    def objects(self):
+        return os.path.join(self.directory, OBJECTS_DIR)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def missing(self, source, formats):
+        """Function that lists the formats a chart has not been exported to yet."""
+        return [
+            fmt for fmt in formats
+            if not os.path.exists(os.path.join(self.objects, image_name(source, fmt)))
+        ]
+
+    def export(self, charts, formats):
+        """
+        Function that exports charts, rendering only the images not already stored
+
+        Parameters:
+        ----------
+        charts (list):
+            (kind, source) pairs, see `render_image`
+        formats (list):
+            the image formats
+
+        Returns:
+        ----------
+        list
+            per chart, the format to image name mapping
+        """
+        os.makedirs(self.objects, exist_ok=True)
+        tasks = []
+        for kind, source in charts:
+            formats_left = self.missing(source, formats)
+            if formats_left:
+                tasks.append((kind, source, formats_left))
+        for kind, _, formats_left in tasks:
+            for fmt in formats_left:
+                reason = unavailable(kind, fmt)
+                if reason:
+                    raise ExportUnavailable(reason)
+        rendered = self._get_executor().map(render_images, tasks, chunksize=4) if tasks else []
+        for (_, source, formats_left), images in zip(tasks, rendered):
+            for fmt, image in zip(formats_left, images):
+                write_atomic(os.path.join(self.objects, image_name(source, fmt)), image)
+        return [{fmt: image_name(source, fmt) for fmt in formats} for _, source in charts]
+
+    def submit(self, kind, source, fmt):
+        """
+        Function that starts rendering an image in the pool, unless it is stored or rendering
+
+        A failed rendering is returned once, the next call renders the
+        image again.
+
+        Parameters:
+        ----------
+        kind (str):
+            "vega-lite" or "plotly"
+        source (bytes):
+            the chart's spec or figure as json
+        fmt (str):
+            one of `MEDIA_TYPES`
+
+        Returns:
+        ----------
+        str, Future
+            the image name, and the future of its rendering, or None if
+            the image is stored already
+        """
+        name = image_name(source, fmt)
+        with self._lock:
+            if os.path.exists(os.path.join(self.objects, name)):
+                return name, None
+            future = self._rendering.get(name)
+            if future is None:
+                reason = unavailable(kind, fmt)
+                if reason:
+                    raise ExportUnavailable(reason)
+                os.makedirs(self.objects, exist_ok=True)
+                future = self._get_executor().submit(render_image, kind, source, fmt)
+                self._rendering[name] = future
+                future.add_done_callback(functools.partial(self._store, name))
+            elif future.done() and future.exception() is not None:
+                del self._rendering[name]
+            return name, future
+
+    def _store(self, name, future):
+        """Function that writes an image rendered by `submit`."""
+        if future.exception() is not None:
+            return
+        write_atomic(os.path.join(self.objects, name), future.result())
+        with self._lock:
+            self._rendering.pop(name, None)
+
+    def read(self, object_name):
+        """Function that returns the content of an exported image, or None."""
+        if not _OBJECT_NAME.match(object_name):
+            return None
+        path = os.path.join(self.objects, object_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        """Function that stops the rendering processes, and their browsers."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def render_chart(name, args):
+    """Function that renders the spec or figure of a chart, as json."""
+    import app
+
+    return chart_bundle.serialize(inspect.unwrap(getattr(app, name))(*args))
+
+
+def export_all(out_dir=EXPORT_DIR, formats=tuple(MEDIA_TYPES), workers=None):
+    """
+    Function that exports every overview and donut chart
+
+    Parameters:
+    ----------
+    out_dir (str):
+        the export directory, existing images are reused
+    formats (list):
+        the image formats
+    workers (int, optional):
+        number of rendering processes, by default one per cpu
+
+    Returns:
+    ----------
+    dict
+        the manifest of the export
+    """
+    import app
+    from input_space import widget_values
+
+    store = app.store
+    values = widget_values(store.data, store.years(), app.feature_list, app.DONUT_COLUMNS)
+    tasks = [
+        *(("plot_gender_chart", (q,)) for q in values["questions"]),
+        ("plot_all_gender_charts", ()),
+        *(("build_graph", args) for args in values["donuts"]),
+    ]
+    charts = [(CHART_KINDS[name], render_chart(name, args)) for name, args in tasks]
+    exporter = ImageExporter(out_dir, workers)
+    try:
+        images = exporter.export(charts, list(formats))
+    finally:
+        exporter.close()
+
+    manifest = {
+        "version": store.version,
+        "charts": {
+            chart_bundle.chart_key(name, args): names for (name, args), names in zip(tasks, images)
+        },
+    }
+    write_atomic(
+        os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode("utf-8")
+    )
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out-dir", default=EXPORT_DIR, help="export directory")
+    parser.add_argument(
+        "--formats", nargs="+", default=list(MEDIA_TYPES), choices=list(MEDIA_TYPES),
+        help="image formats",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes")
+    args = parser.parse_args()
+    try:
+        manifest = export_all(args.out_dir, args.formats, args.workers)
+    except ExportUnavailable as error:
+        parser.exit(1, f"{error}\n")
+    print(f"{len(manifest['charts'])} charts in {len(args.formats)} formats in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
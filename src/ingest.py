@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+import cleaning
+import dataset as ds
+
+INCOMING_DIR = "data/incoming"
+
+logger = logging.getLogger(__name__)
+
+# seconds between two scans of INCOMING_DIR
+POLL_SECONDS = 30
+
+# columns every batch must answer: respondents are filtered on them
+REQUIRED_COLUMNS = ["age", "gender", "country"]
+
+# wording of the OSMI surveys from 2017 on where it differs from the 2016
+# wording beyond what `cleaning.normalize_question` absorbs (html emphasis,
+# spacing and capitalization). Questions whose later versions ask for other
+# answers, such as how much importance the employer places on mental health
+# on a 0-10 scale instead of mental_vs_physical, or the diagnoses asked one
+# per column, are left out and come out unanswered.
+OSMI_2017_WORDING = {
+    "Does your employer offer resources to learn more about mental health disorders and "
+    "options for seeking help?": "mental_health_resources",
+    "If a mental health issue prompted you to request a medical leave from work, how easy or "
+    "difficult would it be to ask for that leave?": "mental_health_leave",
+    "Would you feel comfortable discussing a mental health issue with your coworkers?":
+        "discuss_coworker",
+    "Would you feel comfortable discussing a mental health issue with your direct "
+    "supervisor(s)?": "discuss_supervisor",
+    "Do you know local or online resources to seek help for a mental health issue?":
+        "online_resources",
+    "Have you ever sought treatment for a mental health disorder from a mental health "
+    "professional?": "treatment",
+    "If you have a mental health disorder, how often do you feel that it interferes with your "
+    "work when being treated effectively?": "work_interfere_treated",
+    "If you have a mental health disorder, how often do you feel that it interferes with your "
+    "work when NOT being treated effectively (i.e., when you are experiencing symptoms)?":
+        "work_interfere_not_treated",
+    "Do you know the options for mental health care available under your employer-provided "
+    "health coverage?": "mental_health_benefits_employer",
+    "Do you have medical coverage (private insurance or state-provided) that includes "
+    "treatment of mental health disorders?": "medical_coverage",
+}
+
+# question wording of later survey years, per year: {year: {question text: column name}}
+QUESTION_ALIASES = {year: OSMI_2017_WORDING for year in [2017, 2018, 2019]}
+
+
+class BatchError(ValueError):
+    """A batch of responses lacks the questions or the rows the dashboard needs."""
+
+
+def question_map(features, year):
+    """
+    Function that maps the normalized questions of a survey year to column names
+
+    Parameters:
+    ----------
+    features (DataFrame):
+        the survey question descriptions indexed by column name
+    year (int):
+        the survey year
+
+    Returns:
+    ----------
+    dict
+        normalized question text to column name, in processed column order
+    """
+    mapping = {
+        cleaning.normalize_question(question): column
+        for column, question in features["questions"].items()
+    }
+    for question, column in QUESTION_ALIASES.get(year, {}).items():
+        mapping[cleaning.normalize_question(question)] = column
+    return mapping
+
+
+def read_batch(path, year, features):
+    """
+    Function that reads one batch of responses into the processed, categorized form
+
+    The file may be a raw survey export with questions as headers, or an
+    already processed file with column names as headers.
+
+    Parameters:
+    ----------
+    path (str):
+        location of the csv file
+    year (int):
+        the survey year of the responses
+    features (DataFrame):
+        the survey question descriptions indexed by column name
+
+    Returns:
+    ----------
+    DataFrame
+        the categorized responses with a `survey_year` column
+
+    Raises:
+    ----------
+    BatchError
+        if a column of `REQUIRED_COLUMNS` is not among the questions of
+        the file, or no response has a valid age
+    """
+    raw = pd.read_csv(path, encoding="utf-8")
+    if set(features.index) <= set(raw.columns):
+        clean = raw[list(features.index)]
+    else:
+        questions = question_map(features, year)
+        found = {cleaning.normalize_question(question) for question in raw.columns}
+        missing = [
+            column for column in REQUIRED_COLUMNS
+            if not any(q in found for q, c in questions.items() if c == column)
+        ]
+        if missing:
+            raise BatchError(f"questions of {', '.join(missing)} not found for {year}")
+        clean = cleaning.clean_survey(raw, questions)
+    clean = clean.dropna(subset=["age"])
+    if clean.empty:
+        raise BatchError("no response with a valid age")
+    return ds.categorize(clean.assign(survey_year=year))
+
+
+class IncomingWatcher:
+    """
+    Picks up new response batches dropped into a directory
+
+    Files are named `<year>_<anything>.csv`. Every server process polls the
+    directory on its own, at most once per `interval` seconds, so a batch
+    written once reaches all gunicorn workers without a restart. Files that
+    cannot be ingested are logged and skipped from then on, with the reason
+    kept in `rejected`.
+    """
+
+    def __init__(self, store, features, directory=INCOMING_DIR, interval=POLL_SECONDS):
+        self.store = store
+        self.features = features
+        self.directory = directory
+        self.interval = interval
+        self.ingested = set()
+        self.rejected = {}
+        self._last_poll = float("-inf")
+        self._lock = threading.Lock()
+
+    def pending(self):
+        """Function that lists the batch files not ingested yet, oldest year first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [
+            name for name in os.listdir(self.directory)
+            if re.match(r"^\d{4}_.*\.csv$", name)
+            and name not in self.ingested
+            and name not in self.rejected
+        ]
+        return sorted(names)
+
+    def poll(self, force=False):
+        """
+        Function that ingests any new batch files
+
+        Parameters:
+        ----------
+        force (bool):
+            scan even if the last scan was less than `interval` seconds ago
+
+        Returns:
+        ----------
+        int
+            the number of batches ingested
+        """
+        now = time.monotonic()
+        if not force and now - self._last_poll < self.interval:
+            return 0
+        if not self._lock.acquire(blocking=force):
+            return 0
+        try:
+            self._last_poll = now
+            count = 0
+            for name in self.pending():
+                year = int(name[:4])
+                try:
+                    batch = read_batch(os.path.join(self.directory, name), year, self.features)
+                except BatchError as error:
+                    logger.warning("skipping batch %s: %s", name, error)
+                    self.rejected[name] = str(error)
+                    continue
+                self.store.append(batch)
+                self.ingested.add(name)
+                count += 1
+            return count
+        finally:
+            self._lock.release()
+
+    def save(self, year, content):
+        """
+        Function that writes an uploaded batch into the watched directory
+
+        The file name includes a hash of the content, so uploading the same
+        batch twice does not duplicate responses.
+
+        Parameters:
+        ----------
+        year (int):
+            the survey year of the responses
+        content (bytes):
+            the csv file
+
+        Returns:
+        ----------
+        str
+            the name of the batch file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{year}_{hashlib.sha1(content).hexdigest()[:12]}.csv"
+        path = os.path.join(self.directory, name)
+        partial = f"{path}.part"
+        with open(partial, "wb") as f:
+            f.write(content)
+        os.replace(partial, path)
+        return name
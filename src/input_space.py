@@ -0,0 +1,99 @@
+import itertools
+
+import html_components as hc
+
+
+def find_component(layout, component_id):
+    """Function that finds the component with the given id in a layout."""
+    if getattr(layout, "id", None) == component_id:
+        return layout
+    children = getattr(layout, "children", None)
+    if not isinstance(children, (list, tuple)):
+        children = [children]
+    for child in children:
+        if hasattr(child, "to_plotly_json"):
+            found = find_component(child, component_id)
+            if found is not None:
+                return found
+    return None
+
+
+def option_values(layout, component_id):
+    """Function that lists the values offered by a dropdown, radio or checklist."""
+    return [option["value"] for option in find_component(layout, component_id).options]
+
+
+def widget_values(data, years, feature_list, donut_columns):
+    """
+    Function that lists every value the input widgets of the dashboard can take
+
+    The values are read from the layout itself, so they follow any change
+    to the dropdown, radio and slider options.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    years (list):
+        the survey years present in the data
+    feature_list (DataFrame):
+        the survey question descriptions indexed by column name
+    donut_columns (list):
+        the questions of the donut charts on the third tab
+
+    Returns:
+    ----------
+    dict
+        the values of the overview question, the HR filters (every age range
+        between two slider marks, gender, and every single year as well as
+        all years together) and the donut chart answers
+    """
+    overview = hc.get_overview_section(data, feature_list)
+    hr = hc.get_second_section(years)
+    benefits = hc.get_third_section()
+
+    ages = sorted(find_component(hr, "age_slider").marks)
+    year_options = option_values(hr, "year_selection")
+    return {
+        "tabs": ["tab-1", "tab-2", "tab-3", "tab-4", "tab-5", "tab-6"],
+        "questions": option_values(overview, "q_selection"),
+        "age_ranges": [list(pair) for pair in itertools.combinations_with_replacement(ages, 2)],
+        "genders": option_values(hr, "gender_selection"),
+        # the other sets of years, 2^n - 1 of them in all, are rendered live
+        "year_sets": [[year] for year in year_options] + (
+            [year_options] if len(year_options) > 1 else []
+        ),
+        "donuts": [
+            (column, value)
+            for column in donut_columns
+            for value in option_values(benefits, f"{column}_radio")
+        ],
+    }
+
+
+def hr_filters(values):
+    """Function that lists every combination of the HR tab filters of `widget_values`."""
+    return [
+        (age_range, gender, year_set)
+        for age_range in values["age_ranges"]
+        for gender in values["genders"]
+        for year_set in values["year_sets"]
+    ]
+
+
+def input_labels(values):
+    """
+    Function that lists the single input values of `widget_values`, to label callback metrics by
+
+    Tabs, overview questions, genders and donut answers are the values the
+    chart bundle is built for. Age ranges and sets of years are lists, and
+    labelled by their type instead.
+    """
+    return frozenset(
+        [
+            *values["tabs"],
+            *values["questions"],
+            *values["genders"],
+            *(value for _, value in values["donuts"]),
+        ]
+    )
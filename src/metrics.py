@@ -0,0 +1,287 @@
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from dash.exceptions import PreventUpdate
+
+# upper bounds of the histogram buckets, in seconds and bytes
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SIZE_BUCKETS = [1024, 4096, 16384, 65536, 262144, 1048576, 4194304]
+
+# stage durations of the callback running in the current context
+_stages = contextvars.ContextVar("stages", default=None)
+
+
+def escape(value):
+    """Function that escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def default_inputs_class(*inputs, known=frozenset()):
+    """
+    Function that labels callback inputs, keeping the number of labels small
+
+    Values in `known`, those the input widgets can take, are kept as they
+    are, anything else is only labelled by its type.
+    """
+    labels = []
+    for value in inputs:
+        if isinstance(value, (str, int, float)) and value in known:
+            labels.append(str(value))
+        else:
+            labels.append(type(value).__name__)
+    return ",".join(labels)
+
+
+@contextlib.contextmanager
+def collect_stages():
+    """
+    Context manager that collects the stages recorded in it into a dict
+
+    Used where a callback's stages run in another process, which sends
+    them back to be added with `add_stages`.
+    """
+    stages = {}
+    token = _stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _stages.reset(token)
+
+
+def add_stages(stages):
+    """Function that adds stage durations to the running callback, if any."""
+    current = _stages.get()
+    if current is None:
+        return
+    for name, seconds in stages.items():
+        current[name] = current.get(name, 0.0) + seconds
+
+
+class Histogram:
+    """Prometheus histogram with a fixed set of label names."""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = [*buckets, float("inf")]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.setdefault(labels, [[0] * len(self.buckets), 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, counts):
+                    bucket = format_labels(self.labels, labels, [("le", format_value(bound))])
+                    lines.append(f"{self.name}_bucket{bucket} {count}")
+                suffix = format_labels(self.labels, labels)
+                lines.append(f"{self.name}_sum{suffix} {format_value(total)}")
+                lines.append(f"{self.name}_count{suffix} {counts[-1]}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter with a fixed set of label names."""
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}")
+        return lines
+
+
+class Metrics:
+    """
+    Latency, response size and cache metrics of the dash callbacks
+
+    `instrument` wraps every registered server-side callback. Callbacks
+    break their own latency down by running their stages (filter,
+    aggregate, chart, serialize) inside `stage`. The remaining time of a
+    callback is recorded as `serialize` when the callback does not record
+    that stage itself, which for figure outputs is dash's json encoding.
+
+    Every gunicorn worker keeps its own metrics, so each scrape of
+    `render` reports the worker that served it.
+    """
+
+    def __init__(self):
+        self.latency = Histogram(
+            "dash_callback_duration_seconds",
+            "Latency of dash callbacks, in total and by stage.",
+            ("callback", "inputs", "stage"),
+            LATENCY_BUCKETS,
+        )
+        self.response_size = Histogram(
+            "dash_callback_response_bytes",
+            "Size of the json responses of dash callbacks.",
+            ("callback", "inputs"),
+            SIZE_BUCKETS,
+        )
+        self.errors = Counter(
+            "dash_callback_errors_total",
+            "Dash callbacks that raised, by exception type.",
+            ("callback", "inputs", "error"),
+        )
+        self.inputs_classes = {}
+        self.known_inputs = frozenset()
+        self.caches = {}
+        self.collectors = []
+
+    def instrument(self, app, inputs_classes=None, known_inputs=()):
+        """
+        Function that wraps every server-side callback registered on a dash app
+
+        Parameters:
+        ----------
+        app (Dash):
+            the app whose callbacks are measured
+        inputs_classes (dict, optional):
+            callback function name to a function that maps the callback's
+            inputs to a short label, by default `default_inputs_class`
+        known_inputs (iterable, optional):
+            the input values `default_inputs_class` keeps as labels
+        """
+        self.inputs_classes.update(inputs_classes or {})
+        self.known_inputs = self.known_inputs | frozenset(known_inputs)
+        for entry in app.callback_map.values():
+            # clientside callbacks have no server-side function
+            if "callback" in entry:
+                entry["callback"] = self._timed(entry["callback"])
+
+    def _timed(self, callback):
+        name = callback.__name__
+        classify = self.inputs_classes.get(
+            name, functools.partial(default_inputs_class, known=self.known_inputs)
+        )
+
+        @functools.wraps(callback)
+        def wrapper(*args, **kwargs):
+            inputs = classify(*args)
+            stages = {}
+            token = _stages.set(stages)
+            start = time.perf_counter()
+            try:
+                response = callback(*args, **kwargs)
+            except PreventUpdate:
+                # the output is left as it is on purpose, e.g. after a render timeout
+                raise
+            except Exception as error:
+                self.errors.inc((name, inputs, type(error).__name__))
+                raise
+            finally:
+                _stages.reset(token)
+            total = time.perf_counter() - start
+
+            stages.setdefault("serialize", max(total - sum(stages.values()), 0.0))
+            for stage, seconds in stages.items():
+                self.latency.observe((name, inputs, stage), seconds)
+            self.latency.observe((name, inputs, "total"), total)
+            self.response_size.observe((name, inputs), len(response))
+            return response
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context manager that adds the time spent in it to a stage of the running callback
+
+        Outside of an instrumented callback, e.g. in the benchmark, nothing
+        is recorded.
+        """
+        stages = _stages.get()
+        if stages is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+    def register_cache(self, name, cache):
+        """Function that adds the hit counts of a `RenderCache` to the metrics."""
+        self.caches[name] = cache
+
+    def register_lines(self, collect):
+        """Function that adds the lines returned by `collect`, in the Prometheus text format."""
+        self.collectors.append(collect)
+
+    def _cache_lines(self):
+        lookups = Counter(
+            "render_cache_lookups_total",
+            "Render cache lookups by cached function and result.",
+            ("cache", "function", "result"),
+        )
+        entries, size, evictions = [], [], []
+        for cache_name, cache in self.caches.items():
+            stats = cache.stats()
+            for function, counts in stats["functions"].items():
+                lookups.inc((cache_name, function, "hit"), counts["hits"])
+                lookups.inc((cache_name, function, "miss"), counts["misses"])
+            entries.append(f'render_cache_entries{{cache="{escape(cache_name)}"}} {stats["entries"]}')
+            size.append(f'render_cache_bytes{{cache="{escape(cache_name)}"}} {stats["bytes"]}')
+            evictions.append(
+                f'render_cache_evictions_total{{cache="{escape(cache_name)}"}} {stats["evictions"]}'
+            )
+        if not self.caches:
+            return []
+        return [
+            *lookups.render(),
+            "# HELP render_cache_entries Rendered outputs held by the render cache.",
+            "# TYPE render_cache_entries gauge",
+            *entries,
+            "# HELP render_cache_bytes Approximate size of the render cache.",
+            "# TYPE render_cache_bytes gauge",
+            *size,
+            "# HELP render_cache_evictions_total Entries evicted from the render cache.",
+            "# TYPE render_cache_evictions_total counter",
+            *evictions,
+        ]
+
+    def render(self):
+        """Function that returns every metric in the Prometheus text format."""
+        lines = [
+            *self.latency.render(),
+            *self.response_size.render(),
+            *self.errors.render(),
+            *self._cache_lines(),
+            *(line for collect in self.collectors for line in collect()),
+        ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,279 @@
+"""
+Pipeline that rebuilds the processed survey data from the raw survey export
+
+    python src/preprocess.py [--raw PATH] [--out-dir DIR] [--chunksize N] [--force]
+
+The raw csv is streamed in chunks, so inputs larger than memory are fine.
+Every stage records the content hashes of its inputs and outputs in a
+manifest and is skipped when nothing changed. Within a stage, the output
+of every chunk is cached by the chunk's content hash, so after a small
+edit to the raw data only the affected chunks are processed again. The
+last stage writes the survey as the Arrow file the server memory-maps.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+import cleaning
+import dataset as ds
+import ingest
+import survey_arrow
+
+RAW_PATH = "data/raw/mental-heath-in-tech-2016_20161114.csv"
+OUT_DIR = "data/processed"
+CLEAN_NAME = "mental_health_clean.csv"
+REFORMAT_NAME = "mental_health_clean_reformat.csv"
+FEATURES_NAME = "features_list.csv"
+ARROW_NAME = os.path.basename(survey_arrow.ARROW_PATH)
+
+CHUNKSIZE = 50_000
+MANIFEST_NAME = ".pipeline_manifest.json"
+CACHE_NAME = ".pipeline_cache"
+
+# source files whose code determines the output of the pipeline
+SOURCES = [cleaning.__file__, ingest.__file__, ds.__file__, survey_arrow.__file__, __file__]
+
+
+def file_hash(path):
+    """Function that computes the sha256 of a file without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_hash():
+    """Function that computes a hash of the pipeline's source code."""
+    digest = hashlib.sha256()
+    for path in SOURCES:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def stable_dtypes(frame):
+    """
+    Function that fixes the dtypes of numeric columns
+
+    Without it a chunk without missing values would write `1` where other
+    chunks write `1.0`.
+    """
+    frame = frame.copy()
+    frame["age"] = frame["age"].astype("Int16")
+    for column in cleaning.BINARY_COLUMNS:
+        if pd.api.types.is_numeric_dtype(frame[column]):
+            frame[column] = frame[column].astype("Int8")
+    return frame
+
+
+def map_chunks(source, target, transform, cache_dir, chunksize, context=""):
+    """
+    Function that streams a csv through `transform` into another csv
+
+    Parameters:
+    ----------
+    source (str):
+        location of the input csv
+    target (str):
+        location of the output csv, replaced atomically when done
+    transform (callable):
+        maps a chunk of the input to a chunk of the output
+    cache_dir (str):
+        directory of the cached output chunks of this stage
+    chunksize (int):
+        number of rows per chunk
+    context (str):
+        everything besides the code and the chunk that `transform` depends
+        on, such as the question map, so that cached chunks are only reused
+        for the same transform
+
+    Returns:
+    ----------
+    tuple
+        the number of chunks processed and the number reused from the cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    salt = (code_hash() + context).encode()
+    used, processed = set(), 0
+    partial = f"{target}.part"
+    with open(partial, "w", encoding="utf-8", newline="") as out:
+        for chunk in pd.read_csv(source, chunksize=chunksize, encoding="utf-8"):
+            digest = hashlib.sha256(salt)
+            digest.update(json.dumps(list(chunk.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(chunk, index=False).values.tobytes())
+            key = digest.hexdigest()
+            fragment = os.path.join(cache_dir, f"{key}.csv")
+            if not os.path.exists(fragment):
+                transform(chunk).to_csv(f"{fragment}.part", index=False)
+                os.replace(f"{fragment}.part", fragment)
+                processed += 1
+            with open(fragment, encoding="utf-8", newline="") as f:
+                header = f.readline()
+                if not used:
+                    out.write(header)
+                shutil.copyfileobj(f, out)
+            used.add(key)
+    os.replace(partial, target)
+    for name in os.listdir(cache_dir):
+        if name[:-len(".csv")] not in used:
+            os.remove(os.path.join(cache_dir, name))
+    return processed, len(used) - processed
+
+
+def run_stage(name, inputs, outputs, build, manifest, force=False):
+    """
+    Function that runs a stage unless its inputs, code and outputs are unchanged
+
+    Parameters:
+    ----------
+    name (str):
+        the stage name in the manifest
+    inputs (list):
+        locations of the files the stage reads
+    outputs (list):
+        locations of the files the stage writes
+    build (callable):
+        runs the stage and returns a short summary
+    manifest (dict):
+        hashes recorded by earlier runs, updated in place
+    force (bool):
+        run the stage even if it is up to date
+
+    Returns:
+    ----------
+    float
+        the seconds the stage took to run, or None if it was up to date
+    """
+    key = {"code": code_hash(), "inputs": {path: file_hash(path) for path in inputs}}
+    recorded = manifest.get(name, {})
+    up_to_date = recorded.get("key") == key and all(
+        os.path.exists(path) and file_hash(path) == recorded["outputs"].get(path)
+        for path in outputs
+    )
+    if up_to_date and not force:
+        print(f"{name}: up to date")
+        return None
+    start = time.perf_counter()
+    summary = build()
+    seconds = time.perf_counter() - start
+    manifest[name] = {"key": key, "outputs": {path: file_hash(path) for path in outputs}}
+    print(f"{name}: {summary} in {seconds:.2f}s")
+    return seconds
+
+
+def run(raw=RAW_PATH, features_path=ds.FEATURES_PATH, out_dir=OUT_DIR,
+        chunksize=CHUNKSIZE, force=False):
+    """
+    Function that runs every stage of the pipeline
+
+    Parameters:
+    ----------
+    raw (str):
+        location of the raw survey export
+    features_path (str):
+        location of the list of survey questions and their column names
+    out_dir (str):
+        directory of the processed files
+    chunksize (int):
+        number of rows per chunk
+    force (bool):
+        run every stage even if it is up to date
+
+    Returns:
+    ----------
+    dict
+        the seconds each stage took to run, None for stages that were up to date
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    cache = os.path.join(out_dir, CACHE_NAME)
+    manifest = {}
+    if force:
+        shutil.rmtree(cache, ignore_errors=True)
+    elif os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    clean_path = os.path.join(out_dir, CLEAN_NAME)
+    reformat_path = os.path.join(out_dir, REFORMAT_NAME)
+    features_out = os.path.join(out_dir, FEATURES_NAME)
+    arrow_path = os.path.join(out_dir, ARROW_NAME)
+    features = ds.load_features(features_path)
+
+    def clean():
+        question_map = ingest.question_map(features, ds.BASE_YEAR)
+        header = pd.read_csv(raw, nrows=0, encoding="utf-8").columns
+        found = {cleaning.normalize_question(question) for question in header}
+        missing = [column for q, column in question_map.items() if q not in found]
+        if missing:
+            print(f"clean: questions not found in {raw}: {', '.join(missing)}")
+        known_genders = {}
+        processed, reused = map_chunks(
+            raw,
+            clean_path,
+            lambda chunk: stable_dtypes(
+                cleaning.clean_responses(chunk, question_map, known_genders)
+            ),
+            os.path.join(cache, "clean"),
+            chunksize,
+            context=json.dumps(question_map),
+        )
+        return f"{processed} chunks processed, {reused} reused"
+
+    def reformat():
+        processed, reused = map_chunks(
+            clean_path,
+            reformat_path,
+            lambda chunk: stable_dtypes(cleaning.reformat_answers(chunk)),
+            os.path.join(cache, "reformat"),
+            chunksize,
+        )
+        return f"{processed} chunks processed, {reused} reused"
+
+    def copy_features():
+        shutil.copyfile(features_path, features_out)
+        return "copied"
+
+    def arrow():
+        data = ds.load_survey(reformat_path)
+        survey_arrow.write_survey(data, ds.load_features(features_out), arrow_path)
+        return f"{len(data)} responses written"
+
+    timings = {
+        "clean": run_stage("clean", [raw, features_path], [clean_path], clean, manifest, force),
+        "reformat": run_stage(
+            "reformat", [clean_path], [reformat_path], reformat, manifest, force
+        ),
+    }
+    if os.path.abspath(features_path) != os.path.abspath(features_out):
+        timings["features"] = run_stage(
+            "features", [features_path], [features_out], copy_features, manifest, force
+        )
+    timings["arrow"] = run_stage(
+        "arrow", [reformat_path, features_out], [arrow_path], arrow, manifest, force
+    )
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--raw", default=RAW_PATH, help="raw survey export")
+    parser.add_argument("--features", default=ds.FEATURES_PATH, help="survey question list")
+    parser.add_argument("--out-dir", default=OUT_DIR, help="directory of the processed files")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="rows per chunk")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and cache")
+    args = parser.parse_args()
+    run(args.raw, args.features, args.out_dir, args.chunksize, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict, defaultdict
+
+import pandas as pd
+
+
+def dataset_version(data):
+    """
+    Function that computes a short content hash of a dataset
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the survey responses
+
+    Returns:
+    ----------
+    str
+        a hex digest that changes whenever any value in the dataset changes
+    """
+    row_hashes = pd.util.hash_pandas_object(data, index=True).values
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+
+def normalize(value):
+    """
+    Function that turns callback inputs into a hashable, canonical form
+
+    Lists (e.g. RangeSlider values) become tuples and numpy scalars become
+    Python scalars, so `[15, 65]` and `(15, 65)` share a cache entry.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def payload_size(value):
+    """Approximate number of bytes a rendered chart occupies once serialized."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(v) for v in value)
+    if hasattr(value, "to_json"):
+        return len(value.to_json())
+    if isinstance(value, dict):
+        return len(json.dumps(value, default=str))
+    return 0
+
+
+class RenderCache:
+    """
+    Bounded LRU cache for rendered charts
+
+    Entries are evicted least-recently-used first once either `max_entries`
+    or `max_bytes` is exceeded. Keys include `version`, so assigning a new
+    dataset version makes every existing entry unreachable.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, version=""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self.lookups = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = payload_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "functions": {name: dict(counts) for name, counts in self.lookups.items()},
+            }
+
+    def memoize(self, func):
+        """Decorator that serves repeat calls of `func` from the cache."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, self.version, normalize(args), normalize(kwargs))
+            cached = self.get(key)
+            with self._lock:
+                self.lookups[func.__name__]["misses" if cached is None else "hits"] += 1
+            if cached is not None:
+                return cached
+            result = func(*args, **kwargs)
+            self.put(key, result)
+            return result
+
+        return wrapper
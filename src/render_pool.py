@@ -0,0 +1,188 @@
+import functools
+import importlib
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from dash.exceptions import PreventUpdate
+
+from metrics import add_stages, collect_stages
+
+# set in the processes of a pool, where offloaded functions run directly
+_in_worker = False
+
+
+class RenderTimeout(PreventUpdate):
+    """
+    A chart did not render within the timeout of the pool
+
+    As a `PreventUpdate`, dash leaves the chart on screen as it was. The
+    render keeps running, and the next request for the same chart waits
+    for it instead of starting another one.
+    """
+
+
+class StaleTask(RuntimeError):
+    """
+    A worker cannot render a task at the dataset version of its sender
+
+    Arguments such as row selections only hold for the dataset version
+    they were made from. The sender renders the task itself instead.
+    """
+
+
+def start_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def warm_up(module):
+    """Function that imports the module of the offloaded functions in a fresh worker."""
+    importlib.import_module(module)
+
+
+def render_task(module, name, version, args):
+    """
+    Function that runs an offloaded function in a worker process
+
+    Parameters:
+    ----------
+    module (str):
+        the module defining the function, which must have `store` and
+        `ingest_pending` like the dashboard app
+    name (str):
+        the name of the function in the module
+    version (str):
+        the dataset version of the server that sent the task
+    args (tuple):
+        the arguments of the call
+
+    Returns:
+    ----------
+    tuple
+        the result and the durations of the stages recorded while rendering
+
+    Raises:
+    ----------
+    StaleTask
+        if the worker's data is still at another version after catching up
+    """
+    app = importlib.import_module(module)
+    if app.store.version != version:
+        # catch up with the batches the server ingested since the worker started
+        app.ingest_pending(force=True)
+    if app.store.version != version:
+        raise StaleTask(f"worker at dataset version {app.store.version}, task at {version}")
+    with collect_stages() as stages:
+        result = getattr(app, name)(*args)
+    return result, stages
+
+
+class RenderPool:
+    """
+    Process pool that renders charts off the request threads
+
+    Functions decorated with `offload` are sent to the pool, and `gather`
+    renders several of them at once, so the charts of a tab use as many
+    cores as the pool has. Calls with the same function, arguments and
+    dataset `version` that are still rendering are shared between
+    requests. With no workers everything runs in the calling thread.
+
+    The worker processes import the module of the functions themselves,
+    so they hold their own copy of the data and their own render cache.
+    """
+
+    def __init__(self, workers=0, timeout=10.0, version=""):
+        self.workers = workers
+        self.timeout = timeout
+        self.version = version
+        self._executor = None
+        self._pending = {}
+        # re-entrant, the callback of a future that is already done runs right away
+        self._lock = threading.RLock()
+
+    def _get_executor(self, module):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=start_worker,
+            )
+            # load the app in every worker before the first charts are requested
+            for _ in range(self.workers):
+                self._executor.submit(warm_up, module)
+        return self._executor
+
+    def _submit(self, func, args):
+        key = (func.__module__, func.__name__, self.version, pickle.dumps(args))
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._get_executor(func.__module__).submit(
+                    render_task, func.__module__, func.__name__, self.version, args
+                )
+                self._pending[key] = future
+                future.add_done_callback(functools.partial(self._done, key))
+            return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if isinstance(future.exception(), BrokenProcessPool):
+                # a worker died, e.g. out of memory; start a new pool on the next call
+                self._executor = None
+
+    def gather(self, calls):
+        """
+        Function that renders several offloaded functions in parallel
+
+        Calls that a worker cannot render at the pool's dataset version are
+        rendered in the calling thread, see `StaleTask`.
+
+        Parameters:
+        ----------
+        calls (list):
+            (function, args) pairs
+
+        Returns:
+        ----------
+        list
+            the result of every call, in order
+
+        Raises:
+        ----------
+        RenderTimeout
+            if the calls did not all finish within the timeout
+        """
+        if not self.workers or _in_worker:
+            return [func(*args) for func, args in calls]
+        futures = [self._submit(func, args) for func, args in calls]
+        _, not_done = wait(futures, timeout=self.timeout)
+        if not_done:
+            raise RenderTimeout()
+        results = []
+        for (func, args), future in zip(calls, futures):
+            try:
+                result, stages = future.result()
+            except StaleTask:
+                # the arguments were made from the data of this process
+                results.append(func.__wrapped__(*args))
+                continue
+            add_stages(stages)
+            results.append(result)
+        return results
+
+    def offload(self, func):
+        """Decorator that renders `func` in the pool."""
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            if not self.workers or _in_worker:
+                return func(*args)
+            [result] = self.gather([(wrapper, args)])
+            return result
+
+        return wrapper
@@ -0,0 +1,199 @@
+import functools
+import json
+import os
+import re
+import threading
+
+# validate every rendered spec against its schema, as tests/conftest.py enables
+VALIDATE_SPECS = os.environ.get("VALIDATE_SPECS", "0") == "1"
+
+# placeholder of the named datasets of a chart, also filled in by assets/hr_filters.js
+DATASETS = "__DATASETS__"
+
+_SLOT = re.compile(r'\["__(\w+?)__"\]|"__(\w+?)__"')
+
+
+def text_slot(name):
+    """Function that returns the placeholder of a string substituted per request."""
+    return f"__{name}__"
+
+
+def list_slot(name):
+    """Function that returns the placeholder of a list substituted per request, e.g. a sort order."""
+    return [text_slot(name)]
+
+
+def records(data):
+    """
+    Function that converts a DataFrame of counts to vega-lite data values
+
+    Gives the same values as altair's data transformer for categorical,
+    string and numeric columns, without copying and checking the frame.
+    """
+    if not hasattr(data, "to_dict"):
+        return data
+    columns = []
+    for column in data.columns:
+        values = data[column].tolist()
+        if data[column].hasnans:
+            values = [None if value != value else value for value in values]
+        columns.append(values)
+    names = [str(column) for column in data.columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def inline_datasets(spec, datasets):
+    """Function that replaces references to the given datasets by their values."""
+    if isinstance(spec, dict):
+        if set(spec) == {"name"} and spec["name"] in datasets:
+            return {"values": datasets[spec["name"]]}
+        return {key: inline_datasets(value, datasets) for key, value in spec.items()}
+    if isinstance(spec, list):
+        return [inline_datasets(value, datasets) for value in spec]
+    return spec
+
+
+@functools.lru_cache(maxsize=None)
+def vegalite_schema():
+    import altair as alt
+
+    return alt.vegalite.v4.schema.core.load_schema()
+
+
+def validate_spec(spec):
+    import jsonschema
+
+    jsonschema.validate(json.loads(spec), vegalite_schema())
+
+
+class SpecTemplate:
+    """
+    Vega-Lite spec compiled once, with placeholders for what varies per request
+
+    The chart is built, themed and validated by altair a single time, when
+    the template is first used, so altair is only imported by processes
+    that render charts. The
+    placeholders, created with `text_slot` and `list_slot`, and the chart's
+    `alt.NamedData` sources are then filled in with plain string
+    substitution, which skips building and validating an altair object
+    tree on every request. Data that is part of the chart itself, such as
+    the values of text marks, is inlined.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._spec = None
+        self._lock = threading.Lock()
+
+    @property
+    def spec(self):
+        """The spec as json, with the placeholders in place."""
+        with self._lock:
+            if self._spec is None:
+                spec = self.build().to_dict()
+                spec = inline_datasets(spec, spec.pop("datasets", {}))
+                spec["datasets"] = DATASETS
+                self._spec = json.dumps(spec)
+            return self._spec
+
+    @staticmethod
+    def _substitute(document, values):
+        def replace(match):
+            name = match.group(1) or match.group(2)
+            if name not in values:
+                return match.group(0)
+            return json.dumps(values[name])
+
+        return _SLOT.sub(replace, document)
+
+    def fill(self, **slots):
+        """
+        Function that substitutes the slots, leaving the datasets placeholder in place
+
+        Parameters:
+        ----------
+        **slots:
+            the value of every slot of the chart
+
+        Returns:
+        ----------
+        str
+            the spec as json
+        """
+        return self._substitute(self.spec, slots)
+
+    def render(self, datasets, **slots):
+        """
+        Function that substitutes the data and the slots into the template
+
+        Parameters:
+        ----------
+        datasets (dict):
+            DataFrame or list of records for every named dataset of the chart
+        **slots:
+            the value of every slot of the chart
+
+        Returns:
+        ----------
+        str
+            the spec as json
+        """
+        values = {
+            **slots,
+            DATASETS.strip("_"): {name: records(data) for name, data in datasets.items()},
+        }
+        spec = self._substitute(self.spec, values)
+        if VALIDATE_SPECS:
+            validate_spec(spec)
+        return spec
+
+
+class FigureTemplate:
+    """
+    Plotly figure built once, one of whose traces has its data substituted per request
+
+    The figure is built when the template is first used. Figures are
+    returned as plain dicts, which dash serializes without constructing
+    and validating plotly objects again.
+    """
+
+    def __init__(self, build, trace=0):
+        self.build = build
+        self.trace = trace
+        self._figure = None
+        self._lock = threading.Lock()
+
+    @property
+    def figure(self):
+        """The figure as a dict."""
+        with self._lock:
+            if self._figure is None:
+                self._figure = self.build().to_plotly_json()
+            return self._figure
+
+    def render(self, layout=None, **trace):
+        """
+        Function that substitutes properties of the data trace of the figure
+
+        Parameters:
+        ----------
+        layout (dict, optional):
+            layout properties substituted as well, e.g. `annotations`
+        **trace:
+            trace properties, e.g. `labels` and `values`
+
+        Returns:
+        ----------
+        dict
+            the figure
+        """
+        data = list(self.figure["data"])
+        data[self.trace] = {**data[self.trace], **trace}
+        figure = {**self.figure, "data": data}
+        if layout:
+            figure["layout"] = {**figure["layout"], **layout}
+        if VALIDATE_SPECS:
+            import plotly.graph_objects as go
+
+            go.Figure(figure)
+        return figure
@@ -0,0 +1,67 @@
+import importlib.util
+import sys
+import time
+
+
+def lazy_import(name):
+    """
+    Function that imports a module on first attribute access
+
+    Parameters:
+    ----------
+    name (str):
+        the module name, e.g. "altair"
+
+    Returns:
+    ----------
+    module
+        the module, loaded once one of its attributes is used
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class StartupTimer:
+    """
+    Wall-clock breakdown of the startup of the server
+
+    Every `mark` closes a phase that started at the previous mark, or when
+    the timer was created.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self):
+        """Function that formats the breakdown, one phase per line."""
+        lines = [f"startup {self.total() * 1000:8.1f} ms"]
+        lines += [f"  {phase:<12}{seconds * 1000:8.1f} ms" for phase, seconds in self.phases]
+        return "\n".join(lines)
+
+    def metric_lines(self):
+        """Function that returns the breakdown in the Prometheus text format."""
+        return [
+            "# HELP app_startup_seconds Time spent starting the server, by phase.",
+            "# TYPE app_startup_seconds gauge",
+            *(f'app_startup_seconds{{phase="{phase}"}} {seconds!r}' for phase, seconds in self.phases),
+        ]
+
+
+# started when the app module imports this module, before its own imports
+timer = StartupTimer()
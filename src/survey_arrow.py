@@ -0,0 +1,83 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+ARROW_PATH = "data/processed/survey.arrow"
+
+# schema metadata with the answers of every categorical column and the question list
+CATEGORIES_KEY = b"categories"
+FEATURES_KEY = b"features"
+
+
+def write_survey(data, features, path=ARROW_PATH):
+    """
+    Function that writes the categorized survey and the question list to an Arrow IPC file
+
+    Categorical answers are stored as their integer codes, with `-1` for
+    missing answers and the categories in the schema metadata, so that
+    every column can be read back without a copy. The file is not
+    compressed, which lets readers memory-map it.
+
+    Parameters:
+    ----------
+    data (DataFrame):
+        the categorized survey responses
+    features (DataFrame):
+        the survey question descriptions indexed by column name
+    path (str):
+        location of the file, replaced atomically
+    """
+    columns, categories = {}, {}
+    for column in data.columns:
+        values = data[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = pa.array(values.cat.codes.to_numpy())
+            categories[column] = values.cat.categories.tolist()
+        else:
+            columns[column] = pa.array(values.to_numpy())
+    table = pa.table(columns).replace_schema_metadata(
+        {
+            CATEGORIES_KEY: json.dumps(categories),
+            FEATURES_KEY: features.reset_index().to_json(orient="split", index=False),
+        }
+    )
+    partial = f"{path}.part"
+    with pa.OSFile(partial, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(partial, path)
+
+
+def load_survey(path=ARROW_PATH):
+    """
+    Function that memory-maps the survey written by `write_survey`
+
+    The columns of the returned frame are read-only views of the mapped
+    file, so processes loading the same file share one copy of it in the
+    page cache and nothing is parsed.
+
+    Parameters:
+    ----------
+    path (str):
+        location of the file
+
+    Returns:
+    ----------
+    tuple
+        the categorized survey responses and the survey question
+        descriptions indexed by column name
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    metadata = table.schema.metadata
+    categories = json.loads(metadata[CATEGORIES_KEY])
+    columns = {}
+    for name in table.column_names:
+        values = table.column(name).combine_chunks().to_numpy(zero_copy_only=True)
+        if name in categories:
+            values = pd.Categorical.from_codes(values, categories[name], ordered=True)
+        columns[name] = values
+    data = pd.DataFrame(columns, copy=False)
+    features = pd.read_json(metadata[FEATURES_KEY].decode(), orient="split")
+    return data, features.set_index("variables")
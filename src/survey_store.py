@@ -0,0 +1,114 @@
+import hashlib
+import threading
+
+import pandas as pd
+
+import dataset as ds
+from diagnosis_index import DiagnosisMatrix
+from filter_index import FilterIndex
+from render_cache import dataset_version
+
+
+def add_counts(table, other):
+    """Function that adds the counts of two batches, DataFrames aligned on their labels."""
+    if isinstance(table, pd.DataFrame):
+        return table.add(other, fill_value=0)
+    return table.add(other)
+
+
+class SurveyStore:
+    """
+    In-memory survey responses together with everything derived from them
+
+    Besides the categorized responses the store keeps the filter index, the
+    diagnosis matrix and a set of additive count tables. Appending a batch
+    only scans the new rows: the index and the matrix are extended and each
+    table's counts for the batch are added to the existing ones. Attributes
+    are replaced, never mutated, in an order that keeps concurrent readers
+    consistent (rows selected with an older index always exist in the newer
+    data).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.index = FilterIndex(data)
+        self.diagnoses = DiagnosisMatrix(data)
+        self.version = dataset_version(data)
+        self.tables = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def register_table(self, name, counter):
+        """
+        Function that materializes an additive count table
+
+        Parameters:
+        ----------
+        name (hashable):
+            the key of the table in `tables`
+        counter (callable):
+            maps survey responses to a DataFrame of counts, or to tables
+            with an `add` method like `Crosstabs`; the counts of two batches
+            must add up to the counts of their concatenation
+        """
+        with self._lock:
+            self._counters[name] = counter
+            self.tables = {**self.tables, name: counter(self.data)}
+
+    def replace(self, data):
+        """
+        Function that swaps in other survey responses, rebuilding everything derived
+
+        Parameters:
+        ----------
+        data (DataFrame):
+            the categorized survey responses
+        """
+        with self._lock:
+            tables = {name: counter(data) for name, counter in self._counters.items()}
+            index = FilterIndex(data)
+            diagnoses = DiagnosisMatrix(data)
+            version = dataset_version(data)
+
+            self.data = data
+            self.tables = tables
+            self.index = index
+            self.diagnoses = diagnoses
+            self.version = version
+
+    def years(self):
+        """Function that returns the survey years present in the data, in order."""
+        return [int(year) for year in self.data["survey_year"].cat.categories]
+
+    def append(self, batch):
+        """
+        Function that adds categorized responses to the store
+
+        Parameters:
+        ----------
+        batch (DataFrame):
+            new survey responses, e.g. from `dataset.categorize`
+
+        Returns:
+        ----------
+        str
+            the new dataset version
+        """
+        with self._lock:
+            data = ds.combine(self.data, batch)
+            batch = data.iloc[len(self.data):]
+            tables = {
+                name: add_counts(self.tables[name], counter(batch))
+                for name, counter in self._counters.items()
+            }
+            index = self.index.appended(batch)
+            diagnoses = self.diagnoses.appended(batch)
+            batch_version = dataset_version(batch)
+            version = hashlib.sha1(f"{self.version}:{batch_version}".encode()).hexdigest()[:16]
+
+            self.data = data
+            self.tables = tables
+            self.index = index
+            self.diagnoses = diagnoses
+            self.version = version
+            return version
@@ -0,0 +1,87 @@
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+
+# route prefix of the vega scripts on the server
+URL_PREFIX = "/vega/"
+
+# the vega packages loaded by altair charts, in load order
+PACKAGES = ["vega", "vega-lite", "vega-embed"]
+
+
+def viewer_file(path):
+    """Function that reads a file of altair_viewer, without importing it and its server."""
+    [package_dir] = importlib.util.find_spec("altair_viewer").submodule_search_locations
+    with open(os.path.join(package_dir, path), "rb") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def bundled_versions():
+    """
+    Function that resolves the vega packages to the versions bundled with altair_viewer
+
+    Altair is imported here, on the first request for a script, rather
+    than when the server starts.
+
+    Returns:
+    ----------
+    dict
+        package name to the newest bundled version matching altair's requirement
+    """
+    import altair as alt
+
+    wanted_versions = {
+        "vega": alt.VEGA_VERSION,
+        "vega-lite": alt.VEGALITE_VERSION,
+        "vega-embed": alt.VEGAEMBED_VERSION,
+    }
+    listing = json.loads(viewer_file("scripts/listing.json"))
+    versions = {}
+    for package in PACKAGES:
+        wanted = wanted_versions[package]
+        matching = [
+            version for version in listing[package]
+            if version == wanted or version.startswith(f"{wanted}.")
+        ]
+        if not matching:
+            raise RuntimeError(f"altair_viewer does not bundle {package}@{wanted}")
+        versions[package] = max(matching, key=lambda v: [int(part) for part in v.split(".")])
+    return versions
+
+
+def script_urls():
+    """
+    Function that lists the urls of the vega scripts, in load order
+
+    The urls carry the installed altair and altair_viewer versions, which
+    determine the scripts, so browsers can cache them for good.
+    """
+    release = "-".join(
+        importlib.metadata.version(package) for package in ["altair", "altair_viewer"]
+    )
+    return [f"{URL_PREFIX}{package}.js?v={release}" for package in PACKAGES]
+
+
+@functools.lru_cache(maxsize=None)
+def script(name):
+    """
+    Function that returns a vega script by its file name, e.g. `vega.js`
+
+    Returns:
+    ----------
+    bytes or None
+        the script, or None if it is not one of the scripts of `script_urls`
+    """
+    package = name[:-len(".js")]
+    if not name.endswith(".js") or package not in PACKAGES:
+        return None
+    return viewer_file(f"scripts/{package}-{bundled_versions()[package]}.js")
+
+
+def etag(content):
+    """Function that returns an ETag for the content of a static resource."""
+    return hashlib.sha256(content).hexdigest()[:32]
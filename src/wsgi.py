@@ -0,0 +1,46 @@
+"""
+WSGI entry point of the dashboard
+
+    gunicorn wsgi:server --pythonpath=src --preload
+
+With --preload the gunicorn master loads the data, the aggregates and the
+chart templates once, and the forked workers share them copy-on-write.
+Set LAZY_START=1 to leave the templates to the first live chart render,
+which lets a server start sooner when most charts come from the bundle.
+The startup time breakdown is printed to stderr and exported at /metrics.
+"""
+import gc
+import os
+import sys
+
+# leave the chart templates, and altair, to their first use
+LAZY_START = os.environ.get("LAZY_START", "0") == "1"
+
+
+def create_app(warm=True):
+    """
+    Function that loads the dashboard and returns its Flask server
+
+    Parameters:
+    ----------
+    warm (bool):
+        whether to build ahead of time what is otherwise built on first use
+
+    Returns:
+    ----------
+    Flask
+        the server
+    """
+    import app
+    import startup
+
+    if warm:
+        app.warm_up()
+    # objects loaded so far live as long as the process, keeping them out of
+    # the garbage collector stops it from copying their pages into every worker
+    gc.freeze()
+    print(startup.timer.report(), file=sys.stderr, flush=True)
+    return app.server
+
+
+server = create_app(warm=not LAZY_START)
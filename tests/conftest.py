@@ -0,0 +1,22 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules in src/ import each other as top-level modules, and load the
+# processed data from paths relative to the repository root
+sys.path.insert(0, os.path.join(ROOT, "src"))
+os.chdir(ROOT)
+
+# every chart rendered by the tests is checked against its schema
+os.environ.setdefault("VALIDATE_SPECS", "1")
+
+import pytest  # noqa: E402
+
+import dataset as ds  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def survey():
+    """The categorized 2016 survey responses."""
+    return ds.load_survey()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+import aggregate_api as api
+from survey_store import SurveyStore
+
+QUESTIONS = ["treatment", "gender", "country", "mental_health_leave"]
+
+
+def test_parse_query_fills_in_and_sorts_the_filters():
+    query = api.parse_query(
+        {"question": "treatment", "gender": "Male", "country": ["Germany", "Canada", "Germany"],
+         "year": ["2016"], "age": ["20", 30]},
+        QUESTIONS,
+    )
+    assert query == {
+        "question": "treatment",
+        "group": None,
+        "age": [20, 30],
+        "gender": ["Male"],
+        "country": ["Canada", "Germany"],
+        "year": [2016],
+    }
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        ["treatment"],
+        {"question": "salary"},
+        {"question": "treatment", "group": "treatment"},
+        {"question": "treatment", "group": "salary"},
+        {"question": "treatment", "colour": "blue"},
+        {"question": "treatment", "age": "young"},
+        {"question": "treatment", "age": "18"},
+        {"question": "treatment", "age": [18]},
+        {"question": "treatment", "age": [18, 30, 40]},
+        {"question": "treatment", "age": [18.5, 30]},
+        {"question": "treatment", "age": [True, 30]},
+        {"question": "treatment", "age": [[18], 30]},
+        {"question": "treatment", "year": ["last"]},
+        {"question": "treatment", "year": [[2016]]},
+        {"question": "treatment", "gender": [1, "Male"]},
+        {"question": "treatment", "gender": [["Male"]]},
+        {"question": "treatment", "country": {"name": "Canada"}},
+        {"question": ["treatment"]},
+        {"question": "treatment", "group": {"question": "gender"}},
+    ],
+)
+def test_parse_query_rejects_invalid_queries(query):
+    with pytest.raises(api.QueryError):
+        api.parse_query(query, QUESTIONS)
+
+
+def test_query_from_args_reads_repeated_parameters():
+    from werkzeug.datastructures import MultiDict
+
+    args = MultiDict([("question", "treatment"), ("age", "20,30"),
+                      ("country", "Canada"), ("country", "Germany")])
+    query = api.parse_query(api.query_from_args(args), QUESTIONS)
+    assert query["age"] == [20, 30] and query["country"] == ["Canada", "Germany"]
+
+
+def test_run_queries_counts_the_filtered_respondents(survey):
+    store = SurveyStore(survey)
+    queries = [
+        api.parse_query({"question": "treatment", "group": "gender", "age": [20, 30]}, QUESTIONS),
+        api.parse_query({"question": "mental_health_leave", "country": "Canada"}, QUESTIONS),
+    ]
+    by_gender, canada = api.run_queries(store, queries)
+
+    young = survey[survey["age"].between(20, 30)]
+    assert by_gender["respondents"] == len(young)
+    assert np.sum(by_gender["counts"]) == len(young)
+    female = by_gender["groups"].index("Female")
+    yes = by_gender["answers"].index("Yes")
+    assert by_gender["counts"][female][yes] == (
+        (young["gender"] == "Female") & (young["treatment"] == "Yes")
+    ).sum()
+    assert canada["respondents"] == (survey["country"] == "Canada").sum()
+    assert len(canada["counts"]) == 1
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"queries": [{"question": "treatment", "gender": [1, "Male"]}]},
+        {"queries": [{"question": "treatment", "age": "18"}]},
+        {"queries": [{"question": "treatment", "year": [[2016]]}]},
+        {"queries": [{"question": {"nested": True}}]},
+        {"queries": "treatment"},
+    ],
+)
+def test_malformed_queries_are_bad_requests(body):
+    import app
+
+    response = app.server.test_client().post("/api/aggregate/batch", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["error"]
+
+
+def test_malformed_url_queries_are_bad_requests():
+    import app
+
+    client = app.server.test_client()
+    assert client.get("/api/aggregate?question=treatment&age=18").status_code == 400
+    assert client.get("/api/aggregate?question=treatment&age=18,30").status_code == 200
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+import aggregations as agg
+import dataset as ds
+
+QUESTIONS = ["treatment", "mental_health_leave", "work_interfere_treated"]
+
+
+def test_gender_distributions_match_one_question_at_a_time(survey):
+    combined = agg.gender_distributions(survey, QUESTIONS)
+    for question in QUESTIONS:
+        single = agg.gender_distribution(survey, question)
+        subset = combined[combined["question"] == question]
+        expected = single.astype({"gender": object, question: object}).set_index(
+            ["gender", question]
+        )
+        # unanswered genders are only a group of their own in the combined counts
+        actual = subset[subset["gender"] != ds.NO_RESPONSE].set_index(["gender", "answer"])
+        actual_counts = actual["count"].rename_axis(expected.index.names)
+        pd.testing.assert_series_equal(
+            actual_counts.sort_index(), expected["count"].sort_index(), check_dtype=False
+        )
+
+
+def test_gender_distributions_count_every_respondent_once_per_question(survey):
+    counts = agg.gender_distributions(survey, QUESTIONS)
+    np.testing.assert_allclose(counts.groupby(["question", "gender"])["pct"].sum(), 1)
+    genders = survey["gender"].astype(object).fillna(ds.NO_RESPONSE).value_counts()
+    for question in QUESTIONS:
+        totals = counts[counts["question"] == question].groupby("gender")["count"].sum()
+        assert totals.to_dict() == genders.to_dict()
+
+
+def test_gender_distributions_rank_answers_in_display_order(survey):
+    counts = agg.gender_distributions(survey, ["mental_health_leave"])
+    ranks = counts.drop_duplicates("answer").set_index("answer")["answer_rank"]
+    order = ds.category_order(survey, "mental_health_leave", missing=True)
+    assert ranks.sort_values().index.tolist() == [a for a in order if a in ranks.index]
+    assert ranks[ds.NO_RESPONSE] == len(order) - 1
+
+
+def test_top_countries_rank_by_respondents_and_skip_the_other_bucket(survey):
+    countries = agg.top_countries(survey, 3)
+    counts = survey["country"].value_counts()
+    assert countries == counts.drop("Other", errors="ignore").index[:3].tolist()
+    assert "Other" not in agg.top_countries(survey, 1000)
@@ -0,0 +1,69 @@
+import json
+
+import app
+import chart_bundle
+from input_space import hr_filters, input_labels, widget_values
+
+
+def test_bundled_years_are_single_years_and_all_of_them():
+    years = [2016, 2017, 2018, 2019]
+    values = widget_values(app.store.data, years, app.feature_list, app.DONUT_COLUMNS)
+    assert values["year_sets"] == [[2016], [2017], [2018], [2019], years]
+    assert len(hr_filters(values)) == (
+        len(values["age_ranges"]) * len(values["genders"]) * (len(years) + 1)
+    )
+    single = widget_values(app.store.data, [2016], app.feature_list, app.DONUT_COLUMNS)
+    assert single["year_sets"] == [[2016]]
+
+
+def test_bundled_objects_are_served_from_their_files(tmp_path, monkeypatch):
+    content = json.dumps({"mark": "bar"}).encode("utf-8")
+    name = "0" * 64 + ".json"
+    (tmp_path / chart_bundle.OBJECTS_DIR).mkdir()
+    (tmp_path / chart_bundle.OBJECTS_DIR / name).write_bytes(content)
+    monkeypatch.setattr(app, "bundle", chart_bundle.ChartBundle(str(tmp_path)))
+
+    client = app.server.test_client()
+    response = client.get(chart_bundle.URL_PREFIX + name)
+    assert response.status_code == 200
+    assert response.get_data() == content
+    assert response.content_type == chart_bundle.MEDIA_TYPE
+    assert "immutable" in response.headers["Cache-Control"]
+    again = client.get(chart_bundle.URL_PREFIX + name, headers={"If-None-Match": f'"{name}"'})
+    assert again.status_code == 304
+    assert client.get(chart_bundle.URL_PREFIX + "1" * 64 + ".json").status_code == 404
+    assert client.get(chart_bundle.URL_PREFIX + "manifest.json").status_code == 404
+
+    with app.server.test_request_context(chart_bundle.URL_PREFIX + name):
+        # the file is handed to the server to stream, not read into the response
+        assert app.bundled_chart(name).direct_passthrough
+
+
+def test_bundled_figures_are_read_from_their_files(tmp_path):
+    figure = {"data": [{"type": "pie", "values": [1, 2]}], "layout": {}}
+    content = json.dumps(figure).encode("utf-8")
+    name = "0" * 64 + ".json"
+    (tmp_path / chart_bundle.OBJECTS_DIR).mkdir()
+    (tmp_path / chart_bundle.OBJECTS_DIR / name).write_bytes(content)
+    bundle = chart_bundle.ChartBundle(str(tmp_path))
+    bundle.bundle_version = bundle.version
+    bundle.charts = {chart_bundle.chart_key("build_graph", ("formal_discuss", "Yes")): [name]}
+
+    first = bundle.figure(app.build_graph, "formal_discuss", "Yes")
+    assert first == figure
+    # every caller gets its own copy, the bundle keeps none
+    first["layout"]["title"] = "changed"
+    assert bundle.figure(app.build_graph, "formal_discuss", "Yes") == figure
+
+
+def test_metric_labels_are_the_bundled_input_values():
+    from metrics import default_inputs_class
+
+    values = widget_values(app.store.data, app.store.years(), app.feature_list, app.DONUT_COLUMNS)
+    labels = input_labels(values)
+    assert {"tab-1", values["questions"][0], "Female", "I don't know"} <= labels
+    assert default_inputs_class("Female", "tab-2", known=labels) == "Female,tab-2"
+    # values no widget takes are labelled by their type
+    assert default_inputs_class("no such answer", 7, [20, 40], known=labels) == "str,int,list"
+    assert app.hr_inputs_class([15, 65], "anyone", None) == "str,all_ages,all_years"
+    assert app.metrics.known_inputs == labels
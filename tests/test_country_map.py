@@ -0,0 +1,107 @@
+import inspect
+import json
+import threading
+
+import pandas as pd
+
+import app
+import country_map
+import html_components as hc
+
+
+def components(component):
+    yield component
+    children = getattr(component, "children", None)
+    for child in children if isinstance(children, list) else [children]:
+        if child is not None and not isinstance(child, str):
+            yield from components(child)
+
+
+def test_map_locates_countries_only_by_the_served_geometry():
+    for trace in app.MAP_TEMPLATE.figure["data"]:
+        assert trace["geojson"] == country_map.GEO_URL
+        assert trace["featureidkey"] == "properties.iso_a3"
+        assert trace["locationmode"] == "geojson-id"
+    assert not app.MAP_TEMPLATE.figure["layout"]["geo"]["visible"]
+
+
+def test_plotly_loads_its_base_layers_from_the_dashboard():
+    section = hc.get_map_section(app.feature_list, app.MAP_QUESTIONS)
+    [graph] = [c for c in components(section) if getattr(c, "id", None) == "country_map"]
+    assert graph.config["topojsonURL"] == country_map.TOPOJSON_URL
+
+    client = app.server.test_client()
+    response = client.get(country_map.TOPOJSON_URL + country_map.TOPOJSON_NAME)
+    assert response.status_code == 200
+    assert json.loads(response.data)["type"] == "Topology"
+    assert client.get(country_map.GEO_URL).status_code == 200
+
+
+def test_topology_holds_every_ring_of_the_geometry():
+    features = json.loads(country_map.geometry())["features"]
+    topology = json.loads(country_map.topology())
+    rings = [
+        ring
+        for feature in features
+        for polygon in (
+            [feature["geometry"]["coordinates"]]
+            if feature["geometry"]["type"] == "Polygon"
+            else feature["geometry"]["coordinates"]
+        )
+        for ring in polygon
+    ]
+    assert topology["arcs"] == rings
+    countries = topology["objects"]["countries"]["geometries"]
+    assert [country["id"] for country in countries] == [
+        feature["properties"]["iso_a3"] for feature in features
+    ]
+    assert topology["objects"]["lakes"]["geometries"] == []
+
+
+def test_respondents_of_unmapped_countries_are_noted(survey):
+    figure = inspect.unwrap(app.build_country_map)("treatment", "Yes")
+    [note] = figure["layout"]["annotations"]
+    others = (survey["country"] == "Other").sum()
+    assert others > 0
+    assert note["text"] == f"Respondents not on the map: Other ({others})"
+    # the template itself is left without a note
+    assert app.MAP_TEMPLATE.figure["layout"]["annotations"][0]["text"] == ""
+
+
+def test_no_note_when_every_respondent_is_on_the_map():
+    note = app.unmapped_note(pd.Series({"Other": 0}))
+    assert note["text"] == ""
+    assert app.unmapped_note(pd.Series(dtype=int))["text"] == ""
+
+
+def allow_any_origin(wsgi_app):
+    """The server, answering the file:// page of kaleido's browser."""
+    def wrapped(environ, start_response):
+        def start(status, headers, exc_info=None):
+            return start_response(status, [*headers, ("Access-Control-Allow-Origin", "*")], exc_info)
+        return wsgi_app(environ, start)
+    return wrapped
+
+
+def test_map_renders_without_the_plotly_cdn():
+    import plotly.io
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, allow_any_origin(app.server.wsgi_app))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    figure = inspect.unwrap(app.build_country_map)("treatment", "Yes")
+    figure = {
+        **figure,
+        "data": [{**trace, "geojson": base + trace["geojson"]} for trace in figure["data"]],
+    }
+    scope = plotly.io.kaleido.scope
+    defaults = scope.topojson, scope.mathjax
+    # the topojson url of the graph config, the page loads nothing else
+    scope.topojson, scope.mathjax = base + country_map.TOPOJSON_URL, None
+    try:
+        image = plotly.io.to_image(figure, format="png", engine="kaleido")
+    finally:
+        scope.topojson, scope.mathjax = defaults
+        server.shutdown()
+    assert image.startswith(b"\x89PNG")
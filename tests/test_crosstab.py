@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import dataset as ds
+from crosstab import Crosstabs
+
+QUESTIONS = ["treatment", "gender", "country", "mental_health_leave", "work_interfere_treated"]
+
+
+def expected_crosstab(data, question, group=None, age_range=None, genders=None, years=None):
+    keep = pd.Series(True, index=data.index)
+    if age_range is not None:
+        keep &= data["age"].between(*age_range)
+    if genders is not None:
+        keep &= data["gender"].isin(genders)
+    if years is not None:
+        keep &= data["survey_year"].isin(years)
+    subset = data[keep]
+    answers = subset[question].astype(object).fillna(ds.NO_RESPONSE)
+    groups = (
+        pd.Series("All respondents", index=subset.index)
+        if group is None
+        else subset[group].astype(object).fillna(ds.NO_RESPONSE)
+    )
+    counts = pd.DataFrame({"group": groups, "answer": answers}).value_counts()
+    return counts.sort_index().rename("count").reset_index()
+
+
+def sorted_counts(counts):
+    return counts.sort_values(["group", "answer"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize(
+    "question, group, filters",
+    [
+        ("treatment", None, {}),
+        ("treatment", "gender", {}),
+        ("gender", "treatment", {}),
+        ("work_interfere_treated", "country", {"age_range": (25, 40)}),
+        ("mental_health_leave", "treatment", {"genders": ["Female"], "years": [2016]}),
+        ("country", None, {"age_range": (90, 99)}),
+    ],
+)
+def test_crosstab_matches_the_filtered_frame(survey, question, group, filters):
+    tables = Crosstabs.count(survey, QUESTIONS)
+    counts = tables.crosstab(question, group, **filters)
+    expected = expected_crosstab(survey, question, group, **filters)
+    pd.testing.assert_frame_equal(sorted_counts(counts), sorted_counts(expected))
+
+
+def test_grouping_a_question_by_itself_is_rejected(survey):
+    with pytest.raises(ValueError):
+        Crosstabs.count(survey, QUESTIONS).crosstab("treatment", "treatment")
+
+
+def test_added_tables_match_the_tables_of_all_responses(survey):
+    head = survey.iloc[:500]
+    # the batch has answers the first rows do not have
+    tail = ds.categorize(
+        survey.iloc[500:].astype(object).assign(survey_year=2017, country="Atlantis")
+    )
+    data = ds.combine(head, tail)
+    added = Crosstabs.count(head, QUESTIONS).add(Crosstabs.count(data.iloc[500:], QUESTIONS))
+    counted = Crosstabs.count(data, QUESTIONS)
+    for question, group, filters in [
+        ("treatment", "country", {}),
+        ("country", "gender", {"years": [2017]}),
+        ("mental_health_leave", None, {"age_range": (20, 30), "genders": ["Male"]}),
+    ]:
+        pd.testing.assert_frame_equal(
+            sorted_counts(added.crosstab(question, group, **filters)),
+            sorted_counts(counted.crosstab(question, group, **filters)),
+        )
+
+
+def test_every_pair_is_counted_at_load(survey):
+    tables = Crosstabs.count(survey, QUESTIONS)
+    assert len(tables.tables) == len(QUESTIONS) * (len(QUESTIONS) - 1) // 2
+    # only the tables are kept, not the responses they were counted from
+    assert set(vars(tables)) == {"columns", "tables"}
+    assert tables.table("country", "treatment") is tables.tables[("treatment", "country")]
+    with pytest.raises(KeyError):
+        tables.crosstab("treatment", "salary")
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+import dataset as ds
+from diagnosis_index import DIAGNOSIS_COLUMN, DiagnosisMatrix, split_answers
+
+
+def responses(*answers):
+    return pd.DataFrame({DIAGNOSIS_COLUMN: pd.Categorical(answers)})
+
+
+def test_answers_are_split_into_diagnoses():
+    names = []
+    matrix = split_answers(["A (x)|B", "B", "A (x)|A (x)|C"], names)
+    assert names == ["A (x)", "B", "C"]
+    np.testing.assert_array_equal(matrix.toarray(), [[1, 1, 0], [0, 1, 0], [1, 0, 1]])
+
+
+def test_respondents_are_indexed_by_their_diagnoses():
+    matrix = DiagnosisMatrix(responses("A|B", None, "B", "C|A"))
+    assert matrix.frequencies().to_dict() == {"A": 2, "B": 2, "C": 1}
+    np.testing.assert_array_equal(matrix.with_any(["C", "Unknown"]), [False, False, False, True])
+    counts = matrix.cooccurrence()
+    assert counts.loc["A", "B"] == 1 and counts.loc["A", "C"] == 1 and counts.loc["B", "C"] == 0
+    assert matrix.cooccurrence(np.array([1, 2])).loc["B", "B"] == 1
+
+
+def test_appended_matrix_matches_a_rebuilt_one(survey):
+    head = survey.iloc[:700]
+    tail = survey.iloc[700:].astype(object)
+    # a diagnosis the first rows do not have
+    tail[DIAGNOSIS_COLUMN] = tail[DIAGNOSIS_COLUMN].where(
+        tail.index % 7 != 0, "Mood Disorder (Depression, Bipolar Disorder, etc)|Something new"
+    )
+    data = ds.combine(head, ds.categorize(tail))
+
+    original = DiagnosisMatrix(head)
+    appended = original.appended(data.iloc[700:])
+    rebuilt = DiagnosisMatrix(data)
+    assert appended.names[-1] == "Something new"
+    assert "Something new" not in original.names and original.matrix.shape[0] == 700
+    assert set(appended.names) == set(rebuilt.names)
+    order = [appended.names.index(name) for name in rebuilt.names]
+    assert (appended.matrix[:, order] != rebuilt.matrix).nnz == 0
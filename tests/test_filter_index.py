@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import dataset as ds
+from filter_index import FilterIndex
+
+
+def expected_rows(data, gender=None, ages=None, exclude_country=None, notnull=()):
+    keep = np.ones(len(data), dtype=bool)
+    if gender is not None:
+        keep &= data["gender"].isin(gender).to_numpy()
+    if ages is not None:
+        keep &= data["age"].between(*ages).to_numpy()
+    if exclude_country is not None:
+        keep &= ~data["country"].isin(exclude_country).to_numpy()
+    for column in notnull:
+        keep &= data[column].notna().to_numpy()
+    return np.flatnonzero(keep)
+
+
+@pytest.mark.parametrize(
+    "gender, ages, exclude_country, notnull",
+    [
+        (None, None, None, ()),
+        (["Female"], None, None, ()),
+        (["Male", "Other"], (25, 34), None, ()),
+        (None, (18, 18), ["United States of America"], ()),
+        (None, (70, 90), None, ()),
+        (["Female"], (20, 60), ["Canada", "Germany"], ["work_interfere_treated"]),
+    ],
+)
+def test_rows_match_the_filtered_frame(survey, gender, ages, exclude_country, notnull):
+    index = FilterIndex(survey)
+    rows = index.rows(
+        equal=None if gender is None else {"gender": gender},
+        between=None if ages is None else {"age": ages},
+        exclude=None if exclude_country is None else {"country": exclude_country},
+        notnull=notnull,
+    )
+    np.testing.assert_array_equal(
+        rows, expected_rows(survey, gender, ages, exclude_country, notnull)
+    )
+
+
+def test_mask_narrows_down_an_earlier_mask(survey):
+    index = FilterIndex(survey)
+    women = index.mask(equal={"gender": "Female"})
+    rows = index.rows(within=women, between={"age": (30, 39)})
+    np.testing.assert_array_equal(rows, expected_rows(survey, ["Female"], (30, 39)))
+
+
+def test_unknown_values_match_nobody(survey):
+    index = FilterIndex(survey)
+    assert len(index.rows(equal={"gender": "Unknown"})) == 0
+    assert len(index.rows(exclude={"gender": "Unknown"})) == len(survey)
+
+
+@pytest.mark.parametrize("split", [8, 333, 1000])
+def test_appended_index_matches_a_rebuilt_one(survey, split):
+    # the batch brings an age and a year the first rows do not have
+    head = survey.iloc[:split]
+    tail = ds.categorize(
+        survey.iloc[split:].astype({"age": int, "survey_year": int})
+        .astype(object).assign(age=99, survey_year=2017)
+    )
+    data = ds.combine(head, tail)
+    appended = FilterIndex(head).appended(data.iloc[split:])
+    rebuilt = FilterIndex(data)
+    for filters in [
+        {},
+        {"equal": {"survey_year": [2017]}},
+        {"between": {"age": (30, 99)}},
+        {"equal": {"gender": "Female"}, "between": {"age": (15, 40)}},
+        {"notnull": ["work_interfere_treated"]},
+    ]:
+        np.testing.assert_array_equal(appended.rows(**filters), rebuilt.rows(**filters))
+
+
+def test_appending_leaves_the_original_index_alone(survey):
+    index = FilterIndex(survey.iloc[:100])
+    before = index.rows(equal={"gender": "Female"})
+    index.appended(survey.iloc[100:])
+    assert index.size == 100
+    np.testing.assert_array_equal(index.rows(equal={"gender": "Female"}), before)
+
+
+def test_narrowing_a_selection_matches_filtering_at_once(survey):
+    index = FilterIndex(survey)
+    selected = index.rows(between={"age": (20, 40)})
+    for filters in [{"notnull": ["gender"]}, {"equal": {"gender": "Female"}}, {}]:
+        np.testing.assert_array_equal(
+            index.narrow(selected, **filters), index.rows(between={"age": (20, 40)}, **filters)
+        )
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+import app
+import image_export
+
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    exporter = image_export.ImageExporter(str(tmp_path), workers=1)
+    monkeypatch.setattr(app, "exporter", exporter)
+    yield exporter
+    exporter.close()
+
+
+def poll(client, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    response = client.get(url)
+    while response.status_code == 202 and time.monotonic() < deadline:
+        assert response.headers["Retry-After"] == "1"
+        time.sleep(0.2)
+        response = client.get(url)
+    return response
+
+
+def test_plotly_figures_render_without_mathjax():
+    import plotly.io
+
+    source = image_export.render_chart("build_graph", ("formal_discuss", "Yes"))
+    image = image_export.render_image("plotly", source, "png")
+    assert image.startswith(b"\x89PNG")
+    assert plotly.io.kaleido.scope.mathjax is False
+
+
+def test_export_renders_in_the_pool_while_the_client_polls(exporter):
+    client = app.server.test_client()
+    url = f"{image_export.URL_PREFIX}donut/formal_discuss/Yes.png"
+    first = client.get(url)
+    assert first.status_code == 202
+    image_url = first.get_json()["image"]
+
+    response = poll(client, url)
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith(image_url)
+    image = client.get(image_url)
+    assert image.status_code == 200 and image.content_type == "image/png"
+    # stored images are redirected to at once
+    assert client.get(url).status_code == 302
+
+
+def test_missing_renderers_are_reported(exporter, monkeypatch):
+    monkeypatch.setattr(image_export.shutil, "which", lambda program: None)
+    assert image_export.unavailable("plotly", "pdf") is None
+    for fmt in image_export.MEDIA_TYPES:
+        assert "chromedriver" in image_export.unavailable("vega-lite", fmt)
+
+    client = app.server.test_client()
+    response = client.get(f"{image_export.URL_PREFIX}overview/self_employed.pdf")
+    assert response.status_code == 501
+    assert "chromedriver" in response.get_json()["error"]
+    with pytest.raises(image_export.ExportUnavailable):
+        exporter.export([("vega-lite", b"{}")], ["png"])
+
+    monkeypatch.setattr(image_export.shutil, "which", lambda program: f"/usr/bin/{program}")
+    assert image_export.unavailable("vega-lite", "pdf") is None
+
+
+def test_failed_renderings_are_reported_once(exporter):
+    name, failed = exporter.submit("plotly", b"not a figure", "png")
+    assert failed.exception(timeout=60) is not None
+    assert exporter.submit("plotly", b"not a figure", "png") == (name, failed)
+    _, retried = exporter.submit("plotly", b"not a figure", "png")
+    assert retried is not failed
+    retried.exception(timeout=60)
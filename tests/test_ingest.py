@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+import dataset as ds
+import ingest
+from survey_store import SurveyStore
+
+RAW_PATH = "data/raw/mental-heath-in-tech-2016_20161114.csv"
+
+
+@pytest.fixture(scope="module")
+def features():
+    return ds.load_features()
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return pd.read_csv(RAW_PATH, nrows=200, encoding="utf-8")
+
+
+def reworded(raw, features):
+    """The 2016 responses under the question wording of 2017."""
+    wording = {column: question for question, column in ingest.OSMI_2017_WORDING.items()}
+    renames = {}
+    for question in raw.columns:
+        for column, text in features["questions"].items():
+            normalize = ingest.cleaning.normalize_question
+            if normalize(question) == normalize(text) and column in wording:
+                renames[question] = wording[column]
+    return raw.rename(columns=renames)
+
+
+def test_later_wording_maps_onto_the_same_columns(tmp_path, raw, features):
+    raw.to_csv(tmp_path / "2016.csv", index=False)
+    reworded(raw, features).to_csv(tmp_path / "2017.csv", index=False)
+    original = ingest.read_batch(tmp_path / "2016.csv", 2016, features)
+    later = ingest.read_batch(tmp_path / "2017.csv", 2017, features)
+    assert len(later) == len(original)
+    for column in set(ingest.OSMI_2017_WORDING.values()):
+        assert later[column].notna().any()
+        pd.testing.assert_series_equal(
+            later[column].astype(object), original[column].astype(object)
+        )
+    # a year without aliases does not recognize the new wording
+    unknown = ingest.read_batch(tmp_path / "2017.csv", 2030, features)
+    assert unknown["treatment"].isna().all()
+
+
+def test_batches_without_a_required_question_are_rejected(tmp_path, raw, features):
+    raw.drop(columns=["What is your age?"]).to_csv(tmp_path / "batch.csv", index=False)
+    with pytest.raises(ingest.BatchError, match="age"):
+        ingest.read_batch(tmp_path / "batch.csv", 2017, features)
+
+
+def test_batches_without_any_valid_age_are_rejected(tmp_path, survey, features):
+    survey.iloc[:20].assign(age=None).to_csv(tmp_path / "batch.csv", index=False)
+    with pytest.raises(ingest.BatchError, match="valid age"):
+        ingest.read_batch(tmp_path / "batch.csv", 2017, features)
+
+
+def test_watcher_skips_rejected_batches(tmp_path, raw, survey, features):
+    store = SurveyStore(survey)
+    watcher = ingest.IncomingWatcher(store, features, directory=str(tmp_path))
+    bad = watcher.save(2017, raw.drop(columns=["What is your gender?"]).to_csv(index=False).encode())
+    good = watcher.save(2017, reworded(raw, features).to_csv(index=False).encode())
+
+    assert watcher.poll(force=True) == 1
+    assert watcher.ingested == {good}
+    assert "gender" in watcher.rejected[bad]
+    assert store.years() == [2016, 2017]
+    assert watcher.pending() == []
+    assert watcher.poll(force=True) == 0
@@ -0,0 +1,52 @@
+import pandas as pd
+
+import preprocess
+
+RAW_ROWS = 120
+
+
+def write_inputs(tmp_path):
+    raw = tmp_path / "raw.csv"
+    pd.read_csv(preprocess.RAW_PATH, nrows=RAW_ROWS, encoding="utf-8").to_csv(raw, index=False)
+    features = tmp_path / "features_list.csv"
+    pd.read_csv(preprocess.ds.FEATURES_PATH, encoding="utf-8").to_csv(features, index=False)
+    return raw, features
+
+
+def run(raw, features, out_dir):
+    preprocess.run(str(raw), str(features), str(out_dir), chunksize=50)
+    return pd.read_csv(out_dir / preprocess.CLEAN_NAME)
+
+
+def test_unchanged_inputs_reuse_every_stage(tmp_path, capsys):
+    raw, features = write_inputs(tmp_path)
+    run(raw, features, tmp_path / "out")
+    capsys.readouterr()
+    run(raw, features, tmp_path / "out")
+    assert "clean: up to date" in capsys.readouterr().out
+
+
+def test_edited_raw_data_reprocesses_only_changed_chunks(tmp_path, capsys):
+    raw, features = write_inputs(tmp_path)
+    run(raw, features, tmp_path / "out")
+    data = pd.read_csv(raw)
+    data.iloc[-1, data.columns.get_loc("What is your age?")] = 44
+    data.to_csv(raw, index=False)
+    capsys.readouterr()
+    cleaned = run(raw, features, tmp_path / "out")
+    assert "clean: 1 chunks processed, 2 reused" in capsys.readouterr().out
+    assert cleaned["age"].iloc[-1] == 44
+
+
+def test_changed_features_miss_the_chunk_cache(tmp_path, capsys):
+    raw, features = write_inputs(tmp_path)
+    assert run(raw, features, tmp_path / "out")["family_history"].notna().any()
+
+    # the raw column of family_history is no longer recognized
+    listed = pd.read_csv(features)
+    listed.loc[listed["variables"] == "family_history", "questions"] = "Not in the survey?"
+    listed.to_csv(features, index=False)
+    capsys.readouterr()
+    cleaned = run(raw, features, tmp_path / "out")
+    assert "clean: 3 chunks processed, 0 reused" in capsys.readouterr().out
+    assert cleaned["family_history"].isna().all()
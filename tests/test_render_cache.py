@@ -0,0 +1,59 @@
+from render_cache import RenderCache, normalize
+
+
+def test_least_recently_used_entries_are_evicted_past_max_entries():
+    cache = RenderCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_past_max_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", "x" * 4)
+    cache.put("b", "x" * 4)
+    cache.put("c", "x" * 4)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 8 and cache.stats()["entries"] == 2
+
+
+def test_entries_larger_than_max_bytes_are_not_cached():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", "x" * 4)
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None and cache.get("a") == "x" * 4
+
+
+def test_replacing_an_entry_updates_its_size():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", "x" * 8)
+    cache.put("a", "x" * 2)
+    cache.put("b", "x" * 8)
+    assert cache.get("a") == "xx" and cache.stats()["bytes"] == 10
+
+
+def test_memoize_keys_by_normalized_arguments_and_version():
+    cache = RenderCache()
+    calls = []
+
+    @cache.memoize
+    def chart(ages, gender="all"):
+        calls.append((ages, gender))
+        return f"{ages} {gender}"
+
+    chart([15, 65])
+    chart((15, 65))
+    chart([15, 65], gender="Female")
+    assert len(calls) == 2
+    cache.version = "next"
+    chart([15, 65])
+    assert len(calls) == 3
+    assert cache.stats()["functions"]["chart"] == {"hits": 1, "misses": 3}
+
+
+def test_normalize_makes_inputs_hashable():
+    assert normalize([1, [2, 3], {"b": [4], "a": 1}]) == (1, (2, 3), (("a", 1), ("b", (4,))))
@@ -0,0 +1,44 @@
+import inspect
+
+import pytest
+from dash.exceptions import PreventUpdate
+
+import app
+from metrics import Metrics
+from render_pool import RenderPool, RenderTimeout, StaleTask, render_task
+
+SELECTED = app.hr_selection(app.respondent_filters([20, 40], "Female", [2016]))
+
+
+def test_tasks_render_the_selection_at_the_version_it_was_made_from():
+    result, stages = render_task("app", "plot_remote_work", app.store.version, (SELECTED,))
+    assert result == app.plot_remote_work(SELECTED)
+    assert "filter" in stages
+
+
+def test_tasks_from_another_dataset_version_are_refused():
+    # a selection of the sender's rows means nothing to other data
+    with pytest.raises(StaleTask):
+        render_task("app", "plot_remote_work", "another-version", (SELECTED,))
+
+
+@pytest.mark.parametrize("version", [app.store.version, "another-version"])
+def test_pool_renders_in_worker_processes(version):
+    pool = RenderPool(workers=1, timeout=120, version=version)
+    try:
+        results = pool.gather(
+            [(app.plot_work_interfere_bars, (SELECTED,)), (app.plot_remote_work, (SELECTED,))]
+        )
+    finally:
+        pool._executor.shutdown()
+    # refused tasks are rendered by the caller
+    assert results == [app.plot_work_interfere_bars(SELECTED), app.plot_remote_work(SELECTED)]
+
+
+def test_hr_charts_filter_the_respondents_once(monkeypatch):
+    calls = []
+    rows = app.store.index.rows
+    monkeypatch.setattr(app.store.index, "rows", lambda **f: calls.append(f) or rows(**f))
+    inspect.unwrap(app.plot_hr_charts)([20, 40], "Female", [2016])
+    # both charts only narrow the selection down
+    assert calls == [app.respondent_filters([20, 40], "Female", [2016])]
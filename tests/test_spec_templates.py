@@ -0,0 +1,69 @@
+import inspect
+import json
+
+import jsonschema
+import pytest
+
+import app
+import spec_templates
+
+# a call rendering every chart template of the dashboard, past the render cache and pool
+CHARTS = {
+    "GENDER_TEMPLATE": ("plot_gender_chart", ("treatment",)),
+    "ALL_QUESTIONS_TEMPLATE": ("plot_all_gender_charts", ()),
+    "WORK_INTERFERE_TEMPLATE": (
+        "plot_work_interfere_bars", (app.hr_selection(app.respondent_filters([15, 65], "all")),)
+    ),
+    "REMOTE_WORK_TEMPLATE": (
+        "plot_remote_work", (app.hr_selection(app.respondent_filters([20, 40], "Female")),)
+    ),
+    "EXPLORE_TEMPLATE": ("plot_explore_chart", ("treatment", "gender", [20, 40], "Male", [2016])),
+    "DIAGNOSIS_TEMPLATE": ("plot_diagnosis_chart", ([], [15, 65], "Female")),
+    "DONUT_TEMPLATE": ("build_graph", ("formal_discuss", "Yes")),
+    "MAP_TEMPLATE": ("build_country_map", ("treatment", "Yes")),
+}
+
+
+def render(name, args):
+    return inspect.unwrap(getattr(app, name))(*args)
+
+
+def test_specs_are_validated():
+    assert spec_templates.VALIDATE_SPECS
+    with pytest.raises(jsonschema.ValidationError):
+        spec_templates.validate_spec(json.dumps({"mark": 3}))
+
+
+def test_every_template_is_rendered():
+    templates = {
+        name for name, value in vars(app).items()
+        if isinstance(value, (spec_templates.SpecTemplate, spec_templates.FigureTemplate))
+    }
+    assert templates == set(CHARTS)
+
+
+@pytest.mark.parametrize("template", sorted(CHARTS))
+def test_template_renders_a_valid_chart(template):
+    name, args = CHARTS[template]
+    chart = render(name, args)
+    if isinstance(getattr(app, template), spec_templates.SpecTemplate):
+        spec = json.loads(chart)
+        assert spec_templates.DATASETS not in chart
+        assert all(values for values in spec.get("datasets", {}).values())
+    else:
+        assert chart["data"][getattr(app, template).trace]["values" if name == "build_graph" else "z"]
+
+
+def test_slots_are_substituted():
+    spec = json.loads(render("plot_gender_chart", ("tech_org",)))
+    assert "__" not in json.dumps(spec)
+    [counts] = spec["datasets"].values()
+    assert {row["tech_org"] for row in counts} >= {"Yes", "No"}
+
+
+def test_figure_template_substitutes_only_the_data_trace():
+    figure = app.MAP_TEMPLATE.render(locations=["CAN"], z=[0.5], text=["Canada"])
+    base, trace = figure["data"]
+    assert trace["locations"] == ["CAN"] and trace["z"] == [0.5]
+    assert len(base["locations"]) > 100
+    assert app.MAP_TEMPLATE.figure["data"][1]["locations"] == []
@@ -0,0 +1,72 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+import aggregations as agg
+import dataset as ds
+from crosstab import Crosstabs
+from render_cache import dataset_version
+from survey_store import SurveyStore
+
+DONUT_COUNTS = functools.partial(
+    agg.country_answer_counts, column="formal_discuss", countries=["Canada"]
+)
+CROSSTABS = functools.partial(Crosstabs.count, columns=["treatment", "gender", "country"])
+
+
+def batches(survey):
+    later = ds.categorize(survey.iloc[1000:].astype(object).assign(survey_year=2017))
+    return survey.iloc[:800], survey.iloc[800:1000], later
+
+
+def test_new_store_is_versioned_by_its_content(survey):
+    assert SurveyStore(survey).version == dataset_version(survey)
+    assert SurveyStore(survey.iloc[:10]).version != SurveyStore(survey.iloc[:11]).version
+
+
+def test_append_chains_the_versions(survey):
+    first, second, third = batches(survey)
+    store, other = SurveyStore(first), SurveyStore(first)
+    versions = [store.version, store.append(second), store.append(third)]
+    assert len(set(versions)) == 3
+    assert store.version == versions[-1]
+    # the same batches in the same order give the same versions
+    assert [other.version, other.append(second), other.append(third)] == versions
+
+    reordered = SurveyStore(first)
+    reordered.append(third)
+    assert reordered.append(second) != versions[-1]
+
+
+def test_append_extends_everything_derived(survey):
+    first, second, third = batches(survey)
+    store = SurveyStore(first)
+    store.register_table("donut", DONUT_COUNTS)
+    store.register_table("crosstabs", CROSSTABS)
+    store.append(second)
+    store.append(third)
+    rebuilt = SurveyStore(store.data)
+    rebuilt.register_table("donut", DONUT_COUNTS)
+    rebuilt.register_table("crosstabs", CROSSTABS)
+
+    assert len(store.data) == len(survey)
+    assert store.years() == [2016, 2017]
+    pd.testing.assert_frame_equal(store.tables["donut"], rebuilt.tables["donut"], check_dtype=False)
+    for question, group in [("treatment", "gender"), ("country", "treatment")]:
+        pd.testing.assert_frame_equal(
+            store.tables["crosstabs"].crosstab(question, group, years=[2017]),
+            rebuilt.tables["crosstabs"].crosstab(question, group, years=[2017]),
+        )
+    np.testing.assert_array_equal(
+        store.index.rows(equal={"survey_year": [2017]}), np.arange(1000, len(survey))
+    )
+    assert store.diagnoses.matrix.shape == rebuilt.diagnoses.matrix.shape
+    assert (store.diagnoses.matrix != rebuilt.diagnoses.matrix).nnz == 0
+
+
+def test_replace_rebuilds_from_the_new_data(survey):
+    store = SurveyStore(survey.iloc[:100])
+    store.replace(survey)
+    assert store.version == dataset_version(survey)
+    assert store.index.size == len(survey)